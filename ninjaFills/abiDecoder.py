@@ -0,0 +1,274 @@
+import re
+import numpy as np
+import pyarrow as pa
+from eth_utils import keccak
+
+from eventStore import ADDRESS, HASH, uint256Field
+
+# Event ABIs in the same JSON shape as the contract ABI files
+
+RFQ_ORDER_FILLED = {
+    "name": "RfqOrderFilled",
+    "type": "event",
+    "inputs": [
+        {"name": "orderHash", "type": "bytes32", "indexed": False},
+        {"name": "maker", "type": "address", "indexed": False},
+        {"name": "taker", "type": "address", "indexed": False},
+        {"name": "makerToken", "type": "address", "indexed": False},
+        {"name": "takerToken", "type": "address", "indexed": False},
+        {"name": "takerTokenFilledAmount", "type": "uint128", "indexed": False},
+        {"name": "makerTokenFilledAmount", "type": "uint128", "indexed": False},
+        {"name": "pool", "type": "bytes32", "indexed": False},
+    ],
+}
+
+TRANSFER = {
+    "name": "Transfer",
+    "type": "event",
+    "inputs": [
+        {"name": "from", "type": "address", "indexed": True},
+        {"name": "to", "type": "address", "indexed": True},
+        {"name": "value", "type": "uint256", "indexed": False},
+    ],
+}
+
+AAVE_V2_FLASH_LOAN = {
+    "name": "FlashLoan",
+    "type": "event",
+    "inputs": [
+        {"name": "target", "type": "address", "indexed": True},
+        {"name": "initiator", "type": "address", "indexed": True},
+        {"name": "asset", "type": "address", "indexed": True},
+        {"name": "amount", "type": "uint256", "indexed": False},
+        {"name": "premium", "type": "uint256", "indexed": False},
+        {"name": "referralCode", "type": "uint16", "indexed": False},
+    ],
+}
+
+DYDX_LOG_WITHDRAW = {
+    "name": "LogWithdraw",
+    "type": "event",
+    "inputs": [
+        {"name": "accountOwner", "type": "address", "indexed": True},
+        {"name": "accountNumber", "type": "uint256", "indexed": False},
+        {"name": "market", "type": "uint256", "indexed": False},
+        {
+            "name": "update",
+            "type": "tuple",
+            "indexed": False,
+            "components": [
+                {
+                    "name": "deltaWei",
+                    "type": "tuple",
+                    "components": [
+                        {"name": "sign", "type": "bool"},
+                        {"name": "value", "type": "uint256"},
+                    ],
+                },
+                {
+                    "name": "newPar",
+                    "type": "tuple",
+                    "components": [
+                        {"name": "sign", "type": "bool"},
+                        {"name": "value", "type": "uint128"},
+                    ],
+                },
+            ],
+        },
+        {"name": "to", "type": "address", "indexed": False},
+    ],
+}
+
+KEEPERDAO_BORROWED = {
+    "name": "Borrowed",
+    "type": "event",
+    "inputs": [
+        {"name": "_borrower", "type": "address", "indexed": True},
+        {"name": "_token", "type": "address", "indexed": True},
+        {"name": "_amount", "type": "uint256", "indexed": False},
+        {"name": "_fee", "type": "uint256", "indexed": False},
+    ],
+}
+
+STATIC_TYPE = re.compile(r"^(address|bool|bytes([1-9]|[12][0-9]|3[0-2])|u?int([0-9]+)?)$")
+
+
+def intBits(abiType):
+    return int(abiType[abiType.index("int") + len("int") :] or 256)
+
+
+def canonicalType(param):
+    if param["type"] == "tuple":
+        return "({})".format(",".join(canonicalType(c) for c in param["components"]))
+    return param["type"]
+
+
+def eventSignature(eventAbi):
+    return "{}({})".format(
+        eventAbi["name"], ",".join(canonicalType(p) for p in eventAbi["inputs"])
+    )
+
+
+def eventTopic(eventAbi):
+    return "0x" + keccak(text=eventSignature(eventAbi)).hex()
+
+
+# Flattens static tuples into (name, type) pairs, one per 32 byte word
+def flatten(param, prefix=""):
+    name = prefix + param["name"]
+    if param["type"] == "tuple":
+        return [f for c in param["components"] for f in flatten(c, name + ".")]
+
+    if not STATIC_TYPE.match(param["type"]):
+        raise ValueError(
+            "{} has dynamic type {}, only static types can be decoded in batch".format(
+                name, param["type"]
+            )
+        )
+    return [(name, param["type"])]
+
+
+# Decodes 32 byte ABI words of shape (n, 32) into a column for the given type.
+# Addresses and bytesN come back as fixed-width numpy bytes, integers of up to 64 bits
+# as int64/uint64 and anything wider as raw 32 byte big-endian (two's complement) words,
+# which is the event store's uint256 representation.
+def decodeWords(words, abiType):
+    if abiType == "address":
+        return np.ascontiguousarray(words[:, 12:]).view("S20").ravel()
+    if abiType == "bool":
+        return words[:, 31] != 0
+    if abiType.startswith("bytes"):
+        size = int(abiType[len("bytes") :])
+        return np.ascontiguousarray(words[:, :size]).view("S{}".format(size)).ravel()
+
+    if intBits(abiType) <= 64:
+        low = np.ascontiguousarray(words[:, 24:])
+        return low.view(">i8" if abiType.startswith("int") else ">u8").ravel().astype(
+            np.int64 if abiType.startswith("int") else np.uint64
+        )
+    return np.ascontiguousarray(words).view("S32").ravel()
+
+
+def hexToWords(hexStrings, numWords):
+    buffer = bytes.fromhex("".join(h[2:] if h.startswith("0x") else h for h in hexStrings))
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(-1, numWords, 32)
+
+
+# Fixed-width byte columns back to 0x prefixed hex strings (numpy drops trailing nulls
+# when indexing "S" arrays, so slice the raw buffer instead)
+def toHex(column):
+    width = column.dtype.itemsize * 2
+    raw = column.tobytes().hex()
+    return ["0x" + raw[i : i + width] for i in range(0, len(raw), width)]
+
+
+# Lossy float view of 32 byte big-endian integer columns
+def wordsToFloat(column):
+    words = np.frombuffer(column.tobytes(), dtype=">u8").reshape(-1, 4).astype(np.float64)
+    return words @ np.array([2.0**192, 2.0**128, 2.0**64, 1.0])
+
+
+# Decodes a whole window of logs for one event at once. The hex payloads of every log
+# are joined into one contiguous buffer and each field is a strided view into it.
+class EventDecoder:
+    def __init__(self, eventAbi):
+        self.abi = eventAbi
+        self.topic = eventTopic(eventAbi)
+        self.indexed = []
+        self.fields = []
+
+        for param in eventAbi["inputs"]:
+            if param.get("indexed"):
+                # Indexed dynamic values are only present as their hash
+                abiType = param["type"] if STATIC_TYPE.match(param["type"]) else "bytes32"
+                self.indexed.append((param["name"], abiType))
+            else:
+                self.fields.extend(flatten(param))
+
+    # Logs whose topic count and data length fit this event's layout. Logs sharing the
+    # topic with a different layout (e.g. ERC-721 Transfer, with the token id indexed
+    # and no data) would otherwise shift every later row of the joined buffer.
+    def wellFormed(self, logs):
+        numTopics = 1 + len(self.indexed)
+        dataLength = 2 + 64 * len(self.fields)
+        return np.fromiter(
+            (
+                len(log["topics"]) == numTopics and len(log["data"]) == dataLength
+                for log in logs
+            ),
+            dtype=bool,
+            count=len(logs),
+        )
+
+    # Returns the decoded columns of the well-formed logs and the mask of which logs
+    # those are, so callers can drop the same logs
+    def decode(self, logs):
+        keep = self.wellFormed(logs)
+        if not keep.all():
+            logs = [log for log, k in zip(logs, keep) if k]
+
+        columns = {}
+        if not len(logs):
+            schema = self.schema()
+            return {
+                field.name: pa.array([], type=field.type).to_numpy(zero_copy_only=False)
+                for field in schema
+            }, keep
+
+        if self.indexed:
+            topics = hexToWords(
+                (topic for log in logs for topic in log["topics"][1:]), len(self.indexed)
+            )
+            for i, (name, abiType) in enumerate(self.indexed):
+                columns[name] = decodeWords(topics[:, i], abiType)
+
+        if self.fields:
+            data = hexToWords((log["data"] for log in logs), len(self.fields))
+            for i, (name, abiType) in enumerate(self.fields):
+                columns[name] = decodeWords(data[:, i], abiType)
+
+        columns["transactionHash"] = hexToWords(
+            (log["transactionHash"] for log in logs), 1
+        )[:, 0].copy().view("S32").ravel()
+        columns["blockNumber"] = np.array(
+            [int(log["blockNumber"], 16) for log in logs], dtype=np.int64
+        )
+        columns["logIndex"] = np.array(
+            [int(log["logIndex"], 16) for log in logs], dtype=np.int64
+        )
+
+        return columns, keep
+
+    # Arrow schema matching decode(), using the event store's column types
+    def schema(self):
+        fields = []
+        for name, abiType in self.indexed + self.fields:
+            if abiType == "address":
+                fields.append(pa.field(name, ADDRESS))
+            elif abiType == "bool":
+                fields.append(pa.field(name, pa.bool_()))
+            elif abiType.startswith("bytes"):
+                fields.append(pa.field(name, pa.binary(int(abiType[len("bytes") :]))))
+            elif intBits(abiType) <= 64:
+                fields.append(
+                    pa.field(name, pa.int64() if abiType.startswith("int") else pa.uint64())
+                )
+            else:
+                fields.append(uint256Field(name))
+
+        return pa.schema(
+            fields
+            + [
+                pa.field("transactionHash", HASH),
+                pa.field("blockNumber", pa.int64()),
+                pa.field("logIndex", pa.int64()),
+            ]
+        )
+
+    def decodeTable(self, logs):
+        columns, _ = self.decode(logs)
+        schema = self.schema()
+        return pa.Table.from_arrays(
+            [pa.array(columns[field.name], type=field.type) for field in schema],
+            schema=schema,
+        )
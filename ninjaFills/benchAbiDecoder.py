@@ -0,0 +1,71 @@
+import time
+import argparse
+import numpy as np
+
+from abiDecoder import EventDecoder, RFQ_ORDER_FILLED
+from mockNode import encodeRfqOrderFilled
+
+
+# The per-log slicing getAllNinjaOrderFills used before the batch decoder
+def sliceDecode(logs):
+    fills = []
+    for log in logs:
+        dataStr = log["data"][2:]
+        data = [dataStr[i : i + 64] for i in range(0, len(dataStr), 64)]
+
+        fills.append(
+            {
+                "txHash": log["transactionHash"],
+                "orderHash": "0x" + data[0],
+                "maker": "0x" + data[1][-40:],
+                "taker": "0x" + data[2][-40:],
+                "makerToken": "0x" + data[3][-40:],
+                "takerToken": "0x" + data[4][-40:],
+                "takerTokenFilledAmount": int(data[5], 16),
+                "makerTokenFilledAmount": int(data[6], 16),
+            }
+        )
+    return fills
+
+
+def batchDecode(logs):
+    return EventDecoder(RFQ_ORDER_FILLED).decode(logs)[0]
+
+
+def timeIt(decode, logs, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        decode(logs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare per-log hex slicing against batch ABI decoding of RfqOrderFilled logs"
+    )
+    parser.add_argument("--path", default="ninjaFills.npy")
+    parser.add_argument("--scale", type=int, default=20, help="times to repeat the dataset")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    fills = np.load(args.path, allow_pickle=True)
+    topic = EventDecoder(RFQ_ORDER_FILLED).topic
+    logs = [
+        {
+            "data": encodeRfqOrderFilled(fill),
+            "topics": [topic],
+            "transactionHash": fill["txHash"],
+            "blockNumber": hex(fill["blockNumber"]),
+            "logIndex": "0x0",
+        }
+        for fill in fills
+    ] * args.scale
+
+    print("{} logs".format(len(logs)))
+    for name, decode in [("slice", sliceDecode), ("batch", batchDecode)]:
+        seconds = timeIt(decode, logs, args.repeats)
+        print(
+            "{:8s} {:8.3f}s  {:10.0f} logs/s".format(name, seconds, len(logs) / seconds)
+        )
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pyarrow as pa
+
+from eventStore import toTable, writeTable
+
+# Each loader runs in a fresh interpreter so peak RSS isn't shared between them
+PICKLE_LOADER = """
+fills = np.load(PATH, allow_pickle=True)
+gas = np.array([txn["gasUsed"] for txn in fills])
+"""
+
+ARROW_LOADER = """
+gas = readTable(PATH, columns=["gasUsed"]).column("gasUsed").to_numpy()
+"""
+
+HARNESS = """
+import os, time, json
+import numpy as np, pyarrow
+from eventStore import readTable
+# pyarrow imports its pandas shim lazily on the first to_numpy, keep that out of the timing
+pyarrow.chunked_array([[0]]).to_numpy()
+PATH = {path!r}
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+baseline = rss()
+start = time.perf_counter()
+{loader}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "rssMB": rss() - baseline, "sum": int(gas.sum())}}))
+"""
+
+
+def runLoader(loader, path):
+    code = HARNESS.format(path=path, loader=loader)
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return json.loads(output.stdout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare pickled .npy loads against memory mapped Arrow loads"
+    )
+    parser.add_argument("--path", default="ninjaFills.npy")
+    parser.add_argument("--scale", type=int, default=100, help="times to repeat the dataset")
+    args = parser.parse_args()
+
+    fills = [dict(fill) for fill in np.load(args.path, allow_pickle=True)]
+    table = toTable(fills)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        picklePath = os.path.join(tmp, "fills.npy")
+        arrowPath = os.path.join(tmp, "fills.arrow")
+        # Copy the dicts so pickle can't memoize the repeats into shared references
+        np.save(
+            picklePath,
+            np.array([dict(fill) for _ in range(args.scale) for fill in fills]),
+            allow_pickle=True,
+        )
+        writeTable(arrowPath, pa.concat_tables([table] * args.scale))
+
+        print("{} fills".format(len(fills) * args.scale))
+        for name, loader, path in [
+            ("pickle", PICKLE_LOADER, picklePath),
+            ("arrow", ARROW_LOADER, arrowPath),
+        ]:
+            result = runLoader(loader, path)
+            print(
+                "{:8s} {:8.3f}s  {:8.1f} MB RSS growth  (gas sum {})".format(
+                    name, result["seconds"], result["rssMB"], result["sum"]
+                )
+            )
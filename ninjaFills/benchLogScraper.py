@@ -0,0 +1,90 @@
+from time import sleep, time
+import argparse
+
+from rpc import RpcClient
+from logScraper import LogScraper
+from mockNode import MockChain, MockNode, buildCannedLogs, ZRX_EXCHANGE_PROXY, RFQ_ORDER_FILLED
+
+
+# The original getAllNinjaOrderFills loop: one filter per fixed window, then a pause.
+# Its windows overlap by one block, so it can count a boundary log twice.
+def serialScrape(rpc, fromBlock, toBlock, blockStep, pause):
+    numLogs = 0
+    latestBlockNumber = fromBlock
+
+    while latestBlockNumber < toBlock:
+        filterId = rpc.call(
+            "eth_newFilter",
+            [
+                {
+                    "fromBlock": hex(latestBlockNumber),
+                    "toBlock": hex(latestBlockNumber + blockStep),
+                    "address": ZRX_EXCHANGE_PROXY,
+                    "topics": [RFQ_ORDER_FILLED],
+                }
+            ],
+        )
+        numLogs += len(rpc.call("eth_getFilterLogs", [filterId]))
+        latestBlockNumber += blockStep
+        sleep(pause)
+
+    return numLogs
+
+
+def concurrentScrape(rpc, fromBlock, toBlock, blockStep, concurrency):
+    scraper = LogScraper(
+        rpc,
+        address=ZRX_EXCHANGE_PROXY,
+        topics=[RFQ_ORDER_FILLED],
+        blockStep=blockStep,
+        concurrency=concurrency,
+    )
+    numLogs = sum(len(logs) for _, _, logs in scraper.scrape(fromBlock, toBlock))
+
+    return numLogs, scraper
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the serial log loop against LogScraper on a local node"
+    )
+    parser.add_argument("--fromBlock", type=int, default=13000000)
+    parser.add_argument("--toBlock", type=int, default=13200000)
+    parser.add_argument("--blockStep", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--maxLogs", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requestsPerSecond", type=float, default=50)
+    args = parser.parse_args()
+
+    chain = MockChain(buildCannedLogs())
+    numBlocks = args.toBlock - args.fromBlock
+
+    with MockNode(chain, maxLogs=args.maxLogs, latency=args.latency) as node:
+
+        # The serial loop has no way to recover from an oversized window, so give it
+        # an unlimited node while the concurrent scraper runs against the real limit
+        node.maxLogs = float("inf")
+        rpc = RpcClient(node.url)
+        start = time()
+        numLogs = serialScrape(rpc, args.fromBlock, args.toBlock, args.blockStep, args.pause)
+        elapsed = time() - start
+        print(
+            "serial:     {} logs in {:.2f}s, {:.0f} blocks/s, {} requests".format(
+                numLogs, elapsed, numBlocks / elapsed, rpc.requestCount
+            )
+        )
+
+        node.maxLogs = args.maxLogs
+        rpc = RpcClient(node.url, requestsPerSecond=args.requestsPerSecond)
+        start = time()
+        numLogs, scraper = concurrentScrape(
+            rpc, args.fromBlock, args.toBlock, args.blockStep, args.concurrency
+        )
+        elapsed = time() - start
+        print(
+            "concurrent: {} logs in {:.2f}s, {:.0f} blocks/s, {} requests, {} splits".format(
+                numLogs, elapsed, numBlocks / elapsed, rpc.requestCount, scraper.splitCount
+            )
+        )
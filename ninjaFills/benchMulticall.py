@@ -0,0 +1,69 @@
+from time import time
+import argparse
+from web3 import Web3
+from multicall import Multicall
+
+import hidingVaults
+from multicallExecutor import MulticallExecutor
+from mockVaults import MockVaultChain, MockVaultNode, loadCTokens
+
+STAGES = {
+    "owners": hidingVaults.hv_owner_calls,
+    "underwritten": hidingVaults.hv_underwritten_calls,
+    "unhealth": hidingVaults.hv_unhealth_calls,
+    "supply": hidingVaults.hv_supply_calls,
+    "borrow": hidingVaults.hv_borrow_calls,
+}
+
+
+# The original hidingVaults flow: one Multicall over all items per stage, one stage at a time
+def serialMulticalls(w3, vaults):
+    return {name: Multicall(calls(vaults), _w3=w3)() for name, calls in STAGES.items()}
+
+
+def pipelinedMulticalls(executor, vaults):
+    return executor.run({name: calls(vaults) for name, calls in STAGES.items()})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare per-stage Multicalls against MulticallExecutor on a local node"
+    )
+    parser.add_argument("--vaults", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--gasCap", type=int, default=50000000)
+    parser.add_argument("--failureRate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    chain = MockVaultChain(args.vaults, loadCTokens())
+
+    with MockVaultNode(chain, latency=args.latency) as node:
+        w3 = Web3(Web3.HTTPProvider(node.url))
+        hidingVaults.w3 = w3
+
+        # The single Multicalls can't survive the gas cap or a dropped request, so give
+        # them an uncapped, reliable node while the executor runs against the limits
+        node.gasCap = float("inf")
+        start = time()
+        serial = serialMulticalls(w3, chain.vaults)
+        elapsed = time() - start
+        print("serial:    {:.2f}s, {} requests".format(elapsed, node.requestCount))
+
+        node.gasCap = args.gasCap
+        node.failureRate = args.failureRate
+        node.requestCount = 0
+        executor = MulticallExecutor(w3, concurrency=args.concurrency)
+        start = time()
+        pipelined = pipelinedMulticalls(executor, chain.vaults)
+        elapsed = time() - start
+        print(
+            "pipelined: {:.2f}s, {} requests, {} chunks, {} splits, {} retries, same results: {}".format(
+                elapsed,
+                node.requestCount,
+                executor.chunkCount,
+                executor.splitCount,
+                executor.retryCount,
+                serial == pipelined,
+            )
+        )
@@ -0,0 +1,73 @@
+import sqlite3
+
+CACHE_FILE = "callCache.sqlite"
+
+# sqlite's default SQLITE_MAX_VARIABLE_NUMBER before 3.32; each lookup takes the block
+# plus two variables per call
+MAX_VARIABLES = 999
+CALLS_PER_QUERY = (MAX_VARIABLES - 1) // 2
+
+
+# On-disk cache of raw eth_call return data keyed by (contract, calldata, block).
+# Only calls made against a fixed block number can be cached, since the result of a
+# call at "latest" changes from block to block.
+class CallCache:
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS calls (
+                contract TEXT NOT NULL,
+                calldata BLOB NOT NULL,
+                block INTEGER NOT NULL,
+                output BLOB NOT NULL,
+                PRIMARY KEY (contract, calldata, block)
+            )
+            """
+        )
+        self.db.commit()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(call, block):
+        return (call.target.lower(), bytes(call.data), block)
+
+    # Returns {index: output} for the calls found in the cache, looking up every call at
+    # the block in one query per CALLS_PER_QUERY calls
+    def getMany(self, calls, block):
+        indicesByKey = {}
+        for i, call in enumerate(calls):
+            contract, calldata, _ = self.key(call, block)
+            indicesByKey.setdefault((contract, calldata), []).append(i)
+
+        found = {}
+        keys = list(indicesByKey)
+        for start in range(0, len(keys), CALLS_PER_QUERY):
+            chunk = keys[start : start + CALLS_PER_QUERY]
+            rows = self.db.execute(
+                "SELECT contract, calldata, output FROM calls "
+                "WHERE block = ? AND (contract, calldata) IN (VALUES {})".format(
+                    ", ".join(["(?, ?)"] * len(chunk))
+                ),
+                [block] + [value for key in chunk for value in key],
+            )
+            for contract, calldata, output in rows:
+                for i in indicesByKey[(contract, calldata)]:
+                    found[i] = output
+
+        self.hits += len(found)
+        self.misses += len(calls) - len(found)
+        return found
+
+    def putMany(self, calls, outputs, block):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO calls VALUES (?, ?, ?, ?)",
+            [self.key(call, block) + (bytes(output),) for call, output in zip(calls, outputs)],
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,67 @@
+import os
+import sys
+import csv
+import numpy as np
+import pyarrow.csv
+
+from eventStore import inferTable, writePartitioned, writeTable
+from fillStore import FillStore
+
+# Pickled notebook outputs and the CSV dumped next to them with the same columns
+NOTEBOOK_ARTIFACTS = [
+    "../gnosis-analysis/protocolActivityFinal",
+    "../indexcoop-analysis/rebalExecsFinal",
+]
+
+
+# Reads a pickled dataframe dump, taking the column names from its CSV twin since
+# the .npy only holds the values (the CSV's first column is the dataframe index)
+def loadNotebookArtifact(basePath):
+    with open(basePath + ".csv", newline="") as f:
+        header = next(csv.reader(f))
+
+    if os.path.exists(basePath + ".npy"):
+        rows = np.load(basePath + ".npy", allow_pickle=True)
+        names = header[1:]
+        return {name: list(rows[:, i]) for i, name in enumerate(names)}
+
+    return loadCsv(basePath + ".csv")
+
+
+def loadCsv(path):
+    table = pyarrow.csv.read_csv(path)
+    return {
+        name: table.column(name).to_pylist()
+        for name in table.column_names
+        if name != ""
+    }
+
+
+# Writes a table as block-range partitions when it has block numbers, else as one file
+def writeConverted(columns, outputPath):
+    table = inferTable(columns)
+
+    if "blockNumber" in table.column_names:
+        writePartitioned(outputPath, table)
+    else:
+        writeTable(outputPath + ".arrow", table)
+
+    print("Wrote {} rows x {} columns to {}".format(table.num_rows, table.num_columns, outputPath))
+    return table
+
+
+if __name__ == "__main__":
+
+    # `python convertArtifacts.py some.csv ...` converts arbitrary CSV exports
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            writeConverted(loadCsv(path), os.path.splitext(path)[0])
+
+    else:
+        if os.path.exists("ninjaFills.npy"):
+            store = FillStore()
+            store.importLegacy("ninjaFills.npy", startBlock=13000000)
+            print("Imported ninjaFills.npy into {}".format(store.path))
+
+        for basePath in NOTEBOOK_ARTIFACTS:
+            writeConverted(loadNotebookArtifact(basePath), basePath)
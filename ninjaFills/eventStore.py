@@ -0,0 +1,218 @@
+import os
+import re
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Addresses and hashes are stored as fixed-width binary rather than hex strings.
+# uint256 amounts are stored losslessly as 32 byte big-endian words, tagged through
+# field metadata so they can be told apart from hashes of the same width.
+ADDRESS = pa.binary(20)
+HASH = pa.binary(32)
+UINT256 = pa.binary(32)
+UINT256_METADATA = {"encoding": "uint256"}
+
+
+def uint256Field(name):
+    return pa.field(name, UINT256, metadata=UINT256_METADATA)
+
+
+def isUint256(field):
+    return field.metadata is not None and field.metadata.get(b"encoding") == b"uint256"
+
+
+NINJA_FILL_SCHEMA = pa.schema(
+    [
+        ("txHash", HASH),
+        ("orderHash", HASH),
+        ("maker", ADDRESS),
+        ("taker", ADDRESS),
+        ("makerToken", ADDRESS),
+        ("takerToken", ADDRESS),
+        uint256Field("makerTokenFilledAmount"),
+        uint256Field("takerTokenFilledAmount"),
+        ("gasLimit", pa.int64()),
+        ("gasUsed", pa.int64()),
+        ("gasPrice", pa.uint64()),
+        ("timestamp", pa.int64()),
+        ("blockNumber", pa.int64()),
+    ]
+)
+
+# One row per change of a hiding vault's compound_unhealth
+VAULT_HEALTH_SCHEMA = pa.schema(
+    [
+        ("vault", ADDRESS),
+        uint256Field("unhealth"),
+        ("timestamp", pa.int64()),
+        ("blockNumber", pa.int64()),
+    ]
+)
+
+ADDRESS_PATTERN = re.compile("^0x[0-9a-fA-F]{40}$")
+WORD_PATTERN = re.compile("^0x[0-9a-fA-F]{64}$")
+
+
+def hexToBytes(value):
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def toColumn(values, fieldType):
+    if pa.types.is_fixed_size_binary(fieldType):
+        values = [
+            None
+            if value is None
+            else hexToBytes(value)
+            if isinstance(value, str)
+            else int(value).to_bytes(fieldType.byte_width, "big")
+            for value in values
+        ]
+    return pa.array(values, type=fieldType)
+
+
+# Builds a table from a list of fill dicts with hex string addresses and int amounts
+def toTable(records, schema=NINJA_FILL_SCHEMA):
+    return pa.table(
+        {
+            field.name: toColumn([record[field.name] for record in records], field.type)
+            for field in schema
+        },
+        schema=schema,
+    )
+
+
+# Turns a table back into fill dicts shaped like the original pickled ones
+def toRecords(table):
+    columns = {}
+    for field, column in zip(table.schema, table.columns):
+        name = field.name
+        if isUint256(field):
+            columns[name] = uint256ToInts(column)
+        elif pa.types.is_fixed_size_binary(column.type):
+            columns[name] = [
+                None if value is None else "0x" + value.hex()
+                for value in column.to_pylist()
+            ]
+        else:
+            columns[name] = column.to_pylist()
+
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+# Zero-copy numpy "S<width>" view of a fixed-width binary column (nulls come back as zeros)
+def toFixedBytes(column):
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    width = column.type.byte_width
+    data = np.frombuffer(column.buffers()[1], dtype=np.uint8)
+    return data[column.offset * width : (column.offset + len(column)) * width].view("S{}".format(width))
+
+
+def _words(column):
+    return toFixedBytes(column).view(">u8").reshape(-1, 4)
+
+
+def uint256ToInts(column):
+    return [
+        None if value is None else int.from_bytes(value, "big")
+        for value in column.to_pylist()
+    ]
+
+
+# Vectorized, lossy conversion of a uint256 column to float64 (e.g. before dividing by decimals)
+def uint256ToFloat(column):
+    words = _words(column).astype(np.float64)
+    return words @ np.array([2.0**192, 2.0**128, 2.0**64, 1.0])
+
+
+# Writes an uncompressed Arrow IPC file so readers can memory map it without copying
+def writeTable(path, table):
+    tmpPath = path + ".tmp"
+    with pa.OSFile(tmpPath, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    fd = os.open(tmpPath, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmpPath, path)
+
+
+def readTable(path, columns=None, memoryMap=True):
+    source = pa.memory_map(path, "r") if memoryMap else pa.OSFile(path, "rb")
+    table = ipc.open_file(source).read_all()
+    return table.select(columns) if columns is not None else table
+
+
+def readTables(paths, columns=None, memoryMap=True, schema=None):
+    tables = [readTable(path, columns, memoryMap) for path in paths]
+    if tables:
+        return pa.concat_tables(tables)
+
+    schema = schema if columns is None else pa.schema([schema.field(c) for c in columns])
+    return schema.empty_table()
+
+
+# Splits a table by blockNumber range into one IPC file per partition
+def writePartitioned(directory, table, blocksPerPartition=1000000, blockColumn="blockNumber"):
+    os.makedirs(directory, exist_ok=True)
+    blocks = table.column(blockColumn).to_numpy()
+    partitions = blocks // blocksPerPartition
+
+    for partition in np.unique(partitions):
+        fromBlock = int(partition) * blocksPerPartition
+        toBlock = fromBlock + blocksPerPartition - 1
+        rows = np.flatnonzero(partitions == partition)
+        writeTable(
+            os.path.join(directory, "blocks-{:09d}-{:09d}.arrow".format(fromBlock, toBlock)),
+            table.take(pa.array(rows)),
+        )
+
+
+def readPartitioned(directory, columns=None, fromBlock=None, toBlock=None):
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".arrow"):
+            continue
+
+        start, end = (int(b) for b in name[len("blocks-") : -len(".arrow")].split("-"))
+        if (fromBlock is None or end >= fromBlock) and (toBlock is None or start <= toBlock):
+            paths.append(os.path.join(directory, name))
+
+    return readTables(paths, columns)
+
+
+# Picks an Arrow field for a column of Python values scraped into a notebook dataframe.
+# 32 byte hex words are kept as binary, whether they are hashes or raw uint256 amounts.
+def inferField(name, values):
+    present = [value for value in values if value is not None and value == value]
+
+    if present and all(isinstance(v, str) and ADDRESS_PATTERN.match(v) for v in present):
+        return pa.field(name, ADDRESS)
+    if present and all(isinstance(v, str) and WORD_PATTERN.match(v) for v in present):
+        return pa.field(name, HASH)
+    if present and all(isinstance(v, (bool, np.bool_)) for v in present):
+        return pa.field(name, pa.bool_())
+    if present and all(isinstance(v, (int, np.integer)) for v in present):
+        if all(-(2**63) <= int(v) < 2**63 for v in present):
+            return pa.field(name, pa.int64())
+        return uint256Field(name)
+    if present and all(isinstance(v, (int, float, np.number)) for v in present):
+        return pa.field(name, pa.float64())
+    return pa.field(name, pa.string())
+
+
+def inferTable(columns):
+    fields = []
+    arrays = []
+    for name, values in columns.items():
+        field = inferField(name, values)
+        values = [None if value != value else value for value in values]
+
+        if field.type == pa.string():
+            values = [None if value is None else str(value) for value in values]
+        fields.append(field)
+        arrays.append(toColumn(values, field.type))
+
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
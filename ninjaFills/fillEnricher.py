@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+
+from rpc import RpcError
+
+
+def toInt(value):
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+# Fetches transaction, receipt and block data for a whole window of logs at once
+# using JSON-RPC batches. Every block header is fetched only once and the most
+# recent timestamps are kept across windows since consecutive windows share blocks.
+class FillEnricher:
+    def __init__(self, rpc, batchSize=100, concurrency=4, blockCacheSize=50000):
+        self.rpc = rpc
+        self.batchSize = batchSize
+        self.concurrency = concurrency
+        self.blockCacheSize = blockCacheSize
+        self.blockTimestamps = OrderedDict()
+
+    def _runBatches(self, calls):
+        batches = [
+            calls[i : i + self.batchSize] for i in range(0, len(calls), self.batchSize)
+        ]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            results = list(pool.map(self.rpc.batch, batches))
+
+        return [result for batch in results for result in batch]
+
+    def _cacheBlock(self, blockNumber, timestamp):
+        self.blockTimestamps[blockNumber] = timestamp
+        self.blockTimestamps.move_to_end(blockNumber)
+
+        while len(self.blockTimestamps) > self.blockCacheSize:
+            self.blockTimestamps.popitem(last=False)
+
+    # Returns {txHash: {gasLimit, gasUsed, gasPrice, timestamp, blockNumber}} for the logs.
+    # Raises RpcError if the node has no transaction, receipt or block for one of them.
+    def enrich(self, logs):
+        txHashes = list(dict.fromkeys(log["transactionHash"] for log in logs))
+        blockNumbers = list(dict.fromkeys(toInt(log["blockNumber"]) for log in logs))
+
+        # Cache hits count as recent uses, so the cache evicts the least recently used blocks
+        timestamps = {}
+        missingBlocks = []
+        for b in blockNumbers:
+            if b in self.blockTimestamps:
+                self.blockTimestamps.move_to_end(b)
+                timestamps[b] = self.blockTimestamps[b]
+            else:
+                missingBlocks.append(b)
+
+        calls = (
+            [("eth_getTransactionByHash", [txHash]) for txHash in txHashes]
+            + [("eth_getTransactionReceipt", [txHash]) for txHash in txHashes]
+            + [("eth_getBlockByNumber", [hex(b), False]) for b in missingBlocks]
+        )
+        results = self._runBatches(calls)
+
+        # A node lagging behind the one that served the logs answers null for them
+        nulls = [call for call, result in zip(calls, results) if result is None]
+        if nulls:
+            method, params = nulls[0]
+            raise RpcError(
+                None,
+                "{} returned null for {} ({} null results in the window)".format(
+                    method, params[0], len(nulls)
+                ),
+            )
+
+        txns = results[: len(txHashes)]
+        receipts = results[len(txHashes) : 2 * len(txHashes)]
+        blocks = results[2 * len(txHashes) :]
+
+        for blockNumber, block in zip(missingBlocks, blocks):
+            timestamps[blockNumber] = toInt(block["timestamp"])
+            self._cacheBlock(blockNumber, timestamps[blockNumber])
+
+        enriched = {}
+        for txHash, txn, receipt in zip(txHashes, txns, receipts):
+            blockNumber = toInt(txn["blockNumber"])
+
+            enriched[txHash] = {
+                "gasLimit": toInt(txn["gas"]),
+                "gasUsed": toInt(receipt["gasUsed"]),
+                "gasPrice": toInt(txn["gasPrice"]),
+                "timestamp": timestamps[blockNumber],
+                "blockNumber": blockNumber,
+            }
+
+        return enriched
@@ -0,0 +1,189 @@
+import os
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from eventStore import NINJA_FILL_SCHEMA, toTable, toRecords, writeTable, readTable, readTables
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def writeAtomic(path, write):
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpPath, path)
+
+
+# Builds a fill table from decoded RfqOrderFilled columns and the per txn gas data
+def fillTable(decoded, logs, gasData):
+    gas = [gasData[log["transactionHash"]] for log in logs]
+    columns = {
+        "txHash": decoded["transactionHash"],
+        "orderHash": decoded["orderHash"],
+        "maker": decoded["maker"],
+        "taker": decoded["taker"],
+        "makerToken": decoded["makerToken"],
+        "takerToken": decoded["takerToken"],
+        "makerTokenFilledAmount": decoded["makerTokenFilledAmount"],
+        "takerTokenFilledAmount": decoded["takerTokenFilledAmount"],
+    }
+    for name in ["gasLimit", "gasUsed", "gasPrice", "timestamp", "blockNumber"]:
+        columns[name] = [txn[name] for txn in gas]
+
+    return pa.Table.from_arrays(
+        [pa.array(columns[field.name], type=field.type) for field in NINJA_FILL_SCHEMA],
+        schema=NINJA_FILL_SCHEMA,
+    )
+
+
+# True if a legacy fill row was written by the old fixed-offset slicing, which read the
+# event's takerTokenFilledAmount (emitted first) into makerTokenFilledAmount and the other
+# way round. It built each dict with the maker amount first, while rows sliced in event
+# order have the taker amount first.
+def legacyAmountsSwapped(fill):
+    keys = list(fill)
+    return keys.index("makerTokenFilledAmount") < keys.index("takerTokenFilledAmount")
+
+
+# A legacy fill row as the decoder would have produced it, with the filled amounts put
+# back in their columns when swapAmounts (by default legacyAmountsSwapped) says so
+def legacyFill(fill, swapAmounts=None):
+    fill = dict(fill)
+    if swapAmounts is None:
+        swapAmounts = legacyAmountsSwapped(fill)
+    if swapAmounts:
+        fill["makerTokenFilledAmount"], fill["takerTokenFilledAmount"] = (
+            fill["takerTokenFilledAmount"],
+            fill["makerTokenFilledAmount"],
+        )
+    return fill
+
+
+# Append-only on-disk fill dataset. Each committed block range is written as its
+# own Arrow chunk file, then the checkpoint is moved forward to the last fully processed
+# block, so a crashed scrape resumes from the checkpoint without losing any work.
+# Other per-block event tables can be kept the same way with their own schema and prefix.
+class FillStore:
+    def __init__(self, path="ninjaFillsData", schema=NINJA_FILL_SCHEMA, prefix="fills"):
+        self.path = path
+        self.schema = schema
+        self.prefix = prefix
+        os.makedirs(path, exist_ok=True)
+        self._recover()
+
+    @property
+    def lastBlock(self):
+        checkpointPath = os.path.join(self.path, CHECKPOINT_FILE)
+        if not os.path.exists(checkpointPath):
+            return None
+
+        with open(checkpointPath) as f:
+            return json.load(f)["lastBlock"]
+
+    def chunkName(self, fromBlock, toBlock):
+        return "{}-{:09d}-{:09d}.arrow".format(self.prefix, fromBlock, toBlock)
+
+    def chunks(self):
+        chunks = []
+        for name in os.listdir(self.path):
+            if name.startswith(self.prefix + "-") and name.endswith(".arrow"):
+                fromBlock, toBlock = name[len(self.prefix) + 1 : -len(".arrow")].split("-")
+                chunks.append((int(fromBlock), int(toBlock), name))
+
+        return sorted(chunks)
+
+    # Drops chunks past the checkpoint and chunks already merged into a larger one,
+    # which are left behind when a commit, compaction or rollback is interrupted
+    def _recover(self):
+        lastBlock = self.lastBlock
+        chunks = []
+
+        for fromBlock, toBlock, name in self.chunks():
+            if lastBlock is None or toBlock > lastBlock:
+                os.remove(os.path.join(self.path, name))
+            else:
+                chunks.append((fromBlock, toBlock, name))
+
+        for fromBlock, toBlock, name in chunks:
+            merged = any(
+                otherFrom <= fromBlock
+                and toBlock <= otherTo
+                and (otherFrom, otherTo) != (fromBlock, toBlock)
+                for otherFrom, otherTo, _ in chunks
+            )
+            if merged:
+                os.remove(os.path.join(self.path, name))
+
+    def _setCheckpoint(self, lastBlock):
+        writeAtomic(
+            os.path.join(self.path, CHECKPOINT_FILE),
+            lambda f: f.write(json.dumps({"lastBlock": lastBlock}).encode()),
+        )
+
+    # Durably stores the fills found in [fromBlock, toBlock] and advances the checkpoint.
+    # fills is either a list of fill dicts or an Arrow table with the store's schema
+    def commit(self, fromBlock, toBlock, fills):
+        lastBlock = self.lastBlock
+        if lastBlock is not None and fromBlock != lastBlock + 1:
+            raise ValueError(
+                "Block {} does not follow checkpoint {}".format(fromBlock, lastBlock)
+            )
+
+        if len(fills):
+            table = fills if isinstance(fills, pa.Table) else toTable(fills, self.schema)
+            writeTable(os.path.join(self.path, self.chunkName(fromBlock, toBlock)), table)
+
+        self._setCheckpoint(toBlock)
+
+    # Drops everything after blockNumber, e.g. blocks orphaned by a reorg, and moves the
+    # checkpoint back to it. The truncated chunk is written before the checkpoint moves so
+    # an interrupted rollback recovers to either the old or the new state.
+    def rollback(self, blockNumber):
+        chunks = self.chunks()
+        for fromBlock, toBlock, name in chunks:
+            if fromBlock <= blockNumber < toBlock:
+                table = readTable(os.path.join(self.path, name), memoryMap=False)
+                kept = table.filter(pc.less_equal(table.column("blockNumber"), blockNumber))
+                writeTable(os.path.join(self.path, self.chunkName(fromBlock, blockNumber)), kept)
+
+        self._setCheckpoint(blockNumber)
+        for fromBlock, toBlock, name in chunks:
+            if toBlock > blockNumber:
+                os.remove(os.path.join(self.path, name))
+
+    # Memory maps the chunks and returns only the requested columns as one Arrow table
+    def load(self, columns=None):
+        paths = [os.path.join(self.path, name) for _, _, name in self.chunks()]
+        return readTables(paths, columns, schema=self.schema)
+
+    def loadRecords(self, columns=None):
+        return toRecords(self.load(columns))
+
+    # Merges the chunk files into one once there are more than maxChunks of them, so the
+    # store doesn't accumulate a file per cron tick
+    def compact(self, maxChunks=32):
+        chunks = self.chunks()
+        if len(chunks) <= maxChunks:
+            return
+
+        fills = self.load().combine_chunks()
+        name = self.chunkName(chunks[0][0], chunks[-1][1])
+        writeTable(os.path.join(self.path, name), fills)
+
+        for _, _, oldName in chunks:
+            if oldName != name:
+                os.remove(os.path.join(self.path, oldName))
+
+    # Seeds an empty store from a ninjaFills.npy produced by the old batch scrape. See
+    # legacyFill for the filled amounts, swapAmounts=None detects their order per row.
+    def importLegacy(self, path, startBlock, swapAmounts=None):
+        if self.lastBlock is not None:
+            return
+
+        fills = np.load(path, allow_pickle=True)
+        lastBlock = max(fill["blockNumber"] for fill in fills)
+        self.commit(startBlock, lastBlock, [legacyFill(fill, swapAmounts) for fill in fills])
@@ -0,0 +1,229 @@
+from time import sleep
+from collections import OrderedDict
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from logScraper import LogScraper
+from fillEnricher import FillEnricher, toInt
+from fillStore import fillTable
+from eventStore import VAULT_HEALTH_SCHEMA, toTable
+from multicallExecutor import MulticallExecutor
+from hidingVaults import hv_unhealth_calls
+
+
+# Rows from blocks that aren't confirmed yet. They are handed out as soon as they're
+# seen and only committed to the store once they are confirmations deep.
+class PendingRows:
+    def __init__(self, store, startBlock):
+        self.store = store
+        self.startBlock = startBlock
+        self.table = store.schema.empty_table()
+
+    def add(self, table):
+        if table.num_rows:
+            self.table = pa.concat_tables([self.table, table])
+
+    def upTo(self, blockNumber):
+        return self.table.filter(pc.less_equal(self.table.column("blockNumber"), blockNumber))
+
+    def after(self, blockNumber):
+        return self.table.filter(pc.greater(self.table.column("blockNumber"), blockNumber))
+
+    # Commits everything up to blockNumber to the store
+    def confirm(self, blockNumber):
+        lastBlock = self.store.lastBlock
+        fromBlock = self.startBlock if lastBlock is None else lastBlock + 1
+        if blockNumber < fromBlock:
+            return
+
+        self.store.commit(fromBlock, blockNumber, self.upTo(blockNumber).combine_chunks())
+        self.table = self.after(blockNumber)
+        self.store.compact()
+
+    # Forgets everything after blockNumber, rolling the store back as well if a reorg
+    # went deeper than the confirmation depth
+    def rollback(self, blockNumber):
+        self.table = self.upTo(blockNumber)
+        if self.store.lastBlock is not None and self.store.lastBlock > blockNumber:
+            self.store.rollback(blockNumber)
+
+
+# Samples compound_unhealth of every vault at each new head and records the vaults whose
+# value changed since the previous sample
+class VaultHealthWatcher:
+    def __init__(self, w3, vaults, store, startBlock):
+        self.w3 = w3
+        self.vaults = [vault.lower() for vault in vaults]
+        self.pending = PendingRows(store, startBlock)
+        self.last = self._lastValues(store.load(["vault", "unhealth"]))
+
+    @staticmethod
+    def _lastValues(table):
+        return {
+            "0x" + vault.hex(): int.from_bytes(unhealth, "big")
+            for vault, unhealth in zip(
+                table.column("vault").to_pylist(), table.column("unhealth").to_pylist()
+            )
+        }
+
+    def sample(self, blockNumber, timestamp):
+        executor = MulticallExecutor(self.w3, blockId=blockNumber)
+        values = executor(hv_unhealth_calls(self.vaults))
+
+        changes = [
+            {"vault": vault, "unhealth": unhealth, "timestamp": timestamp, "blockNumber": blockNumber}
+            for vault, unhealth in values.items()
+            if self.last.get(vault) != unhealth
+        ]
+        self.last.update({change["vault"]: change["unhealth"] for change in changes})
+
+        table = toTable(changes, VAULT_HEALTH_SCHEMA)
+        self.pending.add(table)
+        return table
+
+    def rollback(self, blockNumber):
+        self.pending.rollback(blockNumber)
+        stored = self.pending.store.load(["vault", "unhealth"])
+        pending = self.pending.table.select(["vault", "unhealth"])
+        self.last = self._lastValues(pa.concat_tables([stored, pending]))
+
+
+# Follows the chain head, pushing the logs matched by logFilter into a store as they
+# arrive. Every poll picks up all blocks since the last one, so a poll interval shorter
+# than the block time sees each block within a fraction of it. New fills go to onFills
+# straight away and are committed to the store once confirmations blocks deep.
+#
+# The hashes of the last maxReorgDepth blocks are kept. When a new block doesn't build
+# on the block seen before it, the follower walks back to the last block the node still
+# agrees on and drops everything after it (from the store too, if already committed).
+class Follower:
+    def __init__(
+        self,
+        rpc,
+        store,
+        logFilter,
+        address,
+        startBlock,
+        healthWatcher=None,
+        confirmations=12,
+        maxReorgDepth=64,
+        pollInterval=1.0,
+        onFills=None,
+        onHealth=None,
+        onRollback=None,
+    ):
+        if maxReorgDepth <= confirmations:
+            raise ValueError("maxReorgDepth must be larger than confirmations")
+
+        self.rpc = rpc
+        self.logFilter = logFilter
+        self.enricher = FillEnricher(rpc)
+        self.scraper = LogScraper(rpc, address=address, topics=logFilter.topics)
+        self.fills = PendingRows(store, startBlock)
+        self.healthWatcher = healthWatcher
+        self.confirmations = confirmations
+        self.maxReorgDepth = maxReorgDepth
+        self.pollInterval = pollInterval
+        self.onFills = onFills
+        self.onHealth = onHealth
+        self.onRollback = onRollback
+
+        self.lastBlock = startBlock - 1 if store.lastBlock is None else store.lastBlock
+        self.hashes = OrderedDict()
+
+        self.reorgCount = 0
+        self.fillCount = 0
+
+    def getBlocks(self, blockNumbers):
+        blocks = self.rpc.batch([("eth_getBlockByNumber", [hex(n), False]) for n in blockNumbers])
+        return dict(zip(blockNumbers, blocks))
+
+    def _commonAncestor(self):
+        blockNumbers = list(reversed(self.hashes))
+        blocks = self.getBlocks(blockNumbers)
+
+        for blockNumber in blockNumbers:
+            block = blocks[blockNumber]
+            if block is not None and block["hash"] == self.hashes[blockNumber]:
+                return blockNumber
+
+        raise RuntimeError("Reorg deeper than {} blocks".format(self.maxReorgDepth))
+
+    def rollback(self, blockNumber):
+        self.fills.rollback(blockNumber)
+        if self.healthWatcher is not None:
+            self.healthWatcher.rollback(blockNumber)
+
+        for n in [n for n in self.hashes if n > blockNumber]:
+            del self.hashes[n]
+            self.enricher.blockTimestamps.pop(n, None)
+
+        self.lastBlock = blockNumber
+        self.reorgCount += 1
+        if self.onRollback:
+            self.onRollback(blockNumber)
+
+    # Processes every block since the last poll, returns how many were processed
+    def poll(self):
+        head = toInt(self.rpc.call("eth_blockNumber"))
+        if head <= self.lastBlock:
+            return 0
+
+        fromBlock = self.lastBlock + 1
+        recent = list(range(max(fromBlock, head - self.maxReorgDepth + 1), head + 1))
+        blocks = self.getBlocks(sorted({fromBlock, *recent}))
+        if any(block is None for block in blocks.values()):
+            return 0
+
+        # A new block that doesn't build on the last one seen means the chain reorganised
+        parentHash = self.hashes.get(self.lastBlock)
+        if parentHash is not None and blocks[fromBlock]["parentHash"] != parentHash:
+            self.rollback(self._commonAncestor())
+            return self.poll()
+
+        # The node switched forks while the headers were fetched, try again next poll
+        if any(
+            blocks[n]["parentHash"] != blocks[n - 1]["hash"] for n in recent[1:]
+        ):
+            return 0
+
+        logs = [log for _, _, window in self.scraper.scrape(fromBlock, head) for log in window]
+        if any(
+            log.get("removed")
+            or (toInt(log["blockNumber"]) in blocks and log["blockHash"] != blocks[toInt(log["blockNumber"])]["hash"])
+            for log in logs
+        ):
+            return 0
+
+        kept, decoded = self.logFilter.apply(logs)
+        if kept:
+            fills = fillTable(decoded, kept, self.enricher.enrich(kept))
+            self.fills.add(fills)
+            self.fillCount += fills.num_rows
+            if self.onFills:
+                self.onFills(fills)
+
+        if self.healthWatcher is not None:
+            changes = self.healthWatcher.sample(head, toInt(blocks[head]["timestamp"]))
+            if changes.num_rows and self.onHealth:
+                self.onHealth(changes)
+
+        for n in recent:
+            self.hashes[n] = blocks[n]["hash"]
+        while len(self.hashes) > self.maxReorgDepth:
+            self.hashes.popitem(last=False)
+        self.lastBlock = head
+
+        confirmedBlock = head - self.confirmations
+        self.fills.confirm(confirmedBlock)
+        if self.healthWatcher is not None:
+            self.healthWatcher.pending.confirm(confirmedBlock)
+
+        return head - fromBlock + 1
+
+    def run(self, maxPolls=None):
+        polls = 0
+        while maxPolls is None or polls < maxPolls:
+            self.poll()
+            polls += 1
+            sleep(self.pollInterval)
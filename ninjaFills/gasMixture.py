@@ -0,0 +1,145 @@
+import os
+import json
+import numpy as np
+
+from fillStore import writeAtomic
+from hopStats import HOP_CUTOFFS
+
+MIXTURE_FILE = "gasMixture.json"
+
+# Keeps a component from collapsing onto a handful of identical gas values
+MIN_STD = 1000.0
+
+
+# Gaussian mixture over the gas used by fills, one component per number of legs, fitted
+# with EM over the whole gas column at once in float32. Components are kept sorted by
+# mean so component 0 is the one leg fills. fit() carries on from the current
+# parameters, so refitting after new fills arrive only takes a few iterations; a fresh
+# mixture starts from the hand-picked HOP_CUTOFFS split.
+class GasMixture:
+    def __init__(self, means=None, stds=None, weights=None, numComponents=3):
+        self.means = None if means is None else np.asarray(means, dtype=np.float64)
+        self.stds = None if stds is None else np.asarray(stds, dtype=np.float64)
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.numComponents = numComponents if means is None else len(means)
+
+        self.iterations = 0
+        self.logLikelihood = None
+
+    @property
+    def fitted(self):
+        return self.means is not None
+
+    def _partition(self, gas, cutoffs):
+        legs = np.digitize(gas, cutoffs)
+        return [gas[legs == k] for k in range(self.numComponents)]
+
+    # Splits the gas column at HOP_CUTOFFS (or its quantiles for other component counts).
+    # If that leaves a component without fills, e.g. when every fill so far is one leg,
+    # it splits the distinct gas values into equal runs instead, which never leaves one
+    # empty, rather than starting EM from the NaN mean of an empty component.
+    def _initialise(self, gas):
+        distinct = np.unique(gas)
+        if len(distinct) < self.numComponents:
+            raise ValueError(
+                "Need at least {} distinct gas values to fit {} components, got {}".format(
+                    self.numComponents, self.numComponents, len(distinct)
+                )
+            )
+
+        cutoffs = HOP_CUTOFFS if self.numComponents == len(HOP_CUTOFFS) + 1 else np.quantile(
+            gas, np.linspace(0, 1, self.numComponents + 1)[1:-1]
+        )
+        parts = self._partition(gas, cutoffs)
+        if any(len(part) == 0 for part in parts):
+            runStarts = np.arange(1, self.numComponents) * len(distinct) // self.numComponents
+            parts = self._partition(gas, distinct[runStarts])
+        self.means = np.array([part.mean(dtype=np.float64) for part in parts])
+        self.stds = np.array([max(part.std(dtype=np.float64), MIN_STD) for part in parts])
+        self.weights = np.array([len(part) / len(gas) for part in parts])
+
+    # (fills, components) log of weight * density of each fill under each component
+    def _weightedLogDensities(self, gas):
+        means = self.means.astype(np.float32)
+        stds = self.stds.astype(np.float32)
+        z = (gas[:, None] - means) / stds
+        with np.errstate(divide="ignore"):
+            logWeights = np.log(self.weights / self.stds / np.sqrt(2 * np.pi)).astype(np.float32)
+        return logWeights - 0.5 * z * z
+
+    def _posteriors(self, gas):
+        logDensities = self._weightedLogDensities(gas)
+        peak = logDensities.max(axis=1, keepdims=True)
+        densities = np.exp(logDensities - peak)
+        total = densities.sum(axis=1, keepdims=True)
+        densities /= total
+        logLikelihood = float(np.mean(peak[:, 0] + np.log(total[:, 0]), dtype=np.float64))
+        return densities, logLikelihood
+
+    # Runs EM until the mean log likelihood improves by less than tol, returns self
+    def fit(self, gas, maxIterations=200, tol=1e-6):
+        gas = np.asarray(gas, dtype=np.float32)
+        if not self.fitted:
+            self._initialise(gas)
+
+        previous = -np.inf
+        self.iterations = 0
+        for _ in range(maxIterations):
+            posteriors, logLikelihood = self._posteriors(gas)
+            self.iterations += 1
+
+            # A component no fill is assigned to keeps its mean and std with zero weight
+            # rather than turning NaN
+            counts = posteriors.sum(axis=0, dtype=np.float64)
+            empty = counts == 0
+            safeCounts = np.where(empty, 1.0, counts)
+            means = np.where(empty, self.means, (posteriors.T @ gas).astype(np.float64) / safeCounts)
+            deviations = gas[:, None] - means.astype(np.float32)
+            variances = np.einsum("nk,nk->k", posteriors, deviations * deviations).astype(np.float64) / safeCounts
+
+            self.means = means
+            self.stds = np.where(empty, self.stds, np.maximum(np.sqrt(variances), MIN_STD))
+            self.weights = counts / len(gas)
+
+            if logLikelihood - previous < tol:
+                break
+            previous = logLikelihood
+
+        order = np.argsort(self.means)
+        self.means, self.stds, self.weights = self.means[order], self.stds[order], self.weights[order]
+        self.logLikelihood = logLikelihood
+        return self
+
+    # (fills, components) probability of each fill having each number of legs
+    def probabilities(self, gas):
+        return self._posteriors(np.asarray(gas, dtype=np.float32))[0]
+
+    def classify(self, gas):
+        return np.argmax(self._weightedLogDensities(np.asarray(gas, dtype=np.float32)), axis=1)
+
+    # Gas values where the most likely component changes from one to the next
+    def cutoffs(self, resolution=100000):
+        cutoffs = []
+        for k in range(self.numComponents - 1):
+            x = np.linspace(self.means[k], self.means[k + 1], resolution)
+            z = (x[:, None] - self.means[k : k + 2]) / self.stds[k : k + 2]
+            logDensities = np.log(self.weights[k : k + 2] / self.stds[k : k + 2]) - 0.5 * z * z
+            upper = np.nonzero(logDensities[:, 1] > logDensities[:, 0])[0]
+            cutoffs.append(float(x[upper[0]]) if len(upper) else float(x[-1]))
+        return cutoffs
+
+    def save(self, path=MIXTURE_FILE):
+        params = {
+            "means": self.means.tolist(),
+            "stds": self.stds.tolist(),
+            "weights": self.weights.tolist(),
+        }
+        writeAtomic(path, lambda f: f.write(json.dumps(params).encode()))
+
+    # Loads the last saved fit to warm start from, or an unfitted mixture if there is none
+    @classmethod
+    def load(cls, path=MIXTURE_FILE, numComponents=3):
+        if not os.path.exists(path):
+            return cls(numComponents=numComponents)
+        with open(path) as f:
+            return cls(**json.load(f))
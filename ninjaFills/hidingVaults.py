@@ -5,17 +5,25 @@ import numpy as np
 from scipy.stats import norm
 import matplotlib.pyplot as plt
 import os
+import sys
 from os.path import exists
 from dotenv import load_dotenv
-from functools import reduce
-from multicall import Call, Multicall
+from multicall import Call
+
+from multicallExecutor import MulticallExecutor
+from callCache import CallCache
+from priceService import PriceService
 
 load_dotenv()
 INFURA_KEY = os.getenv("INFURA_KEY")
 
 w3 = Web3(Web3.HTTPProvider("https://mainnet.infura.io/v3/{}".format(INFURA_KEY)))
 
+# Splits every batch of contract calls into gas/size bounded multicalls run in parallel
+executor = MulticallExecutor(w3)
+
 HIDING_VAULT_NFT_ADDRESS = "0xE2aD581Fc01434ee426BB3F471C4cB0317Ee672E"
+BLOCKS_PER_DAY = 6500
 COMPOUND_TOKENS = json.load(open("ctokens.json"))
 CTOKENS = {
     token: COMPOUND_TOKENS[token] for token in COMPOUND_TOKENS if token[0] == "c"
@@ -24,6 +32,10 @@ UNDERLYING_TOKENS = {
     token: COMPOUND_TOKENS[token] for token in COMPOUND_TOKENS if token[0] != "c"
 }
 
+# Column order of the vault x token balance matrices
+TOKENS = [cToken[1:] for cToken in CTOKENS]
+DECIMALS = np.array([COMPOUND_TOKENS[token]["decimals"] for token in TOKENS])
+
 
 def to_decimal(value, token):
     return value / (10 ** COMPOUND_TOKENS[token]["decimals"])
@@ -34,12 +46,11 @@ def to_address(value):
     return address
 
 
-# Fetches the address of each HidingVaultNFT using tokenByIndex
-def get_hv_addresses(numTokens):
+def hv_address_calls(numTokens):
 
     HidingVaultNFTAddress = HIDING_VAULT_NFT_ADDRESS
 
-    calls = [
+    return [
         Call(
             HidingVaultNFTAddress,
             ["tokenByIndex(uint256)(uint256)", i],
@@ -47,18 +58,13 @@ def get_hv_addresses(numTokens):
         )
         for i in range(numTokens)
     ]
-    multi = Multicall(calls, _w3=w3)
-    result = multi()
 
-    return [address for (index, address) in result.items()]
 
-
-# Fetches the owner of each HidingVaultNFT
-def get_hv_owners(vaultAddresses):
+def hv_owner_calls(vaultAddresses):
 
     HidingVaultNFTAddress = HIDING_VAULT_NFT_ADDRESS
 
-    calls = [
+    return [
         Call(
             HidingVaultNFTAddress,
             ["ownerOf(uint256)(address)", w3.toInt(hexstr=vault)],
@@ -66,227 +72,190 @@ def get_hv_owners(vaultAddresses):
         )
         for vault in vaultAddresses
     ]
-    multi = Multicall(calls, _w3=w3)
-    result = multi()
-
-    return result
-
 
-# Fetches compound_isUnderwritten status for each vaultAddress
-def get_hv_underwritten_status(vaultAddresses):
 
-    calls = [
+def hv_underwritten_calls(vaultAddresses):
+    return [
         Call(vault, ["compound_isUnderwritten()(bool)"], [[vault, None]])
         for vault in vaultAddresses
     ]
-    multi = Multicall(calls, _w3=w3)
-    result = multi()
-
-    return result
 
 
-# Fetches compound_unhealth value for each vaultAddress
-def get_hv_unhealth(vaultAddresses):
-
-    calls = [
+def hv_unhealth_calls(vaultAddresses):
+    return [
         Call(vault, ["compound_unhealth()(uint256)"], [[vault, None]])
         for vault in vaultAddresses
     ]
-    multi = Multicall(calls, _w3=w3)
-    result = multi()
-
-    return result
-
 
-# Fetches the token balances supplied to the Compound protocol by each HidingVaultNFT
-def get_hv_supply_balances(vaultAddresses):
 
-    calls = [
+def hv_supply_calls(vaultAddresses):
+    return [
         Call(
             CTOKENS[cToken]["address"],
             ["balanceOfUnderlying(address)(uint256)", vault],
-            [[f"{vault}:{cToken[1:]}", None]],
+            [[(i, j), None]],
         )
-        for cToken in CTOKENS
-        for vault in vaultAddresses
+        for j, cToken in enumerate(CTOKENS)
+        for i, vault in enumerate(vaultAddresses)
     ]
-    multi = Multicall(calls, _w3=w3)
-    result = multi()
-
-    # Filter out zero balances
-    balances = {key: value for (key, value) in result.items()}  # if value > 0 }
-
-    # Compile balances by vault address with this horrific reducer (whoever is reading this, I apologize)
-    balances = reduce(
-        lambda x, y: x
-        | {
-            y[0]: {y[1]: to_decimal(y[2], y[1])} | x[y[0]]
-            if y[0] in x.keys()
-            else {y[1]: to_decimal(y[2], y[1])}
-        },
-        map(lambda x: (x[0].split(":")[0], x[0].split(":")[1], x[1]), balances.items()),
-        {},
-    )
-
-    return balances
 
 
-# Fetches the token balances borrowed from the Compound protocol by each HidingVaultNFT
-def get_hv_borrow_balances(vaultAddresses):
-
-    calls = [
+def hv_borrow_calls(vaultAddresses):
+    return [
         Call(
             CTOKENS[cToken]["address"],
             ["borrowBalanceCurrent(address)(uint256)", vault],
-            [[f"{vault}:{cToken[1:]}", None]],
+            [[(i, j), None]],
         )
-        for cToken in CTOKENS
-        for vault in vaultAddresses
+        for j, cToken in enumerate(CTOKENS)
+        for i, vault in enumerate(vaultAddresses)
     ]
-    multi = Multicall(calls, _w3=w3)
-    result = multi()
-
-    # Filter out zero balances
-    balances = {key: value for (key, value) in result.items()}  # if value > 0 }
-
-    # Compile balances by vault address with this horrific reducer (whoever is reading this, I apologize)
-    balances = reduce(
-        lambda x, y: x
-        | {
-            y[0]: {y[1]: to_decimal(y[2], y[1])} | x[y[0]]
-            if y[0] in x.keys()
-            else {y[1]: to_decimal(y[2], y[1])}
-        },
-        map(lambda x: (x[0].split(":")[0], x[0].split(":")[1], x[1]), balances.items()),
-        {},
-    )
 
-    return balances
 
+# Fetches the number of HidingVaultNFTs
+def get_hv_count():
+    return executor(
+        [Call(HIDING_VAULT_NFT_ADDRESS, ["totalSupply()(uint256)"], [["numVaults", None]])]
+    )["numVaults"]
 
-# Fetch usd token prices from coingecko
-def fetch_token_prices():
 
-    COINGECKO_ERC20_PRICE_URL = (
-        "https://api.coingecko.com/api/v3/simple/token_price/ethereum"
-    )
-    COINGECKO_ETH_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
-
-    payload = {
-        "contract_addresses": (",").join(
-            [
-                COMPOUND_TOKENS[token]["address"].lower()
-                for token in COMPOUND_TOKENS
-                if token != "ETH"
-            ]
-        ),
-        "vs_currencies": "usd",
+# Fetches the address of each HidingVaultNFT using tokenByIndex
+def get_hv_addresses(numTokens):
+
+    result = executor(hv_address_calls(numTokens))
+
+    return [result[index] for index in range(numTokens)]
+
+
+# Fetches the owner of each HidingVaultNFT
+def get_hv_owners(vaultAddresses):
+    return executor(hv_owner_calls(vaultAddresses))
+
+
+# Fetches compound_isUnderwritten status for each vaultAddress
+def get_hv_underwritten_status(vaultAddresses):
+    return executor(hv_underwritten_calls(vaultAddresses))
+
+
+# Fetches compound_unhealth value for each vaultAddress
+def get_hv_unhealth(vaultAddresses):
+    return executor(hv_unhealth_calls(vaultAddresses))
+
+
+# Arranges {(vaultIndex, tokenIndex): raw balance} multicall results into a
+# vaults x tokens matrix of balances scaled by each token's decimals
+def balance_matrix(result, numVaults):
+    balances = np.zeros((numVaults, len(TOKENS)))
+    if result:
+        rows, columns = zip(*result.keys())
+        balances[rows, columns] = np.array(list(result.values()), dtype=np.float64)
+
+    return balances / 10.0**DECIMALS
+
+
+# {vault: {token: balance}} for the json output, tokens in the same (reversed) order the
+# old dict merging produced them
+def balance_dicts(balances, vaultAddresses):
+    tokens = TOKENS[::-1]
+    return {
+        vault: dict(zip(tokens, row))
+        for vault, row in zip(vaultAddresses, balances[:, ::-1].tolist())
     }
 
-    r = requests.get(COINGECKO_ERC20_PRICE_URL, params=payload)
-    response = r.json()
 
-    usdPrices = {token: 0 for token in COMPOUND_TOKENS}
-    for token in COMPOUND_TOKENS:
-        if COMPOUND_TOKENS[token]["address"].lower() in response.keys():
-            usdPrices[token] = response[COMPOUND_TOKENS[token]["address"].lower()][
-                "usd"
-            ]
+# Fetches the token balances supplied to the Compound protocol by each HidingVaultNFT
+def get_hv_supply_balances(vaultAddresses):
+    return balance_matrix(executor(hv_supply_calls(vaultAddresses)), len(vaultAddresses))
 
-    payload = {"ids": "ethereum", "vs_currencies": "usd"}
 
-    r = requests.get(COINGECKO_ETH_PRICE_URL, params=payload)
-    response = r.json()
+# Fetches the token balances borrowed from the Compound protocol by each HidingVaultNFT
+def get_hv_borrow_balances(vaultAddresses):
+    return balance_matrix(executor(hv_borrow_calls(vaultAddresses)), len(vaultAddresses))
 
-    usdPrices["ETH"] = response["ethereum"]["usd"]
 
-    return usdPrices
+# Fetch usd token prices from coingecko, through the cached price service
+def fetch_token_prices(price_service=None):
+    if price_service is None:
+        price_service = PriceService()
 
+    addresses = {
+        token: "ETH" if token == "ETH" else COMPOUND_TOKENS[token]["address"]
+        for token in COMPOUND_TOKENS
+    }
+    spot = price_service.spot(list(addresses.values()))
+
+    return {token: spot[address] or 0 for token, address in addresses.items()}
 
-def get_all_vault_data():
 
-    # Load HidingVaultNFT contract ABI
-    address = HIDING_VAULT_NFT_ADDRESS
-    abi = json.load(open("ABI/HidingVaultNFT.json"))
-    HidingVaultNFT = w3.eth.contract(address=address, abi=abi)
+# Fetches a snapshot of every hiding vault at blockNumber (default latest) and writes it to path.
+# Every call is made at that one block and cached on disk, so re-running a snapshot is free.
+def get_all_vault_data(blockNumber=None, usdPrices=None, path="hidingVaults.json"):
 
-    # Fetch latest block number and timestamp
-    latestBlock = w3.eth.get_block("latest")
+    # Fetch block number and timestamp, then pin all reads to it
+    latestBlock = w3.eth.get_block("latest" if blockNumber is None else blockNumber)
     latestBlockNumber = latestBlock.number
     latestBlockTimestamp = latestBlock.timestamp
-    print("Latest Block: {}".format(latestBlockNumber))
+    print("Block: {}".format(latestBlockNumber))
+
+    snapshot = MulticallExecutor(w3, blockId=latestBlockNumber, cache=CallCache())
 
     # Fetch total supply of HidingVaultNFT tokens
-    numVaults = HidingVaultNFT.functions.totalSupply().call()
+    numVaults = snapshot(
+        [Call(HIDING_VAULT_NFT_ADDRESS, ["totalSupply()(uint256)"], [["numVaults", None]])]
+    )["numVaults"]
     print("HidingVaultNFT total supply: {}".format(numVaults))
 
     # Fetch addresses of each hiding vault
-    vaultAddresses = get_hv_addresses(numVaults)
+    vaultAddresses = list(snapshot(hv_address_calls(numVaults)).values())
+
+    # Fetch the owner, underwritten status, health and underlying Compound supply and
+    # borrow balances of each vault, all in the same batch of parallel multicalls
+    results = snapshot.run(
+        {
+            "owners": hv_owner_calls(vaultAddresses),
+            "underwritten": hv_underwritten_calls(vaultAddresses),
+            "unhealth": hv_unhealth_calls(vaultAddresses),
+            "supply": hv_supply_calls(vaultAddresses),
+            "borrow": hv_borrow_calls(vaultAddresses),
+        }
+    )
+    print(
+        "Made {} multicalls ({} split after failing), {} calls answered from cache".format(
+            snapshot.chunkCount, snapshot.splitCount, snapshot.cache.hits
+        )
+    )
 
-    # Fetch owner of each vault
-    vaultOwners = get_hv_owners(vaultAddresses)
+    vaultOwners = results["owners"]
     numOwners = len(set(list(vaultOwners.values())))
     print("Total Hiding Vault owners: {}".format(numOwners))
 
-    # Fetch underwritten status of each vault
-    vaultUnderwritten = get_hv_underwritten_status(vaultAddresses)
-
-    # Fetch health status of each vault
-    vaultUnhealth = get_hv_unhealth(vaultAddresses)
-
-    # Fetch underlying Compound supply and borrow balances of each vault
-    vaultSupplyBalances = get_hv_supply_balances(vaultAddresses)
-    vaultBorrowBalances = get_hv_borrow_balances(vaultAddresses)
+    vaultUnderwritten = results["underwritten"]
+    vaultUnhealth = results["unhealth"]
+    # vaults x tokens matrices of underlying Compound supply and borrow balances
+    supplyBalances = balance_matrix(results["supply"], numVaults)
+    borrowBalances = balance_matrix(results["borrow"], numVaults)
 
     # Sum all supply and borow token balances for each asset
-    compoundTokens = [token for token in UNDERLYING_TOKENS]
-
-    totalSupply = {token: 0 for token in compoundTokens}
-    totalBorrow = {token: 0 for token in compoundTokens}
-    for token in compoundTokens:
-        totalSupply[token] = reduce(
-            lambda x, y: x + (y[1][token] if token in y[1].keys() else 0),
-            vaultSupplyBalances.items(),
-            0,
-        )
-        totalBorrow[token] = reduce(
-            lambda x, y: x + (y[1][token] if token in y[1].keys() else 0),
-            vaultBorrowBalances.items(),
-            0,
-        )
+    totalSupply = dict(zip(TOKENS, supplyBalances.sum(axis=0).tolist()))
+    totalBorrow = dict(zip(TOKENS, borrowBalances.sum(axis=0).tolist()))
 
     # Fetch latest CoinGecko prices for Compound tokens
-    usdPrices = fetch_token_prices()
+    if usdPrices is None:
+        usdPrices = fetch_token_prices()
+    prices = np.array([usdPrices[token] for token in TOKENS])
 
     # Sum total USD supply and borrow balances
-    totalSupplyUSD = sum(
-        [totalSupply[token] * usdPrices[token] for token in compoundTokens]
-    )
-    totalBorrowUSD = sum(
-        [totalBorrow[token] * usdPrices[token] for token in compoundTokens]
-    )
+    totalSupplyUSD = float(supplyBalances.sum(axis=0) @ prices)
+    totalBorrowUSD = float(borrowBalances.sum(axis=0) @ prices)
     print("Total Supply Balance USD: {}".format(totalSupplyUSD))
     print("Total Borrow Balance USD: {}".format(totalBorrowUSD))
 
     # Sum USD supply and borrow balances for each vault
-    vaultSupplyUSD = {
-        vault: sum(
-            [
-                vaultSupplyBalances[vault][token] * usdPrices[token]
-                for token in compoundTokens
-            ]
-        )
-        for vault in vaultAddresses
-    }
-    vaultBorrowUSD = {
-        vault: sum(
-            [
-                vaultBorrowBalances[vault][token] * usdPrices[token]
-                for token in compoundTokens
-            ]
-        )
-        for vault in vaultAddresses
-    }
+    vaultSupplyUSD = dict(zip(vaultAddresses, (supplyBalances @ prices).tolist()))
+    vaultBorrowUSD = dict(zip(vaultAddresses, (borrowBalances @ prices).tolist()))
+
+    vaultSupplyBalances = balance_dicts(supplyBalances, vaultAddresses)
+    vaultBorrowBalances = balance_dicts(borrowBalances, vaultAddresses)
 
     vaultSummaries = {
         vault: {
@@ -310,9 +279,37 @@ def get_all_vault_data():
         "vaults": vaultSummaries,
     }
 
-    with open("hidingVaults.json", "w", encoding="utf-8") as f:
+    with open(path, "w", encoding="utf-8") as f:
         json.dump(vaultsData, f, ensure_ascii=False, indent=4)
 
+    return vaultsData
+
+
+# Back-fills one snapshot per blockStep (about a day) into directory. Calls made by earlier
+# runs come from the call cache, so extending the history only fetches the new blocks.
+# Historical snapshots are valued at current CoinGecko prices unless usdPrices is given.
+def get_vault_history(
+    fromBlock,
+    toBlock=None,
+    blockStep=BLOCKS_PER_DAY,
+    usdPrices=None,
+    directory="hidingVaultsHistory",
+):
+    os.makedirs(directory, exist_ok=True)
+    toBlock = w3.eth.get_block_number() if toBlock is None else toBlock
+    if usdPrices is None:
+        usdPrices = fetch_token_prices()
+
+    for blockNumber in range(fromBlock, toBlock + 1, blockStep):
+        get_all_vault_data(
+            blockNumber, usdPrices, path=os.path.join(directory, "{}.json".format(blockNumber))
+        )
+
 
 if __name__ == "__main__":
-    get_all_vault_data()
+
+    # `python hidingVaults.py history <fromBlock> [toBlock]` back-fills daily snapshots
+    if len(sys.argv) > 2 and sys.argv[1] == "history":
+        get_vault_history(*[int(block) for block in sys.argv[2:4]])
+    else:
+        get_all_vault_data()
@@ -0,0 +1,82 @@
+import numpy as np
+import pyarrow as pa
+
+from eventStore import toFixedBytes
+
+# Rough gas cutoffs between 2, 3 and 4 hop fills, based on observation
+HOP_CUTOFFS = (265000, 380000)
+MIN_HOPS = 2
+
+
+# Hop count of each fill from its gas used, as an offset from MIN_HOPS
+def classifyHops(gasUsed, cutoffs=HOP_CUTOFFS):
+    return np.digitize(np.asarray(gasUsed), cutoffs)
+
+
+def _addresses(column):
+    if isinstance(column, (pa.Array, pa.ChunkedArray)):
+        return toFixedBytes(column)
+    return np.asarray(column)
+
+
+# Symbol rank of every address in makerTokens and takerTokens, -1 for addresses missing
+# from symbolsByAddress. Only the distinct addresses are looked up, so the cost of the
+# Python side doesn't grow with the number of fills.
+def _symbolRanks(makerTokens, takerTokens, symbolsByAddress):
+    addresses, inverse = np.unique(np.concatenate([makerTokens, takerTokens]), return_inverse=True)
+
+    # Numpy strips trailing zero bytes from "S" items, so slice the raw buffer instead
+    width = addresses.dtype.itemsize
+    raw = addresses.tobytes()
+    symbols = [
+        symbolsByAddress.get("0x" + raw[i * width : (i + 1) * width].hex())
+        for i in range(len(addresses))
+    ]
+
+    ordered = sorted({symbol for symbol in symbols if symbol is not None})
+    rankBySymbol = {symbol: rank for rank, symbol in enumerate(ordered)}
+    ranks = np.array(
+        [-1 if symbol is None else rankBySymbol[symbol] for symbol in symbols], dtype=np.int64
+    )
+
+    ranks = ranks[inverse]
+    return ranks[: len(makerTokens)], ranks[len(makerTokens) :], ordered
+
+
+# Counts fills by hop count for every token pair, keyed "<higher symbol>/<lower symbol>"
+# with [2 hop, 3 hop, 4 hop] counts. Pairs come out in the order they first appear in
+# the fills and fills with a token missing from symbolsByAddress are skipped. Works on
+# whole columns (store.load() output or numpy arrays) and makes no network calls.
+def hopsByPair(makerTokens, takerTokens, gasUsed, symbolsByAddress, cutoffs=HOP_CUTOFFS):
+    makerTokens = _addresses(makerTokens)
+    takerTokens = _addresses(takerTokens)
+    gasUsed = np.asarray(gasUsed)
+    numBins = len(cutoffs) + 1
+
+    makerRanks, takerRanks, symbols = _symbolRanks(makerTokens, takerTokens, symbolsByAddress)
+    known = (makerRanks >= 0) & (takerRanks >= 0)
+    high = np.maximum(makerRanks[known], takerRanks[known])
+    low = np.minimum(makerRanks[known], takerRanks[known])
+    hops = classifyHops(gasUsed[known], cutoffs)
+
+    pairIds, firstSeen, pairIndex = np.unique(
+        high * len(symbols) + low, return_index=True, return_inverse=True
+    )
+    counts = np.bincount(pairIndex * numBins + hops, minlength=len(pairIds) * numBins)
+    counts = counts.reshape(-1, numBins)
+
+    result = {}
+    for k in np.argsort(firstSeen, kind="stable"):
+        high, low = divmod(int(pairIds[k]), len(symbols))
+        result[symbols[high] + "/" + symbols[low]] = counts[k].tolist()
+    return result
+
+
+def hopsByPairFromTable(table, symbolsByAddress, cutoffs=HOP_CUTOFFS):
+    return hopsByPair(
+        table.column("makerToken"),
+        table.column("takerToken"),
+        table.column("gasUsed").to_numpy(),
+        symbolsByAddress,
+        cutoffs,
+    )
@@ -0,0 +1,96 @@
+import csv
+import json
+import numpy as np
+
+from abiDecoder import EventDecoder, decodeWords, hexToWords
+
+IDENTITIES_CSV = "../treasury-flashloan-analysis/identitiesAnonymised.csv"
+
+
+# Reads {address: name} for the given address types from the identities CSV
+def loadTakerAddresses(path=IDENTITIES_CSV, types=("activeTakerAddresses",)):
+    takers = {}
+    # The export starts with a byte order mark and has stray whitespace in the type column
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            if row["type"].strip() in types:
+                takers[row["address"].strip().lower()] = row["name"].strip()
+
+    return takers
+
+
+def topicWord(address):
+    return "0x" + address.lower().replace("0x", "").rjust(64, "0")
+
+
+# Filters the logs of one event down to the rows whose fields match a set of values.
+# Predicates on indexed fields are pushed to the node as topic filters, the rest are
+# checked exactly on the decoded field (never by searching the raw data for a substring).
+class LogFilter:
+    def __init__(self, eventAbi, match=None):
+        self.decoder = EventDecoder(eventAbi)
+        self.match = {
+            name: [value.lower() for value in values] for name, values in (match or {}).items()
+        }
+
+        indexedNames = [name for name, _ in self.decoder.indexed]
+        fieldNames = [name for name, _ in self.decoder.fields]
+        for name in self.match:
+            if name not in indexedNames and name not in fieldNames:
+                raise ValueError("{} has no field {}".format(eventAbi["name"], name))
+
+        self.pushedDown = [name for name in self.match if name in indexedNames]
+        self.local = {
+            name: self._values(name) for name in self.match if name not in indexedNames
+        }
+
+        self.logCount = 0
+        self.keptCount = 0
+        self.bytesKept = 0
+
+    # eth_getLogs topics: the event topic, then an OR list per filtered indexed field
+    @property
+    def topics(self):
+        topics = [self.decoder.topic]
+        for name, abiType in self.decoder.indexed:
+            if name in self.match:
+                topics.append([topicWord(value) for value in self.match[name]])
+            else:
+                topics.append(None)
+
+        while topics[-1] is None:
+            topics.pop()
+        return topics
+
+    # Match values in the same fixed-width representation the decoder returns
+    def _values(self, name):
+        words = hexToWords((topicWord(value) for value in self.match[name]), 1)[:, 0]
+        return decodeWords(words, dict(self.decoder.fields)[name])
+
+    # Returns the matching logs and their decoded columns, dropping malformed logs
+    def apply(self, logs):
+        columns, wellFormed = self.decoder.decode(logs)
+        match = np.ones(int(wellFormed.sum()), dtype=bool)
+        for name, values in self.local.items():
+            match &= np.isin(columns[name], values)
+
+        keep = wellFormed.copy()
+        keep[wellFormed] = match
+        kept = [log for log, k in zip(logs, keep) if k]
+        self.logCount += len(logs)
+        self.keptCount += len(kept)
+        # Only the kept logs are sized here, the scraper counts the downloaded bytes
+        self.bytesKept += sum(len(json.dumps(log, separators=(",", ":"))) for log in kept)
+
+        return kept, {name: column[match] for name, column in columns.items()}
+
+    # bytesDownloaded is the size of the responses the logs came in, e.g. LogScraper's count
+    def summary(self, bytesDownloaded):
+        return "Kept {} of {} logs, {:.1f} of {:.1f} MB ({} pushed to the node, {} decoded)".format(
+            self.keptCount,
+            self.logCount,
+            self.bytesKept / 2**20,
+            bytesDownloaded / 2**20,
+            ", ".join(self.pushedDown) or "no fields",
+            ", ".join(self.local) or "no fields",
+        )
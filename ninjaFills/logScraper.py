@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from threading import Lock
+
+from rpc import RpcError
+
+# Substrings providers use when an eth_getLogs response would be too large or
+# span too many blocks (Infura, Alchemy, QuickNode, Erigon, Geth)
+TOO_LARGE_MESSAGES = (
+    "more than",
+    "response size",
+    "too large",
+    "too many",
+    "range is too wide",
+    "limited to",
+    "limit exceeded",
+    "exceed maximum",
+)
+
+
+def isTooLarge(error):
+    message = (error.message or "").lower()
+    return error.code == -32005 or any(m in message for m in TOO_LARGE_MESSAGES)
+
+
+# Scrapes eth_getLogs over a block range with many windows in flight at once.
+# Windows that the provider rejects as too large are bisected and retried, and
+# the window size grows again over sparse ranges. Windows are yielded strictly
+# in block order as (fromBlock, toBlock, logs) so callers can checkpoint.
+# bytesDownloaded counts the eth_getLogs responses of every window.
+class LogScraper:
+    def __init__(
+        self,
+        rpc,
+        address=None,
+        topics=None,
+        blockStep=5000,
+        minStep=1,
+        maxStep=100000,
+        targetLogs=2000,
+        concurrency=8,
+    ):
+        self.rpc = rpc
+        self.address = address
+        self.topics = topics
+        self.step = blockStep
+        self.minStep = minStep
+        self.maxStep = maxStep
+        self.targetLogs = targetLogs
+        self.concurrency = concurrency
+        self.lock = Lock()
+
+        self.windowCount = 0
+        self.splitCount = 0
+        self.logCount = 0
+        self.bytesDownloaded = 0
+
+    def getLogs(self, fromBlock, toBlock):
+        logFilter = {"fromBlock": hex(fromBlock), "toBlock": hex(toBlock)}
+        if self.address is not None:
+            logFilter["address"] = self.address
+        if self.topics is not None:
+            logFilter["topics"] = self.topics
+
+        logs, size = self.rpc.callSized("eth_getLogs", [logFilter])
+        with self.lock:
+            self.bytesDownloaded += size
+        return logs
+
+    def _nextStep(self, size, numLogs):
+        with self.lock:
+            # Grow multiplicatively over sparse ranges, aim for targetLogs per window
+            if numLogs < self.targetLogs // 4 and size >= self.step:
+                self.step = min(self.maxStep, self.step * 2)
+            elif numLogs > self.targetLogs:
+                self.step = max(self.minStep, self.step // 2)
+
+    def _shrink(self, size):
+        with self.lock:
+            self.step = max(self.minStep, min(self.step, size // 2))
+            self.splitCount += 1
+
+    def scrape(self, fromBlock, toBlock):
+        cursor = fromBlock
+        nextBlock = fromBlock
+        retries = deque()
+        pending = {}
+        completed = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+
+                # Keep the pool full, prioritising bisected windows that block the head
+                while len(pending) < self.concurrency and (retries or cursor <= toBlock):
+                    if retries:
+                        start, end = retries.popleft()
+                    else:
+                        start = cursor
+                        end = min(cursor + self.step - 1, toBlock)
+                        cursor = end + 1
+
+                    pending[pool.submit(self.getLogs, start, end)] = (start, end)
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    start, end = pending.pop(future)
+
+                    try:
+                        logs = future.result()
+                    except RpcError as e:
+                        if not isTooLarge(e) or start == end:
+                            raise
+
+                        mid = (start + end) // 2
+                        retries.appendleft((mid + 1, end))
+                        retries.appendleft((start, mid))
+                        self._shrink(end - start + 1)
+                        continue
+
+                    completed[start] = (end, logs)
+                    self._nextStep(end - start + 1, len(logs))
+
+                # Release every window that is now contiguous with what was already yielded
+                while nextBlock in completed:
+                    end, logs = completed.pop(nextBlock)
+                    self.windowCount += 1
+                    self.logCount += len(logs)
+                    yield nextBlock, end, logs
+                    nextBlock = end + 1
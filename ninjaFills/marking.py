@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+import numpy as np
+
+from abiDecoder import hexToWords, wordsToFloat
+from priceService import ASSET_MARKS_CSV, loadMarks, tokenKey
+
+# Room for any unix timestamp below the token id in a combined sort key
+TIME_BITS = 34
+
+
+def dayTimestamp(day):
+    return int(datetime.fromisoformat(day).replace(tzinfo=timezone.utc).timestamp())
+
+
+# Token amounts in whole units. amounts are raw integers, either numeric or hex strings
+# like the amount/fee columns of the flash loan csvs, and decimals is a scalar, a column
+# or a {token: decimals} dict looked up through tokens.
+def toUnits(amounts, decimals, tokens=None):
+    amounts = np.asarray(amounts)
+    if amounts.dtype.kind in "USO":
+        words = hexToWords(
+            [(a[2:] if a.startswith("0x") else a).zfill(64) for a in amounts.tolist()], 1
+        )
+        amounts = wordsToFloat(words)
+
+    if isinstance(decimals, dict):
+        decimals = np.array([decimals[token] for token in np.asarray(tokens).tolist()])
+    return amounts.astype(np.float64) / 10.0 ** np.asarray(decimals, dtype=np.float64)
+
+
+# USD price history of a set of tokens, marking (token, timestamp) columns with the last
+# price at or before each timestamp in one sorted lookup. Prices are kept sorted by
+# (token, timestamp) under a combined integer key, so marking n rows is one searchsorted
+# over the table instead of building and merging string keys row by row.
+#
+# aliases maps the token ids used by the rows to the ones in the table, for instance
+# contract addresses to the symbol columns of assetMarks.csv or WETH to ETH.
+class PriceTable:
+    def __init__(self, tokens, timestamps, prices, aliases=None):
+        self.tokens = sorted({tokenKey(token) for token in tokens})
+        self.tokenIds = {token: i for i, token in enumerate(self.tokens)}
+        self.aliases = {tokenKey(k): tokenKey(v) for k, v in (aliases or {}).items()}
+
+        ids = np.array([self.tokenIds[tokenKey(token)] for token in tokens], dtype=np.int64)
+        keys = (ids << TIME_BITS) + np.asarray(timestamps, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.prices = np.asarray(prices, dtype=np.float64)[order]
+
+    # From {(token, day): usd}, as returned by PriceService.prices or loadMarks, with each
+    # day's price taking effect at 00:00 UTC
+    @classmethod
+    def fromMarks(cls, marks, aliases=None):
+        marks = {key: usd for key, usd in marks.items() if usd is not None}
+        return cls(
+            [token for token, _ in marks],
+            [dayTimestamp(day) for _, day in marks],
+            list(marks.values()),
+            aliases,
+        )
+
+    @classmethod
+    def fromCsv(cls, path=ASSET_MARKS_CSV, aliases=None, **kwargs):
+        return cls.fromMarks(loadMarks(path, **kwargs), aliases)
+
+    # Table ids of a token column, -1 for tokens without prices. Only the distinct tokens
+    # are looked up in Python.
+    def _ids(self, tokens):
+        unique, inverse = np.unique(np.asarray(tokens).astype(str), return_inverse=True)
+        ids = np.array(
+            [
+                self.tokenIds.get(self.aliases.get(tokenKey(token), tokenKey(token)), -1)
+                for token in unique.tolist()
+            ],
+            dtype=np.int64,
+        )
+        return ids[inverse]
+
+    # USD mark of every (token, timestamp) row: the last price of the token at or before
+    # the timestamp, NaN if there is none or it is more than tolerance seconds old
+    def mark(self, tokens, timestamps, tolerance=None):
+        ids = self._ids(tokens)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+
+        index = np.searchsorted(self.keys, (ids << TIME_BITS) + timestamps, side="right") - 1
+        clipped = np.maximum(index, 0)
+        found = (ids >= 0) & (index >= 0) & (self.ids[clipped] == ids)
+        if tolerance is not None:
+            found &= timestamps - (self.keys[clipped] & ((1 << TIME_BITS) - 1)) <= tolerance
+
+        return np.where(found, self.prices[clipped], np.nan)
+
+    # USD value of raw token amounts, see toUnits for amounts and decimals
+    def value(self, amounts, tokens, timestamps, decimals, tolerance=None):
+        return toUnits(amounts, decimals, tokens) * self.mark(tokens, timestamps, tolerance)
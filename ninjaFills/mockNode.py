@@ -0,0 +1,329 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock
+from hashlib import sha256
+from bisect import bisect_left, bisect_right, insort
+from time import sleep
+import random
+import json
+import numpy as np
+
+ZRX_EXCHANGE_PROXY = "0xdef1c0ded9bec7f1a1670819833240f027b25eff"
+RFQ_ORDER_FILLED = "0x829fa99d94dc4636925b38632e625736a614c154d55006b7ab6bea979c210c32"
+
+
+def word(value):
+    if isinstance(value, str):
+        return value[2:].lower().zfill(64) if value.startswith("0x") else value.zfill(64)
+    return hex(value)[2:].zfill(64)
+
+
+def fakeHash(*parts):
+    return "0x" + sha256(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+# Encodes an order fill dict into the raw data field of a RfqOrderFilled log
+def encodeRfqOrderFilled(fill):
+    return "0x" + "".join(
+        word(v)
+        for v in [
+            fill["orderHash"],
+            fill["maker"],
+            fill["taker"],
+            fill["makerToken"],
+            fill["takerToken"],
+            fill["takerTokenFilledAmount"],
+            fill["makerTokenFilledAmount"],
+            0,
+        ]
+    )
+
+
+# Builds canned RfqOrderFilled logs from the bundled ninjaFills.npy, padded with
+# fills from other takers so the Ninja logs are only a fraction of the stream
+def buildCannedLogs(path="ninjaFills.npy", otherFillsPerNinjaFill=10, seed=0):
+    fills = list(np.load(path, allow_pickle=True))
+    rng = random.Random(seed)
+    logs = []
+
+    for fill in fills:
+        logs.append(dict(fill))
+
+        for _ in range(otherFillsPerNinjaFill):
+            other = dict(fill)
+            other["taker"] = "0x" + "%040x" % rng.getrandbits(160)
+            other["orderHash"] = "0x" + "%064x" % rng.getrandbits(256)
+            other["txHash"] = "0x" + "%064x" % rng.getrandbits(256)
+            other["blockNumber"] = fill["blockNumber"] + rng.randrange(-500, 500)
+            other.pop("timestamp", None)
+            logs.append(other)
+
+    return sorted(logs, key=lambda fill: fill["blockNumber"])
+
+
+# In-memory chain holding canned fills, their transactions, receipts and blocks
+class MockChain:
+    def __init__(self, fills, headBlock=None, genesisTimestamp=1438269973):
+        self.lock = Lock()
+        self.forks = {}
+        self.genesisTimestamp = genesisTimestamp
+        self.logsByBlock = {}
+        self.blockNumbers = []
+        self.transactions = {}
+        self.timestamps = {}
+
+        for fill in fills:
+            self.addFill(fill)
+
+        self.headBlock = headBlock or max(self.logsByBlock, default=0)
+
+    def addFill(self, fill):
+        blockNumber = int(fill["blockNumber"])
+        if blockNumber not in self.logsByBlock:
+            insort(self.blockNumbers, blockNumber)
+        blockLogs = self.logsByBlock.setdefault(blockNumber, [])
+        txHash = fill["txHash"]
+
+        blockLogs.append(
+            {
+                "address": ZRX_EXCHANGE_PROXY,
+                "topics": [RFQ_ORDER_FILLED],
+                "data": encodeRfqOrderFilled(fill),
+                "blockNumber": hex(blockNumber),
+                "transactionHash": txHash,
+                "transactionIndex": hex(len(blockLogs)),
+                "logIndex": hex(len(blockLogs)),
+                "removed": False,
+            }
+        )
+        self.transactions[txHash] = {
+            "blockNumber": blockNumber,
+            "gas": int(fill.get("gasLimit", 300000)),
+            "gasPrice": int(fill.get("gasPrice", 10**10)),
+            "gasUsed": int(fill.get("gasUsed", 200000)),
+        }
+        if "timestamp" in fill:
+            self.timestamps.setdefault(blockNumber, int(fill["timestamp"]))
+
+    def blocksInRange(self, fromBlock, toBlock):
+        start = bisect_left(self.blockNumbers, fromBlock)
+        end = bisect_right(self.blockNumbers, toBlock)
+        return self.blockNumbers[start:end]
+
+    def blockHash(self, blockNumber):
+        return fakeHash("block", blockNumber, self.forks.get(blockNumber, 0))
+
+    # Appends a block holding the given fills and returns its number
+    def mine(self, fills=()):
+        with self.lock:
+            self.headBlock += 1
+            for fill in fills:
+                self.addFill(dict(fill, blockNumber=self.headBlock))
+            return self.headBlock
+
+    # Replaces the last depth blocks with a fork (new hashes, and the given fills instead
+    # of the orphaned ones, all placed in the first forked block)
+    def reorg(self, depth, fills=()):
+        with self.lock:
+            firstBlock = self.headBlock - depth + 1
+            for blockNumber in range(firstBlock, self.headBlock + 1):
+                self.forks[blockNumber] = self.forks.get(blockNumber, 0) + 1
+                for log in self.logsByBlock.pop(blockNumber, []):
+                    self.transactions.pop(log["transactionHash"], None)
+                if blockNumber in self.blockNumbers:
+                    self.blockNumbers.remove(blockNumber)
+
+            for fill in fills:
+                self.addFill(dict(fill, blockNumber=firstBlock))
+
+    def timestamp(self, blockNumber):
+        if blockNumber in self.timestamps:
+            return self.timestamps[blockNumber]
+        return self.genesisTimestamp + 13 * blockNumber
+
+
+# Local JSON-RPC stand-in for an Ethereum node. Serves canned logs over HTTP and
+# enforces the same kind of result-size limit Infura applies to eth_getLogs.
+class MockNode:
+    def __init__(self, chain, maxLogs=10000, maxRange=None, latency=0.0, port=0):
+        self.chain = chain
+        self.maxLogs = maxLogs
+        self.maxRange = maxRange
+        self.latency = latency
+        self.filters = {}
+        self.requestCount = 0
+        self.methods = {
+            "eth_chainId": lambda: "0x1",
+            "eth_blockNumber": lambda: hex(self.chain.headBlock),
+            "eth_getLogs": self.getLogs,
+            "eth_newFilter": self.newFilter,
+            "eth_getFilterLogs": self.getFilterLogs,
+            "eth_getTransactionByHash": self.getTransaction,
+            "eth_getTransactionReceipt": self.getTransactionReceipt,
+            "eth_getBlockByNumber": self.getBlockByNumber,
+        }
+
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                payload = json.loads(body)
+                response = json.dumps(node.handle(payload)).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+    def __enter__(self):
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, payload):
+        if self.latency:
+            sleep(self.latency)
+
+        if isinstance(payload, list):
+            return [self.handleOne(request) for request in payload]
+
+        return self.handleOne(payload)
+
+    def handleOne(self, request):
+        self.requestCount += 1
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+
+        try:
+            method = self.methods[request["method"]]
+        except KeyError:
+            response["error"] = {"code": -32601, "message": "method not found"}
+            return response
+
+        try:
+            response["result"] = method(*request.get("params", []))
+        except MockRpcError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+
+        return response
+
+    def resolveBlock(self, block):
+        if block in (None, "latest", "pending", "safe", "finalized"):
+            return self.chain.headBlock
+        if block == "earliest":
+            return 0
+        return int(block, 16)
+
+    def getLogs(self, logFilter):
+        fromBlock = self.resolveBlock(logFilter.get("fromBlock"))
+        toBlock = min(self.resolveBlock(logFilter.get("toBlock")), self.chain.headBlock)
+
+        if self.maxRange and toBlock - fromBlock + 1 > self.maxRange:
+            raise MockRpcError(
+                -32602, "block range is too wide, limited to {}".format(self.maxRange)
+            )
+
+        addresses = logFilter.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {a.lower() for a in addresses} if addresses else None
+        topics = logFilter.get("topics") or []
+
+        logs = []
+        with self.chain.lock:
+            for blockNumber in self.chain.blocksInRange(fromBlock, toBlock):
+                for log in self.chain.logsByBlock[blockNumber]:
+                    if addresses and log["address"] not in addresses:
+                        continue
+                    if not matchTopics(log["topics"], topics):
+                        continue
+
+                    logs.append(dict(log, blockHash=self.chain.blockHash(blockNumber)))
+
+                    if len(logs) > self.maxLogs:
+                        raise MockRpcError(
+                            -32005,
+                            "query returned more than {} results".format(self.maxLogs),
+                        )
+
+        return logs
+
+    def getTransaction(self, txHash):
+        txn = self.chain.transactions.get(txHash)
+        if txn is None:
+            return None
+
+        return {
+            "hash": txHash,
+            "blockNumber": hex(txn["blockNumber"]),
+            "blockHash": self.chain.blockHash(txn["blockNumber"]),
+            "gas": hex(txn["gas"]),
+            "gasPrice": hex(txn["gasPrice"]),
+        }
+
+    def getTransactionReceipt(self, txHash):
+        txn = self.chain.transactions.get(txHash)
+        if txn is None:
+            return None
+
+        return {
+            "transactionHash": txHash,
+            "blockNumber": hex(txn["blockNumber"]),
+            "blockHash": self.chain.blockHash(txn["blockNumber"]),
+            "gasUsed": hex(txn["gasUsed"]),
+            "status": "0x1",
+        }
+
+    def getBlockByNumber(self, block, fullTransactions=False):
+        blockNumber = self.resolveBlock(block)
+        if blockNumber > self.chain.headBlock:
+            return None
+
+        return {
+            "number": hex(blockNumber),
+            "hash": self.chain.blockHash(blockNumber),
+            "parentHash": self.chain.blockHash(blockNumber - 1),
+            "timestamp": hex(self.chain.timestamp(blockNumber)),
+        }
+
+    def newFilter(self, logFilter):
+        filterId = hex(len(self.filters) + 1)
+        self.filters[filterId] = logFilter
+        return filterId
+
+    def getFilterLogs(self, filterId):
+        return self.getLogs(self.filters[filterId])
+
+
+class MockRpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def matchTopics(logTopics, filterTopics):
+    for position, wanted in enumerate(filterTopics):
+        if wanted is None:
+            continue
+        if position >= len(logTopics):
+            return False
+
+        wanted = wanted if isinstance(wanted, list) else [wanted]
+        if logTopics[position].lower() not in {t.lower() for t in wanted}:
+            return False
+
+    return True
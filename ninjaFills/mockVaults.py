@@ -0,0 +1,158 @@
+import json
+import random
+from eth_abi import encode_single, decode_single
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+
+from mockNode import MockChain, MockNode, MockRpcError, fakeHash
+
+HIDING_VAULT_NFT_ADDRESS = "0xe2ad581fc01434ee426bb3f471c4cb0317ee672e"
+MULTICALL_ADDRESS = "0xeefba1e63905ef1d7acba5a8513c70307c1ce441"
+
+AGGREGATE = function_signature_to_4byte_selector("aggregate((address,bytes)[])")
+
+# Rough gas used per call, charged against the node's eth_call gas cap
+CALL_GAS = {
+    "totalSupply()": 3000,
+    "tokenByIndex(uint256)": 5000,
+    "ownerOf(uint256)": 5000,
+    "compound_isUnderwritten()": 5000,
+    "compound_unhealth()": 150000,
+    "balanceOfUnderlying(address)": 40000,
+    "borrowBalanceCurrent(address)": 40000,
+}
+
+
+def selector(signature):
+    return function_signature_to_4byte_selector(signature)
+
+
+# Hiding vault NFT, the vaults behind it and Compound cToken balances, answering the
+# contract calls hidingVaults.py makes through Multicall's aggregate()
+class MockVaultChain:
+    def __init__(self, numVaults, cTokens, seed=0):
+        rng = random.Random(seed)
+        self.vaults = [fakeHash("vault", i)[:42] for i in range(numVaults)]
+        self.owners = {
+            vault: fakeHash("owner", rng.randrange(max(1, numVaults // 3)))[:42]
+            for vault in self.vaults
+        }
+        self.underwritten = {vault: rng.random() < 0.5 for vault in self.vaults}
+        self.unhealth = {vault: rng.randrange(10**18) for vault in self.vaults}
+        self.cTokens = {address.lower(): name for name, address in cTokens.items()}
+
+        # Most vaults only use a couple of markets
+        self.supply = {}
+        self.borrow = {}
+        for vault in self.vaults:
+            for cToken in rng.sample(sorted(self.cTokens), min(3, len(self.cTokens))):
+                self.supply[(cToken, vault)] = rng.randrange(10**24)
+                self.borrow[(cToken, vault)] = rng.randrange(10**23)
+
+        handlers = {
+            "totalSupply()": lambda: encode_single("uint256", len(self.vaults)),
+            "tokenByIndex(uint256)": self.tokenByIndex,
+            "ownerOf(uint256)": self.ownerOf,
+            "compound_isUnderwritten()": None,
+            "compound_unhealth()": None,
+            "balanceOfUnderlying(address)": None,
+            "borrowBalanceCurrent(address)": None,
+        }
+        self.functions = {selector(sig): (sig, handler) for sig, handler in handlers.items()}
+
+    def tokenByIndex(self, index):
+        if index >= len(self.vaults):
+            raise MockRpcError(3, "execution reverted: ERC721Enumerable: global index out of bounds")
+        return encode_single("uint256", int(self.vaults[index], 16))
+
+    def ownerOf(self, tokenId):
+        return encode_single("address", self.owners["0x%040x" % tokenId])
+
+    # Runs one call, returning (gas, output)
+    def call(self, target, data):
+        target = target.lower()
+        if data[:4] not in self.functions:
+            raise MockRpcError(3, "execution reverted")
+
+        signature, handler = self.functions[data[:4]]
+        inputTypes = signature[signature.index("(") :]
+        args = decode_single(inputTypes, data[4:]) if inputTypes != "()" else ()
+        gas = CALL_GAS[signature]
+
+        if target == HIDING_VAULT_NFT_ADDRESS and handler is not None:
+            return gas, handler(*args)
+        if target in self.underwritten and signature == "compound_isUnderwritten()":
+            return gas, encode_single("bool", self.underwritten[target])
+        if target in self.unhealth and signature == "compound_unhealth()":
+            return gas, encode_single("uint256", self.unhealth[target])
+        if target in self.cTokens and signature == "balanceOfUnderlying(address)":
+            return gas, encode_single("uint256", self.supply.get((target, args[0].lower()), 0))
+        if target in self.cTokens and signature == "borrowBalanceCurrent(address)":
+            return gas, encode_single("uint256", self.borrow.get((target, args[0].lower()), 0))
+
+        raise MockRpcError(3, "execution reverted")
+
+
+# MockNode answering eth_call for a MockVaultChain. Like a real node it caps the gas of
+# a single eth_call and the size of its response, and it can fail a share of requests
+# at random to exercise retries.
+class MockVaultNode(MockNode):
+    def __init__(
+        self,
+        vaultChain,
+        chain=None,
+        gasCap=50000000,
+        maxResponseBytes=None,
+        failureRate=0.0,
+        seed=0,
+        **kwargs
+    ):
+        super().__init__(chain or MockChain([], headBlock=15000000), **kwargs)
+        self.vaultChain = vaultChain
+        self.gasCap = gasCap
+        self.maxResponseBytes = maxResponseBytes
+        self.failureRate = failureRate
+        self.rng = random.Random(seed)
+        self.callCount = 0
+        self.methods["eth_call"] = self.ethCall
+
+    def ethCall(self, transaction, block="latest", stateOverride=None):
+        if self.failureRate and self.rng.random() < self.failureRate:
+            raise MockRpcError(-32000, "header not found")
+
+        target = transaction["to"].lower()
+        data = bytes.fromhex(transaction["data"][2:])
+        blockNumber = self.resolveBlock(block)
+
+        if target != MULTICALL_ADDRESS or data[:4] != AGGREGATE:
+            gas, output = self.vaultChain.call(target, data)
+            self.callCount += 1
+            return "0x" + output.hex()
+
+        calls = decode_single("((address,bytes)[])", data[4:])[0]
+        self.callCount += len(calls)
+        totalGas = 0
+        outputs = []
+        for callTarget, callData in calls:
+            try:
+                gas, output = self.vaultChain.call(callTarget, callData)
+            except MockRpcError:
+                raise MockRpcError(3, "execution reverted: Multicall aggregate: call failed")
+
+            totalGas += gas
+            if totalGas > self.gasCap:
+                raise MockRpcError(-32000, "out of gas")
+            outputs.append(output)
+
+        result = "0x" + encode_single("(uint256,bytes[])", (blockNumber, outputs)).hex()
+        if self.maxResponseBytes and len(result) // 2 > self.maxResponseBytes:
+            raise MockRpcError(-32000, "response size exceeded")
+        return result
+
+
+def loadCTokens(path="ctokens.json"):
+    tokens = json.load(open(path))
+    return {
+        name: to_checksum_address(token["address"])
+        for name, token in tokens.items()
+        if name[0] == "c"
+    }
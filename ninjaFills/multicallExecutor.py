@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from time import sleep
+import requests
+from multicall import Call
+from multicall.multicall import get_multicall_map
+
+AGGREGATE = "aggregate((address,bytes)[])(uint256,bytes[])"
+
+# Rough upper bounds on the gas of the calls hidingVaults makes, used to keep each
+# aggregate() under the node's eth_call gas cap. Anything unlisted is charged DEFAULT_CALL_GAS.
+DEFAULT_CALL_GAS = 30000
+CALL_GAS = {
+    "compound_unhealth()(uint256)": 400000,
+    "balanceOfUnderlying(address)(uint256)": 100000,
+    "borrowBalanceCurrent(address)(uint256)": 100000,
+}
+
+# Each call adds its target and calldata to the request and an offset, a length and
+# at least one word of return data to the response
+CALL_OVERHEAD_BYTES = 5 * 32
+
+
+# Runs Multicall Calls in aggregate() chunks bounded by call count, bytes and gas, with
+# several chunks in flight at once. A chunk that fails is bisected and both halves are
+# retried, so one reverting call or an oversized chunk doesn't sink the whole batch.
+# Calls can be passed in named groups from different stages so they share one pipeline.
+# With blockId pinned to a block number and a CallCache, calls already made at that
+# block are answered from disk.
+class MulticallExecutor:
+    def __init__(
+        self,
+        w3,
+        blockId=None,
+        cache=None,
+        maxCalls=1000,
+        maxBytes=500000,
+        gasBudget=25000000,
+        callGas=None,
+        concurrency=4,
+        retries=3,
+        backoff=0.5,
+    ):
+        self.w3 = w3
+        self.blockId = blockId
+        self.cache = cache if isinstance(blockId, int) else None
+        self.maxCalls = maxCalls
+        self.maxBytes = maxBytes
+        self.gasBudget = gasBudget
+        self.callGas = dict(CALL_GAS, **(callGas or {}))
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.chainId = None
+
+        self.chunkCount = 0
+        self.splitCount = 0
+        self.retryCount = 0
+
+    def _aggregate(self, calls):
+        if self.chainId is None:
+            self.chainId = self.w3.eth.chain_id
+
+        aggregate = Call(
+            get_multicall_map(self.chainId)[self.chainId],
+            AGGREGATE,
+            returns=None,
+            _w3=self.w3,
+            block_id=self.blockId,
+        )
+        _, outputs = aggregate([[[call.target, call.data] for call in calls]])
+        return outputs
+
+    def gas(self, call):
+        return self.callGas.get(call.signature.signature, DEFAULT_CALL_GAS)
+
+    # Splits item indices into consecutive chunks that fit every budget
+    def chunk(self, calls):
+        chunks = []
+        current, size, gas = [], 0, 0
+
+        for i, call in enumerate(calls):
+            callSize = len(call.data) + CALL_OVERHEAD_BYTES
+            callGas = self.gas(call)
+
+            if current and (
+                len(current) >= self.maxCalls
+                or size + callSize > self.maxBytes
+                or gas + callGas > self.gasBudget
+            ):
+                chunks.append(current)
+                current, size, gas = [], 0, 0
+
+            current.append(i)
+            size += callSize
+            gas += callGas
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    # Runs {name: [Call]} and returns {name: {returnName: value}}, each group decoded the
+    # same way Multicall would decode it on its own
+    def run(self, groups):
+        items = [(name, call) for name, calls in groups.items() for call in calls]
+        outputs = [None] * len(items)
+
+        missing = list(range(len(items)))
+        if self.cache is not None:
+            for i, output in self.cache.getMany([call for _, call in items], self.blockId).items():
+                outputs[i] = output
+            missing = [i for i in missing if outputs[i] is None]
+
+        queue = deque(
+            [missing[i] for i in chunk]
+            for chunk in self.chunk([items[i][1] for i in missing])
+        )
+        attempts = {}
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while queue or pending:
+
+                while len(pending) < self.concurrency and queue:
+                    chunk = queue.popleft()
+                    future = pool.submit(self._aggregate, [items[i][1] for i in chunk])
+                    pending[future] = chunk
+                    self.chunkCount += 1
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    chunk = pending.pop(future)
+
+                    try:
+                        chunkOutputs = future.result()
+                    except (ValueError, requests.RequestException):
+                        if len(chunk) > 1:
+                            mid = len(chunk) // 2
+                            queue.appendleft(chunk[mid:])
+                            queue.appendleft(chunk[:mid])
+                            self.splitCount += 1
+                            continue
+
+                        # A single call that keeps failing is a real error, not a budget problem
+                        attempts[chunk[0]] = attempts.get(chunk[0], 0) + 1
+                        if attempts[chunk[0]] > self.retries:
+                            raise
+                        sleep(self.backoff * 2 ** (attempts[chunk[0]] - 1))
+                        queue.appendleft(chunk)
+                        self.retryCount += 1
+                        continue
+
+                    for i, output in zip(chunk, chunkOutputs):
+                        outputs[i] = output
+                    if self.cache is not None:
+                        self.cache.putMany([items[i][1] for i in chunk], chunkOutputs, self.blockId)
+
+        # Decode in call order so results come out in the same order as a single Multicall
+        results = {name: {} for name in groups}
+        for (name, call), output in zip(items, outputs):
+            results[name].update(call.decode_output(output))
+
+        return results
+
+    def __call__(self, calls):
+        return self.run({None: calls})[None]
@@ -5,9 +5,22 @@ import numpy as np
 from scipy.stats import norm
 import matplotlib.pyplot as plt
 import os
-from os.path import exists
+import sys
 from dotenv import load_dotenv
 
+from rpc import RpcClient
+from logScraper import LogScraper
+from fillEnricher import FillEnricher
+from fillStore import FillStore, fillTable
+from abiDecoder import RFQ_ORDER_FILLED
+from logFilter import LogFilter, loadTakerAddresses
+from eventStore import VAULT_HEALTH_SCHEMA
+from follower import Follower, VaultHealthWatcher
+import hidingVaults
+import hopStats
+from gasMixture import GasMixture
+from priceService import PriceService
+
 load_dotenv()
 
 INFURA_KEY = os.getenv("INFURA_KEY")
@@ -15,139 +28,157 @@ ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 
 ETHERSCAN_API_BASE_URL = "https://api.etherscan.io/api"
 
-w3 = Web3(Web3.HTTPProvider("https://mainnet.infura.io/v3/{}".format(INFURA_KEY)))
+INFURA_URL = "https://mainnet.infura.io/v3/{}".format(INFURA_KEY)
+
+w3 = Web3(Web3.HTTPProvider(INFURA_URL))
+
+NINJA_TAKER_ADDRESS = "0x3d71d79c224998e608d03c5ec9b405e7a38505f0"
 
-# Scrapes all ninja hiding book fill event logs and gas usage data from startBlock to present
-def getAllNinjaOrderFills(startBlock, blockStep):
+
+# Scrapes all ninja hiding book fill event logs and gas usage data from startBlock (or
+# the store's checkpoint, whichever is later) to present, committing each window as it finishes.
+# takers can list several taker addresses so one pass over the chain collects all their fills.
+def getAllNinjaOrderFills(
+    startBlock,
+    blockStep,
+    store,
+    takers=(NINJA_TAKER_ADDRESS,),
+    concurrency=8,
+    requestsPerSecond=10,
+    confirmations=12,
+):
 
     zrxExchangeProxy = "0xDef1C0ded9bec7F1a1670819833240f027b25EfF"
-    rfqOrderFilled = (
-        "0x829fa99d94dc4636925b38632e625736a614c154d55006b7ab6bea979c210c32"
-    )
-    ninjaTakerAddress = "3d71d79c224998e608d03c5ec9b405e7a38505f0"
 
-    latestBlockNumber = startBlock
-    currentBlockNumber = w3.eth.get_block_number()
+    # RfqOrderFilled has no indexed fields, so the taker can't be put in the topic filter
+    # and is matched on the decoded taker field instead
+    fillFilter = LogFilter(RFQ_ORDER_FILLED, match={"taker": list(takers)})
 
-    orderFills = []
+    # Stay a few blocks behind the head so committed windows don't get reorged away
+    currentBlockNumber = w3.eth.get_block_number() - confirmations
+    if store.lastBlock is not None:
+        startBlock = max(startBlock, store.lastBlock + 1)
 
-    while latestBlockNumber < currentBlockNumber:
+    print("Scraping blocks {}-{}".format(startBlock, currentBlockNumber))
 
-        # Filter for only RFQOrderFilled event logs from the 0x exchange proxy
-        rfqFilter = w3.eth.filter(
-            {
-                "fromBlock": latestBlockNumber,
-                "toBlock": latestBlockNumber + blockStep,
-                "address": zrxExchangeProxy,
-                "topics": [rfqOrderFilled],
-            }
-        )
+    numOrderFills = 0
+
+    rpc = RpcClient(INFURA_URL, requestsPerSecond=requestsPerSecond)
+    enricher = FillEnricher(rpc)
+
+    # Filter for only RFQOrderFilled event logs from the 0x exchange proxy, many windows at a time
+    scraper = LogScraper(
+        rpc,
+        address=zrxExchangeProxy,
+        topics=fillFilter.topics,
+        blockStep=blockStep,
+        concurrency=concurrency,
+    )
+
+    for fromBlock, toBlock, zrxLogs in scraper.scrape(startBlock, currentBlockNumber):
 
-        zrxLogs = w3.eth.get_filter_logs(rfqFilter.filter_id)
+        orderFills = []
 
         if len(zrxLogs):
 
-            # Get only logs involving ninja's taker address
-            ninjaLogs = [log for log in zrxLogs if ninjaTakerAddress in log["data"]]
+            # Get only logs filled by the tracked takers
+            ninjaLogs, decoded = fillFilter.apply(zrxLogs)
 
             print(
-                "Block {}-{}: Found {} 0x RFQOrderFilled events, {} by Ninja".format(
-                    latestBlockNumber,
-                    latestBlockNumber + blockStep,
+                "Block {}-{}: Found {} 0x RFQOrderFilled events, {} by tracked takers".format(
+                    fromBlock,
+                    toBlock,
                     len(zrxLogs),
                     len(ninjaLogs),
                 )
             )
 
-            # For each ninja log found, scrape the txn involving that log and get gas data
-            for log in ninjaLogs:
-                txnHash = log["transactionHash"]
-
-                txn = w3.eth.get_transaction(txnHash)
-                gasLimit = txn["gas"]
-                gasPrice = txn["gasPrice"]
-                blockNumber = txn["blockNumber"]
-
-                txnReceipt = w3.eth.get_transaction_receipt(txnHash)
-                gasUsed = txnReceipt["gasUsed"]
-
-                block = w3.eth.get_block(blockNumber)
-                timestamp = block["timestamp"]
-
-                dataStr = log["data"][2:]
-                data = [dataStr[i : i + 64] for i in range(0, len(dataStr), 64)]
-
-                orderFills.append(
-                    {
-                        "txHash": txnHash.hex(),
-                        "orderHash": "0x" + data[0],
-                        "maker": "0x" + data[1][-40:],
-                        "taker": "0x" + data[2][-40:],
-                        "makerToken": "0x" + data[3][-40:],
-                        "takerToken": "0x" + data[4][-40:],
-                        "makerTokenFilledAmount": Web3.toInt(hexstr=data[5]),
-                        "takerTokenFilledAmount": Web3.toInt(hexstr=data[6]),
-                        "gasLimit": int(gasLimit),
-                        "gasUsed": int(gasUsed),
-                        "gasPrice": int(gasPrice),
-                        "timestamp": timestamp,
-                        "blockNumber": blockNumber,
-                    }
-                )
+            # Fetch gas data for every ninja txn in the window with batched requests
+            gasData = enricher.enrich(ninjaLogs)
+
+            orderFills = fillTable(decoded, ninjaLogs, gasData)
 
-        latestBlockNumber += blockStep
+        store.commit(fromBlock, toBlock, orderFills)
+        numOrderFills += len(orderFills)
 
-        # sleep to avoid getting rate limited
-        sleep(0.5)
+    print(
+        "Scraped {} windows, split {} oversized windows, made {} requests".format(
+            scraper.windowCount, scraper.splitCount, rpc.requestCount
+        )
+    )
 
-    # Save all the order fill data in a pickle file
-    print("Found {} total Ninja order fills".format(len(orderFills)))
-    np.save("ninjaFills", np.array(orderFills), allow_pickle=True)
+    print(fillFilter.summary(scraper.bytesDownloaded))
+    print("Downloaded {:.1f} MB in total".format(rpc.bytesReceived / 2**20))
 
+    store.compact()
+    print("Found {} new Ninja order fills".format(numOrderFills))
+
+
+# Follows the chain head, adding new fills by the takers and changes in hiding vault
+# health to the stores as they happen, until interrupted
+def followNinjaFills(
+    store, takers=(NINJA_TAKER_ADDRESS,), confirmations=12, pollInterval=1.0
+):
+
+    zrxExchangeProxy = "0xDef1C0ded9bec7F1a1670819833240f027b25EfF"
 
-def plotNinjaGasUsage():
-    gas_payload = {
-        "module": "gastracker",
-        "action": "gasoracle",
-        "apikey": ETHERSCAN_API_KEY,
-    }
+    rpc = RpcClient(INFURA_URL)
+    startBlock = w3.eth.get_block_number() - confirmations
+
+    healthStore = FillStore("vaultHealthData", schema=VAULT_HEALTH_SCHEMA, prefix="health")
+    vaults = hidingVaults.get_hv_addresses(hidingVaults.get_hv_count())
+
+    follower = Follower(
+        rpc,
+        store,
+        LogFilter(RFQ_ORDER_FILLED, match={"taker": list(takers)}),
+        zrxExchangeProxy,
+        startBlock,
+        healthWatcher=VaultHealthWatcher(w3, vaults, healthStore, startBlock),
+        confirmations=confirmations,
+        pollInterval=pollInterval,
+        onFills=lambda fills: print("{} new fills".format(fills.num_rows)),
+        onHealth=lambda changes: print("{} vaults changed health".format(changes.num_rows)),
+        onRollback=lambda block: print("Reorg, rolled back to block {}".format(block)),
+    )
+    print("Following from block {}".format(follower.lastBlock + 1))
+    follower.run()
 
-    price_payload = {
-        "module": "stats",
-        "action": "ethprice",
-        "apikey": ETHERSCAN_API_KEY,
-    }
 
-    ninjaFills = np.load("ninjaFills.npy", allow_pickle=True)
-    gas = np.array([txn["gasUsed"] for txn in ninjaFills])
+# hops.json uses the fixed HOP_CUTOFFS unless fittedHopCutoffs asks for the mixture's
+def plotNinjaGasUsage(store, fittedHopCutoffs=False):
+    gas = store.load(columns=["gasUsed"]).column("gasUsed").to_numpy()
 
-    print("{} total ninja fills\n".format(len(ninjaFills)))
+    print("{} total ninja fills\n".format(len(gas)))
     print("Mean gas used: {}".format(np.mean(gas)))
     print("Median gas used: {}".format(np.median(gas)))
     print("Max gas used: {}".format(np.max(gas)))
     print("Min gas used: {}".format(np.min(gas)))
 
-    # Just a rough estimate of the "cutoffs" for 1/2/3+ leg transactions based on observation
-    oneHop = gas[gas < 265000]
-    twoHop = gas[(gas >= 265000) & (gas < 380000)]
-    threeHop = gas[gas >= 380000]
+    # Fit a 1/2/3 leg mixture to the gas used, carrying on from the last saved fit
+    mixture = GasMixture.load().fit(gas)
+    mixture.save()
+    cutoffs = mixture.cutoffs()
+    legs = mixture.classify(gas)
+    legProbabilities = mixture.probabilities(gas)
 
     print("\n")
-    print("1 leg txns: {}".format(len(oneHop)))
-    print("2 leg txns: {}".format(len(twoHop)))
-    print("3 leg txns: {}".format(len(threeHop)))
-
-    mu1, std1 = norm.fit(oneHop)
-    mu2, std2 = norm.fit(twoHop)
-    mu3, std3 = norm.fit(threeHop)
+    print("Mixture fit in {} EM iterations".format(mixture.iterations))
+    print("Fitted leg cutoffs: {} gas".format(", ".join("{:.0f}".format(c) for c in cutoffs)))
+    print("1 leg txns: {}".format(np.count_nonzero(legs == 0)))
+    print("2 leg txns: {}".format(np.count_nonzero(legs == 1)))
+    print("3 leg txns: {}".format(np.count_nonzero(legs == 2)))
+    print(
+        "Ambiguous txns (< 90% sure): {}".format(
+            np.count_nonzero(legProbabilities.max(axis=1) < 0.9)
+        )
+    )
 
-    r = requests.get(ETHERSCAN_API_BASE_URL, params=gas_payload)
-    response = r.json()
-    currentGas = float(response["result"]["ProposeGasPrice"])
+    (mu1, mu2, mu3), (std1, std2, std3) = mixture.means, mixture.stds
 
-    r = requests.get(ETHERSCAN_API_BASE_URL, params=price_payload)
-    response = r.json()
-    ethUsd = float(response["result"]["ethusd"])
+    prices = PriceService(etherscanApiKey=ETHERSCAN_API_KEY)
+    currentGas = prices.etherscan("gasPrice")
+    ethUsd = prices.etherscan("ethUsd")
 
     NINJA_MARGIN_USD = 100
 
@@ -217,54 +248,16 @@ def plotNinjaGasUsage():
         )
     )
 
-    pairs = {}
-    hopsByPair = {}
     r = requests.get("https://hidingbook.keeperdao.com/api/v1/tokenList")
     response = r.json()
 
     tokens = response["result"]["tokens"]
-    hbTokensByAddress = {token["address"]: token for token in tokens}
+    symbolsByAddress = {token["address"]: token["symbol"] for token in tokens}
 
-    for txn in ninjaFills:
-        hash = txn["txHash"]
-        makerTokenAddress = txn["makerToken"]
-        takerTokenAddress = txn["takerToken"]
-
-        if (
-            makerTokenAddress in hbTokensByAddress.keys()
-            and takerTokenAddress in hbTokensByAddress.keys()
-        ):
-            makerToken = hbTokensByAddress[makerTokenAddress]["symbol"]
-            takerToken = hbTokensByAddress[takerTokenAddress]["symbol"]
-            gasUsed = txn["gasUsed"]
-            # print('hash: {} makerToken:\t{}\t takerToken:\t{}\t gasUsed: {}'.format(hash, makerToken, takerToken, gasUsed))
-            hops = 0
-            if gasUsed < 265000:
-                hops = 2
-            elif gasUsed >= 265000 and gasUsed < 380000:
-                hops = 3
-            else:
-                hops = 4
-
-            if hash not in pairs.keys():
-                pairs[hash] = {
-                    "makerToken": makerToken,
-                    "takerToken": takerToken,
-                    "gasUsed": gasUsed,
-                    "hops": hops,
-                }
-
-            token1 = makerToken if makerToken > takerToken else takerToken
-            token2 = makerToken if makerToken < takerToken else takerToken
-
-            pair = token1 + "/" + token2
-            pait = makerToken + "/" + takerToken
-
-            if pair not in hopsByPair.keys():
-                hopArr = [0, 0, 0]
-                hopsByPair[pair] = hopArr
-
-            hopsByPair[pair][hops - 2] += 1
+    ninjaFills = store.load(columns=["makerToken", "takerToken", "gasUsed"])
+    hopsByPair = hopStats.hopsByPairFromTable(
+        ninjaFills, symbolsByAddress, cutoffs if fittedHopCutoffs else hopStats.HOP_CUTOFFS
+    )
 
     for pair in hopsByPair:
         print("{}:\t\t{}".format(pair, hopsByPair[pair]))
@@ -321,7 +314,26 @@ def plotNinjaGasUsage():
 
 if __name__ == "__main__":
 
-    if exists("ninjaFills.npy"):
-        plotNinjaGasUsage()
+    store = FillStore()
+
+    # `python ninjaFills.py importLegacy [path]` seeds an empty store, once, with the fills
+    # scraped by the old all-at-once version of this script (ninjaFills.npy by default)
+    if len(sys.argv) > 1 and sys.argv[1] == "importLegacy":
+        path = sys.argv[2] if len(sys.argv) > 2 else "ninjaFills.npy"
+        if store.lastBlock is not None:
+            sys.exit("{} already holds fills up to block {}".format(store.path, store.lastBlock))
+        store.importLegacy(path, startBlock=13000000)
+        print("Imported {} into {} up to block {}".format(path, store.path, store.lastBlock))
+    # `python ninjaFills.py update` only fetches blocks since the last run, e.g. from cron.
+    # `python ninjaFills.py update identities` tracks every active taker in identitiesAnonymised.csv
+    elif len(sys.argv) > 1 and sys.argv[1] == "update":
+        takers = loadTakerAddresses() if "identities" in sys.argv[2:] else [NINJA_TAKER_ADDRESS]
+        getAllNinjaOrderFills(startBlock=13000000, blockStep=5000, store=store, takers=takers)
+    # `python ninjaFills.py follow` keeps running and picks up fills as new blocks arrive
+    elif len(sys.argv) > 1 and sys.argv[1] == "follow":
+        followNinjaFills(store)
+    # `python ninjaFills.py fittedHops` writes hops.json with the fitted leg cutoffs
+    elif store.lastBlock is not None:
+        plotNinjaGasUsage(store, fittedHopCutoffs="fittedHops" in sys.argv[1:])
     else:
-        getAllNinjaOrderFills(startBlock=13000000, blockStep=5000)
+        getAllNinjaOrderFills(startBlock=13000000, blockStep=5000, store=store)
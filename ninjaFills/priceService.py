@@ -0,0 +1,317 @@
+import os
+import csv
+import sqlite3
+from datetime import datetime, date, timezone, timedelta
+from concurrent.futures import Future
+from threading import Lock
+from time import sleep, time
+import requests
+
+from rpc import RateLimiter
+
+PRICE_CACHE_FILE = "prices.sqlite"
+ASSET_MARKS_CSV = "../treasury-flashloan-analysis/assetMarks.csv"
+
+COINGECKO_API_BASE_URL = "https://api.coingecko.com/api/v3"
+ETHERSCAN_API_BASE_URL = "https://api.etherscan.io/api"
+
+# Tokens without a contract address, by CoinGecko coin id
+COINGECKO_IDS = {"ETH": "ethereum"}
+
+# Day of the cache keys of spot prices and Etherscan quotes, which are kept apart from
+# the daily marks by a "spot:" or "etherscan:" token prefix. It sorts after every day, so
+# like today's prices a missing quote isn't cached.
+LATEST = "latest"
+
+# Etherscan quotes by name: (module, action, result field)
+ETHERSCAN_QUOTES = {
+    "gasPrice": ("gastracker", "gasoracle", "ProposeGasPrice"),
+    "ethUsd": ("stats", "ethprice", "ethusd"),
+}
+
+
+# UTC day ("YYYY-MM-DD") of a unix timestamp, date, datetime or day string
+def toDay(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return datetime.fromtimestamp(int(value), timezone.utc).date().isoformat()
+
+
+def today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def tokenKey(token):
+    return token.lower() if token.startswith("0x") else token
+
+
+# Reads a marks csv with a date column and one column of USD prices per token symbol,
+# like assetMarks.csv, into {(token, day): price}
+def loadMarks(path=ASSET_MARKS_CSV, dateColumn="Date", dateFormat="%d/%m/%Y"):
+    marks = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            day = datetime.strptime(row.pop(dateColumn), dateFormat).date().isoformat()
+            for token, price in row.items():
+                if price not in ("", None):
+                    marks[(tokenKey(token), day)] = float(price)
+    return marks
+
+
+# USD prices by (token, day) from CoinGecko and Etherscan, kept in a sqlite cache so the
+# same price is never requested twice. A request for many keys only fetches the missing
+# ones, one range request per token, and keys another thread is already fetching are
+# waited on rather than requested again. Tokens are contract addresses or COINGECKO_IDS
+# symbols; mark files are keyed by whatever their columns are called.
+#
+# Prices for past days never change. Spot prices and Etherscan quotes are stored under
+# their own keys, ("spot:<token>", LATEST) and ("etherscan:<name>", LATEST), so they never
+# stand in for a daily mark or the other way round, and are refetched once they are
+# older than maxAge seconds. With offline=True
+# no requests are made at all and a key that isn't cached or in a mark file is a KeyError.
+class PriceService:
+    def __init__(
+        self,
+        path=PRICE_CACHE_FILE,
+        markFiles=(),
+        offline=False,
+        requestsPerSecond=0.5,
+        retries=5,
+        backoff=2.0,
+        timeout=30,
+        etherscanApiKey=None,
+    ):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prices (
+                token TEXT NOT NULL,
+                day TEXT NOT NULL,
+                usd REAL,
+                fetched REAL NOT NULL,
+                PRIMARY KEY (token, day)
+            )
+            """
+        )
+        self.db.commit()
+        self.dbLock = Lock()
+
+        self.marks = {}
+        for markFile in markFiles:
+            self.marks.update(loadMarks(markFile) if isinstance(markFile, str) else markFile)
+
+        self.offline = offline
+        self.limiter = RateLimiter(requestsPerSecond)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.etherscanApiKey = etherscanApiKey or os.getenv("ETHERSCAN_API_KEY")
+        self.session = requests.Session()
+
+        self.inFlight = {}
+        self.inFlightLock = Lock()
+
+        self.requestCount = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, url, params=None):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                sleep(self.backoff * 2**attempt)
+                continue
+
+            # CoinGecko's free tier answers bursts with 429s
+            if r.status_code == 429 or r.status_code >= 500:
+                if attempt == self.retries:
+                    r.raise_for_status()
+                sleep(self.backoff * 2**attempt)
+                continue
+
+            r.raise_for_status()
+            self.requestCount += 1
+            return r.json()
+
+    def _cached(self, keys, maxAge=None):
+        found = {}
+        with self.dbLock:
+            for token, day in keys:
+                row = self.db.execute(
+                    "SELECT usd, fetched FROM prices WHERE token = ? AND day = ?", (token, day)
+                ).fetchone()
+                if row is not None and (maxAge is None or time() - row[1] <= maxAge):
+                    found[(token, day)] = row[0]
+        return found
+
+    def _store(self, prices):
+        with self.dbLock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?)",
+                [(token, day, usd, time()) for (token, day), usd in prices.items()],
+            )
+            self.db.commit()
+
+    # Looks keys up in the mark files, then the cache, and hands whatever is left to
+    # fetch(keys) -> {key: usd}, sharing fetches of the same key between threads
+    def _lookup(self, keys, fetch, maxAge=None):
+        keys = list(dict.fromkeys(keys))
+        prices = {key: self.marks[key] for key in keys if key in self.marks}
+        prices.update(self._cached([key for key in keys if key not in prices], maxAge))
+        missing = [key for key in keys if key not in prices]
+
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return prices
+        if self.offline:
+            raise KeyError("No offline price for {}".format(", ".join(map(str, missing))))
+
+        owned, waiting = {}, {}
+        with self.inFlightLock:
+            for key in missing:
+                if key in self.inFlight:
+                    waiting[key] = self.inFlight[key]
+                else:
+                    owned[key] = self.inFlight[key] = Future()
+
+        try:
+            fetched = fetch(list(owned)) if owned else {}
+            # A missing price for today may just not be published yet, so only past gaps are kept
+            self._store(
+                {
+                    key: fetched.get(key)
+                    for key in owned
+                    if fetched.get(key) is not None or key[1] < today()
+                }
+            )
+            for key, future in owned.items():
+                future.set_result(fetched.get(key))
+        except Exception as e:
+            for future in owned.values():
+                future.set_exception(e)
+            raise
+        finally:
+            with self.inFlightLock:
+                for key in owned:
+                    del self.inFlight[key]
+
+        prices.update({key: future.result() for key, future in owned.items()})
+        prices.update({key: future.result() for key, future in waiting.items()})
+        return prices
+
+    def _coinPath(self, token):
+        if token in COINGECKO_IDS:
+            return "/coins/{}".format(COINGECKO_IDS[token])
+        return "/coins/ethereum/contract/{}".format(token)
+
+    # One market_chart/range request per token covering every missing day. CoinGecko
+    # gives daily points at 00:00 UTC for long ranges and finer ones for short ranges,
+    # either way the first point of each day is its mark.
+    def _fetchDaily(self, keys):
+        daysByToken = {}
+        for token, day in keys:
+            daysByToken.setdefault(token, []).append(day)
+
+        prices = {}
+        for token, days in daysByToken.items():
+            start = datetime.fromisoformat(min(days)).replace(tzinfo=timezone.utc)
+            end = datetime.fromisoformat(max(days)).replace(tzinfo=timezone.utc) + timedelta(days=1)
+            try:
+                response = self._get(
+                    COINGECKO_API_BASE_URL + self._coinPath(token) + "/market_chart/range",
+                    params={
+                        "vs_currency": "usd",
+                        "from": int(start.timestamp()),
+                        "to": int(end.timestamp()),
+                    },
+                )
+            except requests.HTTPError as e:
+                # Tokens CoinGecko doesn't list have no price on any day
+                if e.response is not None and e.response.status_code == 404:
+                    continue
+                raise
+
+            marks = {}
+            for timestamp, price in response.get("prices", []):
+                marks.setdefault(toDay(timestamp // 1000), price)
+            for day in days:
+                prices[(token, day)] = marks.get(day)
+
+        return prices
+
+    # Spot prices of tokens in two bulk requests: one for contract addresses, one for coin ids
+    def _fetchSpot(self, keys):
+        tokens = [key[0][len("spot:") :] for key in keys]
+        addresses = [token for token in tokens if token not in COINGECKO_IDS]
+        coinIds = [COINGECKO_IDS[token] for token in tokens if token in COINGECKO_IDS]
+
+        quotes = {}
+        if addresses:
+            quotes.update(
+                self._get(
+                    COINGECKO_API_BASE_URL + "/simple/token_price/ethereum",
+                    params={"contract_addresses": ",".join(addresses), "vs_currencies": "usd"},
+                )
+            )
+        if coinIds:
+            quotes.update(
+                self._get(
+                    COINGECKO_API_BASE_URL + "/simple/price",
+                    params={"ids": ",".join(coinIds), "vs_currencies": "usd"},
+                )
+            )
+
+        return {
+            key: quotes.get(COINGECKO_IDS.get(token, token), {}).get("usd")
+            for key, token in zip(keys, tokens)
+        }
+
+    def _fetchEtherscan(self, keys):
+        prices = {}
+        for key in keys:
+            module, action, field = ETHERSCAN_QUOTES[key[0].split(":")[1]]
+            response = self._get(
+                ETHERSCAN_API_BASE_URL,
+                params={"module": module, "action": action, "apikey": self.etherscanApiKey},
+            )
+            prices[key] = float(response["result"][field])
+        return prices
+
+    # {(token, day): usd} for every combination of tokens and days, None where CoinGecko
+    # has no price. Days are unix timestamps, dates or "YYYY-MM-DD" strings.
+    def prices(self, tokens, days):
+        days = [toDay(day) for day in days]
+        keys = [(tokenKey(token), day) for token in tokens for day in days]
+        return self._lookup(keys, self._fetchDaily)
+
+    # Like prices(), for a list of (token, day) pairs such as the rows of a table
+    def pricesFor(self, pairs):
+        keys = [(tokenKey(token), toDay(day)) for token, day in pairs]
+        prices = self._lookup(keys, self._fetchDaily)
+        return [prices[key] for key in keys]
+
+    def price(self, token, day):
+        return self.pricesFor([(token, day)])[0]
+
+    # {token: usd} of the current prices of tokens
+    def spot(self, tokens, maxAge=300):
+        keys = {token: ("spot:" + tokenKey(token), LATEST) for token in tokens}
+        prices = self._lookup(keys.values(), self._fetchSpot, maxAge)
+        return {token: prices[key] for token, key in keys.items()}
+
+    # One of ETHERSCAN_QUOTES, e.g. the proposed gas price in gwei
+    def etherscan(self, name, maxAge=60):
+        key = ("etherscan:" + name, LATEST)
+        return self._lookup([key], self._fetchEtherscan, maxAge)[key]
+
+    def close(self):
+        self.db.close()
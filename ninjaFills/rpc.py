@@ -0,0 +1,134 @@
+from time import sleep, monotonic
+from threading import Lock
+import itertools
+import requests
+
+
+# Error raised when a JSON-RPC call returns an error object instead of a result
+class RpcError(Exception):
+    def __init__(self, code, message, data=None):
+        super().__init__("JSON-RPC error {}: {}".format(code, message))
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+# Token bucket shared by every thread making requests against the same provider
+class RateLimiter:
+    def __init__(self, requestsPerSecond, burst=None):
+        self.rate = requestsPerSecond
+        self.capacity = burst if burst is not None else max(1, requestsPerSecond)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.lock = Lock()
+
+    def acquire(self, tokens=1):
+        if not self.rate:
+            return
+
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                # Requests costing more than the burst go into debt instead of waiting forever
+                needed = min(tokens, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return
+
+                wait = (needed - self.tokens) / self.rate
+
+            sleep(wait)
+
+
+# Minimal thread-safe JSON-RPC client over a keep-alive requests session
+class RpcClient:
+    def __init__(self, url, requestsPerSecond=None, retries=5, backoff=0.5, timeout=60):
+        self.url = url
+        self.limiter = RateLimiter(requestsPerSecond) if requestsPerSecond else None
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.ids = itertools.count()
+        self.lock = Lock()
+        self.requestCount = 0
+        self.bytesReceived = 0
+
+    def _post(self, payload, cost=1):
+        for attempt in range(self.retries + 1):
+            if self.limiter:
+                self.limiter.acquire(cost)
+
+            try:
+                r = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                sleep(self.backoff * 2**attempt)
+                continue
+
+            # Back off and retry when the provider rate limits us or hiccups
+            if r.status_code == 429 or r.status_code >= 500:
+                if attempt == self.retries:
+                    r.raise_for_status()
+                sleep(self.backoff * 2**attempt)
+                continue
+
+            r.raise_for_status()
+
+            with self.lock:
+                self.requestCount += 1
+                self.bytesReceived += len(r.content)
+
+            return r.json(), len(r.content)
+
+    def call(self, method, params=()):
+        return self.callSized(method, params)[0]
+
+    # Like call(), also returning the size of the response in bytes
+    def callSized(self, method, params=()):
+        payload = {
+            "jsonrpc": "2.0",
+            "id": next(self.ids),
+            "method": method,
+            "params": list(params),
+        }
+        response, size = self._post(payload)
+
+        if "error" in response:
+            error = response["error"]
+            raise RpcError(error.get("code"), error.get("message"), error.get("data"))
+
+        return response["result"], size
+
+    # Sends (method, params) pairs as one JSON-RPC batch, results come back in call order
+    def batch(self, calls):
+        if not calls:
+            return []
+
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": list(params)}
+            for i, (method, params) in enumerate(calls)
+        ]
+        responses, _ = self._post(payload, cost=len(payload))
+
+        # Some providers answer a batch with a single error object
+        if isinstance(responses, dict):
+            error = responses.get("error", {})
+            raise RpcError(error.get("code"), error.get("message"), error.get("data"))
+
+        results = [None] * len(calls)
+        for response in responses:
+            if "error" in response:
+                error = response["error"]
+                raise RpcError(
+                    error.get("code"), error.get("message"), error.get("data")
+                )
+            results[response["id"]] = response["result"]
+
+        return results
@@ -0,0 +1,71 @@
+import numpy as np
+
+from abiDecoder import EventDecoder, RFQ_ORDER_FILLED
+from fillStore import FillStore, fillTable
+from eventStore import toRecords
+from mockNode import encodeRfqOrderFilled
+
+# A USDC/WETH fill from ninjaFills.npy: 4999.15 USDC for 1.557 WETH
+FILL = {
+    "txHash": "0x7a6d012854be330921325f7ba7661a46232dea9884fcf88fbfef1aa858c90bed",
+    "orderHash": "0xb0be5e380bde439f901e1de36670fc71cf423d571dd304cb5b38224f57ba3df4",
+    "maker": "0xe3696c9248e5595e7ec2a0da0004a41bf8d84550",
+    "taker": "0x3d71d79c224998e608d03c5ec9b405e7a38505f0",
+    "makerToken": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48",
+    "takerToken": "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2",
+    "takerTokenFilledAmount": 1557285797744639744,
+    "makerTokenFilledAmount": 4999151865,
+}
+GAS = {"gasLimit": 433271, "gasUsed": 250878, "gasPrice": 95616233691, "timestamp": 1628634920, "blockNumber": 13000180}
+
+LOG = {
+    "data": encodeRfqOrderFilled(FILL),
+    "topics": [EventDecoder(RFQ_ORDER_FILLED).topic],
+    "transactionHash": FILL["txHash"],
+    "blockNumber": hex(GAS["blockNumber"]),
+    "logIndex": "0x0",
+}
+
+
+# What the fill store holds for LOG when it is scraped and decoded today
+def decodedRecord():
+    columns, _ = EventDecoder(RFQ_ORDER_FILLED).decode([LOG])
+    return toRecords(fillTable(columns, [LOG], {FILL["txHash"]: GAS}))[0]
+
+
+# The row the old getAllNinjaOrderFills built for LOG, slicing the data at fixed offsets
+def oldSlicingRow():
+    dataStr = LOG["data"][2:]
+    data = [dataStr[i : i + 64] for i in range(0, len(dataStr), 64)]
+    row = {
+        "txHash": LOG["transactionHash"],
+        "orderHash": "0x" + data[0],
+        "maker": "0x" + data[1][-40:],
+        "taker": "0x" + data[2][-40:],
+        "makerToken": "0x" + data[3][-40:],
+        "takerToken": "0x" + data[4][-40:],
+        "makerTokenFilledAmount": int(data[5], 16),
+        "takerTokenFilledAmount": int(data[6], 16),
+    }
+    row.update(GAS)
+    return row
+
+
+def importedRecord(tmp_path, row):
+    np.save(tmp_path / "ninjaFills.npy", np.array([row], dtype=object), allow_pickle=True)
+    store = FillStore(str(tmp_path / "store"))
+    store.importLegacy(str(tmp_path / "ninjaFills.npy"), startBlock=13000000)
+    return store.loadRecords()[0]
+
+
+def test_importLegacySwapsOldSlicingAmounts(tmp_path):
+    row = oldSlicingRow()
+    assert row["makerTokenFilledAmount"] == FILL["takerTokenFilledAmount"]
+
+    assert importedRecord(tmp_path, row) == decodedRecord()
+
+
+def test_importLegacyKeepsEventOrderAmounts(tmp_path):
+    row = dict(FILL, **GAS)
+
+    assert importedRecord(tmp_path, row) == decodedRecord()
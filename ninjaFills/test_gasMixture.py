@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from gasMixture import GasMixture
+from hopStats import HOP_CUTOFFS
+
+
+# One leg fills only, so the HOP_CUTOFFS split leaves the two and three leg components empty
+def test_fitWithEmptyCutoffPartitionsStaysFinite():
+    gas = np.random.default_rng(0).normal(180000, 20000, 1000).clip(100000, HOP_CUTOFFS[0] - 1)
+
+    mixture = GasMixture().fit(gas)
+
+    assert np.isfinite(mixture.means).all()
+    assert np.isfinite(mixture.stds).all()
+    assert np.isfinite(mixture.logLikelihood)
+    assert mixture.weights.sum() == pytest.approx(1)
+
+
+def test_fitNeedsOneDistinctValuePerComponent():
+    with pytest.raises(ValueError, match="at least 3 distinct gas values"):
+        GasMixture().fit([150000, 150000, 300000])
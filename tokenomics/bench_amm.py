@@ -0,0 +1,234 @@
+import argparse
+import copy
+import math
+import sys
+import time
+
+import numpy as np
+
+from bench_batch import random_params, scalar_model
+from models.amm import EthBidKernel
+from models.rook_bid import RookBidModel
+from models.rook_bid_batch import BatchRookBidModel
+from util.balances import RookSupply, SnapshotSupplyProvider
+from util.params import *
+
+
+# RookBidModel's day as it was before the AMM kernel: one method call per day
+# on Python floats, reading the parameter objects and the RookSupply
+class MethodPerDayModel(RookBidModel):
+    def iterate_one_day(self, volume_usd: float, treasury_burn: bool):
+        if self.liquidity_model == 'mcap':
+            market_cap = self.rook_supply.get_circulating_supply() * self.rook_price
+            amm_usdc = self.liquidity_constant * market_cap
+            amm_rook = amm_usdc / self.rook_price
+        elif self.liquidity_model == 'circ_supply':
+            amm_rook = self.liquidity_constant * self.rook_supply.get_circulating_supply()
+            amm_usdc = amm_rook * self.rook_price
+        else:
+            amm_usdc = self.liquidity_constant / 2
+            amm_rook = amm_usdc / self.rook_price
+
+        daily_bid_volume_usd = (volume_usd * self.ecosystem_params.mev_volume_ratio *
+                                self.protocol_params.target_bid_percent)
+        keeper_rook_bought = ((amm_rook * daily_bid_volume_usd) /
+                              (amm_usdc + daily_bid_volume_usd))
+        amm_rook -= keeper_rook_bought
+        amm_usdc += daily_bid_volume_usd
+
+        user_bid = keeper_rook_bought * self.bid_distribution_params.user
+        treasury_bid = keeper_rook_bought * self.bid_distribution_params.treasury
+        partner_bid = keeper_rook_bought * self.bid_distribution_params.partner
+        burn_bid = keeper_rook_bought * self.bid_distribution_params.burn
+        stake_bid = keeper_rook_bought * self.bid_distribution_params.stake
+
+        user_rook_sold = (user_bid * self.ecosystem_params.user_claim_percent +
+                          partner_bid * self.ecosystem_params.partner_claim_percent)
+        user_usdc_bought = ((amm_usdc * user_rook_sold) /
+                            (amm_rook + user_rook_sold))
+        user_rook_unclaimed = (user_bid * (1 - self.ecosystem_params.user_claim_percent) +
+                               partner_bid * (1 - self.ecosystem_params.partner_claim_percent))
+        amm_rook += user_rook_sold
+        amm_usdc -= user_usdc_bought
+
+        if treasury_burn:
+            treasury_usdc_bought = self.dao_params.daily_treasury_burn
+            treasury_rook_sold = ((amm_rook * treasury_usdc_bought) /
+                                  (amm_usdc - treasury_usdc_bought))
+        else:
+            treasury_usdc_bought = 0
+            treasury_rook_sold = 0
+        amm_rook += treasury_rook_sold
+        amm_usdc -= treasury_usdc_bought
+
+        self.rook_price = amm_usdc / amm_rook
+        self.rook_supply.staked += stake_bid
+        self.rook_supply.treasury += treasury_bid - treasury_rook_sold
+        self.rook_supply.unclaimed += user_rook_unclaimed
+        self.rook_supply.burned += burn_bid
+
+    def run_days(self):
+        stable_runway = math.floor(
+            self.treasury_stables / self.dao_params.daily_treasury_burn)
+        for day in range(self.sim_length_days):
+            self.iterate_one_day(self.volume_timeseries[day],
+                                 day >= stable_runway)
+            if self.rook_price <= 0 or self.rook_supply.treasury <= 0:
+                break
+        return day + 1
+
+
+def kernel_days(model: RookBidModel):
+    for day, state, alive in model.kernel.run(
+            model.state(), model.volume_timeseries[:model.sim_length_days]):
+        pass
+    model.set_state(state)
+    return day + 1
+
+
+def same_state(a, b):
+    return np.array_equal(np.asarray(a, dtype=float),
+                          np.asarray(b, dtype=float), equal_nan=True)
+
+
+def degenerate_models(days: int, supply: RookSupply, liquidity_model: str):
+    """
+    A configuration that drains the $1M pool under $500M a day of volume:
+    the ROOK price turns NaN after about a year and never stops the run.
+    Each model class must give the same NaNs rather than raise.
+    """
+    bid_params = BidDistributionParams(0.1, 0.1, 0.1, 0.05)
+    return [model_class(
+        sim_length_days=days,
+        protocol_params=ProtocolParams(0.9, bid_params),
+        bid_distribution_params=bid_params,
+        ecosystem_params=EcosystemParams(0.0015, 0, 0),
+        dao_params=DAOParams(25000),
+        volume_model='constant',
+        volume_params=VolumeParams(500000000.0, 0, 0),
+        liquidity_model=liquidity_model,
+        liquidity_constant=1000000.0,
+        initial_rook_price=25.0,
+        rook_supply=copy.copy(supply),
+    ) for model_class in (MethodPerDayModel, RookBidModel, RookBidModel)]
+
+
+def degenerate_check(days: int, supply: RookSupply):
+    same = True
+    for liquidity_model in ('constant', 'circ_supply'):
+        legacy, kernel, batched = degenerate_models(
+            days, supply, liquidity_model)
+        batch = BatchRookBidModel.from_models([batched])
+        result = batch.run_sim(record=())
+        batch_state = [result['final_' + name][0] for name in
+                       ('rook_price', 'staked_rook', 'treasury_rook',
+                        'unclaimed_rook', 'burned_rook')]
+        legacy_days = legacy.run_days()
+        same &= (kernel_days(kernel) == legacy_days == result['days'][0] and
+                 same_state(kernel.state(), legacy.state()) and
+                 same_state(batch_state, legacy.state()))
+    return same
+
+
+def ns_per_step(run, steps_per_day=1):
+    start = time.perf_counter()
+    days = run()
+    return (time.perf_counter() - start) / (days * steps_per_day) * 1e9, days
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time one day step of the ROOK and ETH bid models: the '
+                    'per-day method loop against the AMM kernel, for one '
+                    'scenario and for a batch')
+    parser.add_argument('--days', type=int, default=365 * 10)
+    parser.add_argument('--volume', type=float, default=10000000.0)
+    parser.add_argument('--price', type=float, default=25.0)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--scenarios', type=int, default=10000)
+    parser.add_argument('--snapshot', default=None,
+                        help='ROOK supply snapshot to use instead of the chain')
+    args = parser.parse_args()
+
+    params = random_params(max(args.runs, args.scenarios))
+    supply = RookSupply(SnapshotSupplyProvider(args.snapshot)
+                        if args.snapshot else None)
+
+    def models(model_class):
+        return [scalar_model(params, i, args.days, args.volume, args.price,
+                             copy.copy(supply), model_class)
+                for i in range(args.runs)]
+
+    legacy = models(MethodPerDayModel)
+    kernel = models(RookBidModel)
+    legacy_ns = np.median([ns_per_step(model.run_days)[0]
+                           for model in legacy])
+    kernel_ns = np.median([ns_per_step(lambda: kernel_days(model))[0]
+                           for model in kernel])
+    same = all(same_state(new.state(), old.state())
+               for new, old in zip(kernel, legacy))
+    print('ROOK bid, method per day:      {:8.0f} ns/day'.format(legacy_ns))
+    print('ROOK bid, kernel (1 scenario): {:8.0f} ns/day, same results: {}'
+          .format(kernel_ns, same))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        same_nans = degenerate_check(args.days, supply)
+    print('ROOK bid, drained pool:        same NaN results: {}'
+          .format(same_nans))
+
+    batch = BatchRookBidModel(
+        sim_length_days=args.days,
+        volume_timeseries=np.full(args.days, args.volume),
+        liquidity_model='mcap',
+        initial_rook_price=args.price,
+        rook_supply=supply,
+        **{name: param[:args.scenarios] for name, param in params.items()})
+
+    def batch_days():
+        for day, state, alive in batch.iterate(batch.volume_timeseries):
+            pass
+        return day + 1
+    batch_ns, days = ns_per_step(batch_days, args.scenarios)
+    print('ROOK bid, kernel ({} scenarios): {:6.0f} ns/scenario-day, {} days'
+          .format(args.scenarios, batch_ns, days))
+
+    # the notebook's ETH bid model
+    def eth_kernel(scenarios):
+        def param(value):
+            return value if scenarios is None else np.full(scenarios, value)
+        return EthBidKernel(
+            target_bid_percent=param(0.9), mev_volume_ratio=param(0.001),
+            treasury_bid=param(0.1), stake_bid=param(0.1),
+            burn_bid=param(0.05), daily_treasury_burn=param(25000),
+            eth_price=2000, treasury_buy_days=367, treasury_runway_days=1097,
+            liquidity_model='mcap', liquidity_constant=0.1,
+            total_supply=supply.total_supply,
+            strategic_reserves=supply.strategic_reserves), (
+            param(args.price), param(float(supply.staked)), param(10000.0),
+            param(float(supply.treasury)), param(0.0))
+
+    def eth_days(scenarios):
+        kernel, state = eth_kernel(scenarios)
+        for day, state, alive in kernel.run(
+                state, np.full(args.days, args.volume)):
+            pass
+        return day + 1
+    eth_ns = np.median([ns_per_step(lambda: eth_days(None))[0]
+                        for _ in range(args.runs)])
+    print('ETH bid, kernel (1 scenario):  {:8.0f} ns/day'.format(eth_ns))
+    eth_batch_ns, days = ns_per_step(lambda: eth_days(args.scenarios),
+                                     args.scenarios)
+    print('ETH bid, kernel ({} scenarios): {:7.0f} ns/scenario-day, {} days'
+          .format(args.scenarios, eth_batch_ns, days))
+
+    # the kernel replaced the method per day loop, so it has to match it and
+    # beat it on a single scenario too
+    failures = []
+    if kernel_ns >= legacy_ns:
+        failures.append('ROOK bid kernel is not faster than the method per '
+                        'day loop: {:.0f} >= {:.0f} ns/day'
+                        .format(kernel_ns, legacy_ns))
+    if not (same and same_nans):
+        failures.append('ROOK bid kernel results differ from the method per '
+                        'day loop')
+    if failures:
+        sys.exit('\n'.join(failures))
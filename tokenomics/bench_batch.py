@@ -0,0 +1,109 @@
+import argparse
+import contextlib
+import copy
+import io
+import time
+
+import numpy as np
+
+from models.rook_bid import RookBidModel
+from models.rook_bid_batch import BatchRookBidModel
+from util.balances import RookSupply, SnapshotSupplyProvider
+from util.params import *
+
+
+def random_params(scenarios: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return dict(
+        target_bid_percent=rng.uniform(0.5, 0.99, scenarios),
+        mev_volume_ratio=rng.uniform(0.0005, 0.0015, scenarios),
+        user_claim_percent=rng.uniform(0, 1, scenarios),
+        partner_claim_percent=rng.uniform(0, 1, scenarios),
+        treasury_bid=rng.uniform(0, 0.15, scenarios),
+        partner_bid=rng.uniform(0, 0.15, scenarios),
+        stake_bid=rng.uniform(0, 0.1, scenarios),
+        burn_bid=rng.uniform(0, 0.1, scenarios),
+        daily_treasury_burn=rng.uniform(20000, 50000, scenarios),
+        liquidity_constant=rng.uniform(0.01, 0.2, scenarios),
+    )
+
+
+def scalar_model(params: dict, i: int, sim_length: int, volume: float,
+                 initial_rook_price: float, rook_supply: RookSupply,
+                 model_class=RookBidModel):
+    bid_params = BidDistributionParams(
+        params['treasury_bid'][i], params['partner_bid'][i],
+        params['stake_bid'][i], params['burn_bid'][i])
+    return model_class(
+        sim_length_days=sim_length,
+        protocol_params=ProtocolParams(
+            params['target_bid_percent'][i], bid_params),
+        bid_distribution_params=bid_params,
+        ecosystem_params=EcosystemParams(
+            params['mev_volume_ratio'][i], params['user_claim_percent'][i],
+            params['partner_claim_percent'][i]),
+        dao_params=DAOParams(params['daily_treasury_burn'][i]),
+        volume_model='constant',
+        volume_params=VolumeParams(volume, 0, 0),
+        liquidity_model='mcap',
+        liquidity_constant=params['liquidity_constant'][i],
+        initial_rook_price=initial_rook_price,
+        rook_supply=rook_supply,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare RookBidModel.run_sim per scenario against '
+                    'BatchRookBidModel over a parameter sweep')
+    parser.add_argument('--scenarios', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365 * 10)
+    parser.add_argument('--volume', type=float, default=50000000.0)
+    parser.add_argument('--price', type=float, default=25.0)
+    parser.add_argument('--scalarScenarios', type=int, default=20)
+    parser.add_argument('--snapshot', default=None,
+                        help='ROOK supply snapshot to use instead of the chain')
+    args = parser.parse_args()
+
+    params = random_params(args.scenarios)
+    supply = RookSupply(SnapshotSupplyProvider(args.snapshot)
+                        if args.snapshot else None)
+    models = [scalar_model(params, i, args.days, args.volume, args.price,
+                           copy.copy(supply))
+              for i in range(args.scalarScenarios)]
+
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        frames = [model.run_sim() for model in models]
+    scalar = (time.time() - start) / len(models)
+    print('scalar run_sim:  {:.3f}s per scenario, {:.0f}s for {} '
+          'scenarios'.format(scalar, scalar * args.scenarios,
+                             args.scenarios))
+
+    batch = BatchRookBidModel(
+        sim_length_days=args.days,
+        volume_timeseries=np.full(args.days, args.volume),
+        liquidity_model='mcap',
+        initial_rook_price=args.price,
+        rook_supply=supply,
+        **params)
+    start = time.time()
+    result = batch.run_sim(record=('rook_price', 'treasury_rook'))
+    print('batch run_sim:   {:.2f}s for {} scenarios x {} days, {} '
+          'stopped early'.format(time.time() - start, args.scenarios,
+                                 args.days,
+                                 int((result['days'] < args.days).sum())))
+
+    check = BatchRookBidModel(
+        sim_length_days=args.days,
+        volume_timeseries=np.full(args.days, args.volume),
+        liquidity_model='mcap',
+        initial_rook_price=args.price,
+        rook_supply=supply,
+        **{name: param[:len(models)] for name, param in params.items()})
+    checked = check.run_sim()
+    same = all(
+        frame.drop(columns='date').equals(
+            check.scenario_dataframe(checked, i).drop(columns='date'))
+        for i, frame in enumerate(frames))
+    print('same results as the scalar model: {}'.format(same))
@@ -0,0 +1,327 @@
+import numpy as np
+
+
+def divide(numerator, denominator):
+    """
+    numerator / denominator with IEEE semantics for Python floats too: a
+    division by zero gives inf or NaN, as it does for np.float64 and arrays,
+    instead of raising ZeroDivisionError. Every other float operation
+    already follows IEEE, so with this the scalar path gives the same
+    results as the arrays, NaN prices of a drained pool included.
+    """
+    try:
+        return numerator / denominator
+    except ZeroDivisionError:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return float(np.float64(numerator) / np.float64(denominator))
+
+
+def get_amount_out(reserve_in, reserve_out, amount_in):
+    """
+    Tokens out of a constant product pool for amount_in tokens in
+    """
+    return divide(reserve_out * amount_in, reserve_in + amount_in)
+
+
+def get_amount_in(reserve_in, reserve_out, amount_out):
+    """
+    Tokens into a constant product pool to take amount_out tokens out
+    """
+    return divide(reserve_in * amount_out, reserve_out - amount_out)
+
+
+def as_param(value):
+    """
+    Arrays of scenarios as they are, scalars (NumPy's included) as Python
+    floats, which are much faster to do arithmetic on one at a time
+    """
+    return value if isinstance(value, np.ndarray) else float(value)
+
+
+def select(condition, x, y):
+    """
+    x where condition holds, else y: np.where for arrays of scenarios and a
+    plain branch for a single one, which stays in Python floats
+    """
+    if isinstance(condition, np.ndarray):
+        return np.where(condition, x, y)
+    return x if condition else y
+
+
+class AmmKernel:
+    """
+    One day of a tokenomics model as arithmetic on the ROOK/USDC pool and the
+    supply balances. The state is a tuple of balances, each a Python float
+    for a single scenario or an array of shape (scenarios,), and every
+    parameter can be either too; the same code runs both, with the same IEEE
+    semantics (divisions go through divide, so division by zero gives inf
+    or NaN, and NaN doesn't stop a scenario). Subclasses define the state,
+    the day's step and when a scenario stops.
+
+    liquidity_model sets the pool before each day: 'mcap' (liquidity_constant
+    as a share of the circulating supply's market cap), 'circ_supply' (a
+    share of the circulating supply), a function of the ROOK price and
+    circulating supply returning (amm_rook, amm_usdc), or anything else for
+    a constant liquidity_constant $ of liquidity.
+    """
+
+    def __init__(self, liquidity_model, liquidity_constant, total_supply,
+                 strategic_reserves):
+        self.liquidity_model = liquidity_model
+        self.liquidity_constant = as_param(liquidity_constant)
+        self.total_supply = as_param(total_supply)
+        self.strategic_reserves = as_param(strategic_reserves)
+
+    def liquidity(self, rook_price, circulating_supply):
+        if callable(self.liquidity_model):
+            return self.liquidity_model(rook_price, circulating_supply)
+        if self.liquidity_model == 'mcap':
+            market_cap = circulating_supply * rook_price
+            amm_usdc = self.liquidity_constant * market_cap
+            amm_rook = divide(amm_usdc, rook_price)
+        elif self.liquidity_model == 'circ_supply':
+            amm_rook = self.liquidity_constant * circulating_supply
+            amm_usdc = amm_rook * rook_price
+        else:
+            amm_usdc = self.liquidity_constant / 2
+            amm_rook = divide(amm_usdc, rook_price)
+        return amm_rook, amm_usdc
+
+    def step(self, day: int, state: tuple, volume_usd) -> tuple:
+        raise NotImplementedError
+
+    def stopped(self, state: tuple):
+        raise NotImplementedError
+
+    def run(self, state: tuple, volumes):
+        """
+        Runs the whole horizon, one day per item of volumes (each a scalar or
+        a (scenarios,) array of the day's volume in $). Yields (day, state,
+        alive) after each day. A single scenario ends after the day it stops
+        on; with arrays, stopped scenarios keep the state of the day they
+        stopped on and the run ends once all of them have.
+        """
+        batch = isinstance(state[0], np.ndarray)
+        if batch:
+            alive = np.ones(state[0].shape, dtype=bool)
+        else:
+            alive = True
+            state = tuple(as_param(balance) for balance in state)
+            if isinstance(volumes, np.ndarray):
+                volumes = volumes.tolist()
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for day, volume_usd in enumerate(volumes):
+                new_state = self.step(day, state, volume_usd)
+                if batch:
+                    state = tuple(np.where(alive, new, old)
+                                  for new, old in zip(new_state, state))
+                    alive = alive & ~self.stopped(state)
+                else:
+                    state = new_state
+                    alive = not self.stopped(state)
+                yield day, state, alive
+
+                if not (alive.any() if batch else alive):
+                    return
+
+
+class RookBidKernel(AmmKernel):
+    """
+    The ROOK bid model's day. State: (rook_price, staked, treasury,
+    unclaimed, burned). Keepers buy ROOK from the pool to bid, the bid is
+    split between users, partners, the treasury, stakers and the burn, users
+    and partners sell the share of their rewards they claim, and once its
+    stables run out the treasury sells ROOK for its daily burn.
+    """
+
+    def __init__(
+        self,
+        target_bid_percent,
+        mev_volume_ratio,
+        user_claim_percent,
+        partner_claim_percent,
+        treasury_bid,
+        partner_bid,
+        stake_bid,
+        burn_bid,
+        daily_treasury_burn,
+        treasury_stables,
+        liquidity_model,
+        liquidity_constant,
+        total_supply: float,
+        strategic_reserves: float,
+    ):
+        super().__init__(liquidity_model, liquidity_constant, total_supply,
+                         strategic_reserves)
+        self.target_bid_percent = as_param(target_bid_percent)
+        self.mev_volume_ratio = as_param(mev_volume_ratio)
+        self.user_claim_percent = as_param(user_claim_percent)
+        self.partner_claim_percent = as_param(partner_claim_percent)
+        self.treasury_bid = as_param(treasury_bid)
+        self.partner_bid = as_param(partner_bid)
+        self.stake_bid = as_param(stake_bid)
+        self.burn_bid = as_param(burn_bid)
+        # Same as BidDistributionParams.user
+        self.user_bid = (1 - self.treasury_bid - self.partner_bid -
+                         self.stake_bid - self.burn_bid)
+        self.daily_treasury_burn = as_param(daily_treasury_burn)
+
+        # days before the treasury must start selling ROOK
+        self.stable_runway = as_param(np.floor(
+            divide(as_param(treasury_stables), self.daily_treasury_burn)))
+
+    def day(self, state: tuple, volume_usd, treasury_burn) -> tuple:
+        rook_price, staked, treasury, unclaimed, burned = state
+
+        # Set AMM Liquidity:
+        # Same as RookSupply.get_circulating_supply
+        circulating_supply = (self.total_supply - treasury -
+                              self.strategic_reserves - burned - unclaimed)
+        amm_rook, amm_usdc = self.liquidity(rook_price, circulating_supply)
+
+        # STEP 1: Keepers buying ROOK to bid:
+        daily_bid_volume_usd = (volume_usd * self.mev_volume_ratio *
+                                self.target_bid_percent)
+        keeper_rook_bought = get_amount_out(
+            amm_usdc, amm_rook, daily_bid_volume_usd)
+        amm_rook = amm_rook - keeper_rook_bought
+        amm_usdc = amm_usdc + daily_bid_volume_usd
+
+        # STEP 2: Keepers bid ROOK:
+        user_bid = keeper_rook_bought * self.user_bid
+        treasury_bid = keeper_rook_bought * self.treasury_bid
+        partner_bid = keeper_rook_bought * self.partner_bid
+        burn_bid = keeper_rook_bought * self.burn_bid
+        stake_bid = keeper_rook_bought * self.stake_bid
+
+        # STEP 3: Users and Partners dumping ROOK:
+        user_rook_sold = (user_bid * self.user_claim_percent +
+                          partner_bid * self.partner_claim_percent)
+        user_usdc_bought = get_amount_out(amm_rook, amm_usdc, user_rook_sold)
+        user_rook_unclaimed = (user_bid * (1 - self.user_claim_percent) +
+                               partner_bid * (1 - self.partner_claim_percent))
+        amm_rook = amm_rook + user_rook_sold
+        amm_usdc = amm_usdc - user_usdc_bought
+
+        # STEP 4: Treasury dumping ROOK (if applicable):
+        treasury_usdc_bought = select(
+            treasury_burn, self.daily_treasury_burn, 0)
+        treasury_rook_sold = select(
+            treasury_burn,
+            get_amount_in(amm_rook, amm_usdc, treasury_usdc_bought), 0)
+        amm_rook = amm_rook + treasury_rook_sold
+        amm_usdc = amm_usdc - treasury_usdc_bought
+
+        # New ROOK price and supply balances
+        return (divide(amm_usdc, amm_rook),
+                staked + stake_bid,
+                treasury + (treasury_bid - treasury_rook_sold),
+                unclaimed + user_rook_unclaimed,
+                burned + burn_bid)
+
+    def step(self, day: int, state: tuple, volume_usd) -> tuple:
+        return self.day(state, volume_usd, day >= self.stable_runway)
+
+    def stopped(self, state: tuple):
+        rook_price, staked, treasury, unclaimed, burned = state
+        return (rook_price <= 0) | (treasury <= 0)
+
+
+class EthBidKernel(AmmKernel):
+    """
+    The ETH bid model's day. State: (rook_price, staked, treasury_eth,
+    treasury_rook, burned). Keepers bid ETH, so there is no keeper buying or
+    user selling of ROOK; instead the burn cut, the autocompounded part of
+    the staking cut and, for the first treasury_buy_days, the treasury cut
+    are used to buy ROOK from the pool (ETH converted to USDC losslessly).
+    After that the treasury keeps its cut in ETH, and from
+    treasury_runway_days on it sells ETH for its daily burn.
+    """
+
+    def __init__(
+        self,
+        target_bid_percent,
+        mev_volume_ratio,
+        treasury_bid,
+        stake_bid,
+        burn_bid,
+        daily_treasury_burn,
+        eth_price,
+        treasury_buy_days,
+        treasury_runway_days,
+        liquidity_model,
+        liquidity_constant,
+        total_supply: float,
+        strategic_reserves: float = 0,
+        stake_autocompound=0.5,
+    ):
+        super().__init__(liquidity_model, liquidity_constant, total_supply,
+                         strategic_reserves)
+        self.target_bid_percent = as_param(target_bid_percent)
+        self.mev_volume_ratio = as_param(mev_volume_ratio)
+        self.treasury_bid = as_param(treasury_bid)
+        self.stake_bid = as_param(stake_bid)
+        self.burn_bid = as_param(burn_bid)
+        self.daily_treasury_burn = as_param(daily_treasury_burn)
+        self.eth_price = as_param(eth_price)
+        self.treasury_buy_days = treasury_buy_days
+        self.treasury_runway_days = treasury_runway_days
+        self.stake_autocompound = as_param(stake_autocompound)
+
+    def day(self, state: tuple, volume_usd, treasury_buy,
+            treasury_burn) -> tuple:
+        rook_price, staked, treasury_eth, treasury_rook, burned = state
+
+        circulating_supply = (self.total_supply - treasury_rook -
+                              self.strategic_reserves - burned)
+        amm_rook, amm_usdc = self.liquidity(rook_price, circulating_supply)
+        rook_per_eth = divide(self.eth_price, rook_price)
+
+        # STEP 1: Keepers buying ETH to bid:
+        daily_bid_volume_usd = (volume_usd * self.mev_volume_ratio *
+                                self.target_bid_percent)
+        keeper_eth_bought = divide(daily_bid_volume_usd, self.eth_price)
+
+        # STEP 2: Burn cut gets bought off market:
+        burn_rook_bought = keeper_eth_bought * self.burn_bid * rook_per_eth
+        burn_usdc_sold = get_amount_in(amm_usdc, amm_rook, burn_rook_bought)
+        amm_rook = amm_rook - burn_rook_bought
+        amm_usdc = amm_usdc + burn_usdc_sold
+
+        # STEP 3: Staking cut gets bought off market:
+        stake_rook_bought = (keeper_eth_bought * self.stake_bid *
+                             self.stake_autocompound * rook_per_eth)
+        stake_usdc_sold = get_amount_in(amm_usdc, amm_rook, stake_rook_bought)
+        amm_rook = amm_rook - stake_rook_bought
+        amm_usdc = amm_usdc + stake_usdc_sold
+
+        # STEP 4: Treasury cut gets bought off market (if applicable):
+        treasury_cut_eth = keeper_eth_bought * self.treasury_bid
+        treasury_rook_bought = select(
+            treasury_buy, treasury_cut_eth * rook_per_eth, 0)
+        treasury_usdc_sold = select(
+            treasury_buy,
+            get_amount_in(amm_usdc, amm_rook, treasury_rook_bought), 0)
+        treasury_eth_earned = select(treasury_buy, 0, treasury_cut_eth)
+        amm_rook = amm_rook - treasury_rook_bought
+        amm_usdc = amm_usdc + treasury_usdc_sold
+
+        # STEP 5: Treasury sells ETH (if applicable):
+        treasury_eth_sold = select(
+            treasury_burn, divide(self.daily_treasury_burn, self.eth_price), 0)
+
+        # New ROOK price and supply balances
+        return (divide(amm_usdc, amm_rook),
+                staked + stake_rook_bought,
+                treasury_eth + treasury_eth_earned - treasury_eth_sold,
+                treasury_rook + treasury_rook_bought,
+                burned + burn_rook_bought)
+
+    def step(self, day: int, state: tuple, volume_usd) -> tuple:
+        return self.day(state, volume_usd, day < self.treasury_buy_days,
+                        day >= self.treasury_runway_days)
+
+    def stopped(self, state: tuple):
+        rook_price, staked, treasury_eth, treasury_rook, burned = state
+        return (rook_price <= 0) | (treasury_eth <= 0) | (treasury_rook <= 0)
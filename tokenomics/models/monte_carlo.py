@@ -0,0 +1,126 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from datetime import date
+
+from models.rook_bid_batch import BatchRookBidModel
+from models.volume import volume_paths
+from util.balances import RookSupply, SupplyProvider
+from util.params import *
+
+BAND_SERIES = ('rook_price', 'treasury_rook')
+
+
+class RookBidMonteCarlo:
+    """
+    RookBidModel over many random volume paths, e.g. with the 'gbm' or
+    'bootstrap' volume models. Takes RookBidModel's parameters, plus the
+    number of paths and the percentiles to report. Each day all paths take
+    one BatchRookBidModel step, then the day's percentiles of ROOK price and
+    treasury ROOK are computed across paths. Only the current day of every
+    path is kept, so memory is O(paths) during the run and O(days) for the
+    bands. A path that stops (ROOK price or treasury ROOK at zero) stays at
+    its last row in run_sim and counts towards the percentiles from then on.
+    """
+
+    def __init__(
+        self,
+        sim_length_days: int,
+        protocol_params: ProtocolParams,
+        bid_distribution_params: BidDistributionParams,
+        ecosystem_params: EcosystemParams,
+        dao_params: DAOParams,
+        volume_model: str,
+        volume_params: VolumeParams,
+        liquidity_model: str,
+        liquidity_constant: float,
+        initial_rook_price: float,
+        treasury_stables: float = 27000000,
+        rook_supply: RookSupply = None,
+        supply_provider: SupplyProvider = None,
+        paths: int = 1000,
+        seed: int = None,
+        percentiles: tuple = (5, 50, 95),
+    ):
+
+        self.sim_length_days = sim_length_days
+        self.volume_model = volume_model
+        self.volume_params = volume_params
+        self.paths = paths
+        self.seed = seed if seed is not None else volume_params.seed
+        self.percentiles = percentiles
+
+        self.batch = BatchRookBidModel(
+            sim_length_days=sim_length_days,
+            target_bid_percent=protocol_params.target_bid_percent,
+            mev_volume_ratio=ecosystem_params.mev_volume_ratio,
+            user_claim_percent=ecosystem_params.user_claim_percent,
+            partner_claim_percent=ecosystem_params.partner_claim_percent,
+            treasury_bid=bid_distribution_params.treasury,
+            partner_bid=bid_distribution_params.partner,
+            stake_bid=bid_distribution_params.stake,
+            burn_bid=bid_distribution_params.burn,
+            daily_treasury_burn=dao_params.daily_treasury_burn,
+            volume_timeseries=None,
+            liquidity_model=liquidity_model,
+            liquidity_constant=liquidity_constant,
+            initial_rook_price=np.full(paths, float(initial_rook_price)),
+            rook_supply=(rook_supply if rook_supply is not None
+                         else RookSupply(supply_provider)),
+            treasury_stables=treasury_stables,
+        )
+
+    def _band(self, volume, state: dict, alive) -> dict:
+        band = {'stopped': 1 - alive.mean()}
+        for name, value in zip(
+                ['daily_volume'] + list(BAND_SERIES),
+                [np.broadcast_to(volume, (self.paths,))] +
+                [state[name] for name in BAND_SERIES]):
+            for percentile, band_value in zip(
+                    self.percentiles,
+                    np.nanpercentile(value, self.percentiles)):
+                band['{}_p{:g}'.format(name, percentile)] = band_value
+        return band
+
+    def bands(self):
+        """
+        Yields each day's percentile bands as they are computed, as a dict of
+        '<series>_p<percentile>' values (daily_volume, rook_price and
+        treasury_rook) and the share of paths stopped. Like run_sim, the first
+        day is the initial state and each next day the state after a step.
+        Ends early once every path has stopped. With paths=1, the bands are
+        RookBidModel.run_sim's results for the same seed.
+        """
+        rng = np.random.default_rng(self.seed)
+        volumes, step_volumes = itertools.tee(volume_paths(
+            self.volume_model, self.volume_params, self.sim_length_days,
+            self.paths, rng))
+        volume = next(volumes, None)
+        if volume is None:
+            return
+        last = self.batch.initial_state()
+        yield self._band(volume, last, np.ones(self.paths, dtype=bool))
+
+        # the last day's step isn't part of the results, as in run_sim
+        steps = self.batch.iterate(
+            itertools.islice(step_volumes, self.sim_length_days - 1))
+        for volume, (day, state, alive) in zip(volumes, steps):
+            if not alive.any():
+                return
+            # stopped paths keep the last state run_sim would have recorded
+            last = {name: np.where(alive, state[name], last[name])
+                    for name in BAND_SERIES}
+            yield self._band(volume, last, alive)
+
+    def run(self) -> pd.DataFrame:
+        """
+        The percentile bands of every day, one row per day
+        """
+        rows = list(self.bands())
+        today = date.today()
+        dataframe = pd.DataFrame(rows)
+        dataframe.insert(0, 'date', pd.Series(
+            pd.date_range(today, periods=len(rows), freq="D")))
+        return dataframe
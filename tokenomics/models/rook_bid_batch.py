@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+from datetime import date
+
+from models.amm import RookBidKernel
+from util.balances import RookSupply
+
+RESULT_SERIES = ('rook_price', 'staked_rook', 'treasury_rook',
+                 'unclaimed_rook', 'burned_rook')
+
+
+class BatchRookBidModel:
+    """
+    RookBidModel for many scenarios at once. Every parameter is a scalar or an
+    array of shape (scenarios,), and each day is one step of NumPy arithmetic
+    over all scenarios. Both models run the same RookBidKernel, so a
+    scenario's results are identical to RookBidModel.run_sim with the same
+    inputs. A scenario stops when its ROOK price or treasury ROOK reaches
+    zero, like run_sim does.
+
+    volume_timeseries is the daily volume in $, of shape (days,) for a volume
+    curve shared by all scenarios or (days, scenarios). It can be None when
+    the volumes are passed to iterate instead, e.g. generated day by day.
+    """
+
+    def __init__(
+        self,
+        sim_length_days: int,
+        target_bid_percent,
+        mev_volume_ratio,
+        user_claim_percent,
+        partner_claim_percent,
+        treasury_bid,
+        partner_bid,
+        stake_bid,
+        burn_bid,
+        daily_treasury_burn,
+        volume_timeseries,
+        liquidity_model: str,
+        liquidity_constant,
+        initial_rook_price,
+        rook_supply: RookSupply,
+        treasury_stables=27000000,
+    ):
+
+        self.sim_length_days = sim_length_days
+        self.liquidity_model = liquidity_model
+        self.volume_timeseries = (
+            None if volume_timeseries is None
+            else np.asarray(volume_timeseries, dtype=float))
+        first_volume = (0 if self.volume_timeseries is None
+                        else self.volume_timeseries[0])
+
+        params = np.broadcast_arrays(*[
+            np.asarray(param, dtype=float) for param in (
+                target_bid_percent, mev_volume_ratio, user_claim_percent,
+                partner_claim_percent, treasury_bid, partner_bid, stake_bid,
+                burn_bid, daily_treasury_burn, liquidity_constant,
+                initial_rook_price, treasury_stables, first_volume)
+        ])
+        (self.target_bid_percent, self.mev_volume_ratio,
+         self.user_claim_percent, self.partner_claim_percent,
+         self.treasury_bid, self.partner_bid, self.stake_bid, self.burn_bid,
+         self.daily_treasury_burn, self.liquidity_constant,
+         self.initial_rook_price, self.treasury_stables) = [
+            np.atleast_1d(param) for param in params[:-1]]
+        self.scenarios = len(self.target_bid_percent)
+
+        self.rook_supply = rook_supply
+        self.kernel = RookBidKernel(
+            target_bid_percent=self.target_bid_percent,
+            mev_volume_ratio=self.mev_volume_ratio,
+            user_claim_percent=self.user_claim_percent,
+            partner_claim_percent=self.partner_claim_percent,
+            treasury_bid=self.treasury_bid,
+            partner_bid=self.partner_bid,
+            stake_bid=self.stake_bid,
+            burn_bid=self.burn_bid,
+            daily_treasury_burn=self.daily_treasury_burn,
+            treasury_stables=self.treasury_stables,
+            liquidity_model=liquidity_model,
+            liquidity_constant=self.liquidity_constant,
+            total_supply=rook_supply.total_supply,
+            strategic_reserves=rook_supply.strategic_reserves,
+        )
+
+    @classmethod
+    def from_models(cls, models: list):
+        """
+        Batches RookBidModels sharing a simulation length and liquidity model
+        """
+        first = models[0]
+        assert all(
+            model.sim_length_days == first.sim_length_days and
+            model.liquidity_model == first.liquidity_model
+            for model in models)
+
+        def param(get):
+            return np.array([get(model) for model in models], dtype=float)
+
+        return cls(
+            sim_length_days=first.sim_length_days,
+            target_bid_percent=param(
+                lambda m: m.protocol_params.target_bid_percent),
+            mev_volume_ratio=param(
+                lambda m: m.ecosystem_params.mev_volume_ratio),
+            user_claim_percent=param(
+                lambda m: m.ecosystem_params.user_claim_percent),
+            partner_claim_percent=param(
+                lambda m: m.ecosystem_params.partner_claim_percent),
+            treasury_bid=param(lambda m: m.bid_distribution_params.treasury),
+            partner_bid=param(lambda m: m.bid_distribution_params.partner),
+            stake_bid=param(lambda m: m.bid_distribution_params.stake),
+            burn_bid=param(lambda m: m.bid_distribution_params.burn),
+            daily_treasury_burn=param(
+                lambda m: m.dao_params.daily_treasury_burn),
+            volume_timeseries=np.stack(
+                [model.volume_timeseries for model in models], axis=1),
+            liquidity_model=first.liquidity_model,
+            liquidity_constant=param(lambda m: m.liquidity_constant),
+            initial_rook_price=param(lambda m: m.rook_price),
+            rook_supply=first.rook_supply,
+            treasury_stables=param(lambda m: m.treasury_stables),
+        )
+
+    def initial_state(self):
+        supply = self.rook_supply
+        shape = (self.scenarios,)
+        return {
+            'rook_price': self.initial_rook_price.copy(),
+            'staked_rook': np.full(shape, float(supply.staked)),
+            'treasury_rook': np.full(shape, float(supply.treasury)),
+            'unclaimed_rook': np.full(shape, float(supply.unclaimed)),
+            'burned_rook': np.full(shape, float(supply.burned)),
+        }
+
+    def iterate(self, volumes):
+        """
+        Advances every scenario one day per item of volumes, each a scalar or
+        a (scenarios,) array of the day's volume in $. Yields (day, state,
+        alive) after each day, where state holds the RESULT_SERIES arrays
+        and alive marks the scenarios still running; stopped scenarios keep
+        the state of the day they stopped on. Ends early once every scenario
+        has stopped.
+        """
+        initial = self.initial_state()
+        for day, state, alive in self.kernel.run(
+                tuple(initial[name] for name in RESULT_SERIES), volumes):
+            yield day, dict(zip(RESULT_SERIES, state)), alive
+
+    def run_sim(self, record=RESULT_SERIES):
+        """
+        Runs every scenario, returning a dict with:
+            'days': rows of each scenario's results, (scenarios,), as in the
+                run_sim dataframe: the initial state, then the state after
+                each day up to the one it stopped on
+            'final_<series>': each series' value after the last step taken
+            '<series>' for the series in record: (days, scenarios) arrays,
+                NaN after a scenario's last row. Pass fewer series (or none)
+                to keep memory down for large sweeps.
+        """
+        days = self.sim_length_days
+        state = self.initial_state()
+        series = {name: np.full((days, self.scenarios), np.nan)
+                  for name in record}
+        for name in record:
+            series[name][0] = state[name]
+
+        last_day = np.full((self.scenarios,), days - 1)
+        running = np.ones((self.scenarios,), dtype=bool)
+        for day, state, alive in self.iterate(self.volume_timeseries[:days]):
+            last_day[running & ~alive] = day
+            running = alive
+
+            if day < days - 1:
+                for name in record:
+                    series[name][day + 1] = np.where(
+                        alive, state[name], np.nan)
+
+        result = {'days': last_day + 1}
+        result.update({'final_' + name: value
+                       for name, value in state.items()})
+        result.update(series)
+        return result
+
+    def scenario_dataframe(self, result: dict, scenario: int):
+        """
+        One scenario's results as the dataframe RookBidModel.run_sim returns
+        """
+        rows = result['days'][scenario]
+        volume = self.volume_timeseries
+        volume = volume[:, scenario] if volume.ndim == 2 else volume
+
+        today = date.today()
+        return pd.DataFrame(
+            {
+                'date': pd.Series(pd.date_range(today, periods=rows, freq="D")),
+                'daily_volume': volume[:rows],
+                'rook_price': result['rook_price'][:rows, scenario],
+                'treasury_rook': result['treasury_rook'][:rows, scenario],
+                'staked_rook': result['staked_rook'][:rows, scenario],
+                'unclaimed_rook': result['unclaimed_rook'][:rows, scenario],
+                'burned_rook': result['burned_rook'][:rows, scenario]
+            }
+        )
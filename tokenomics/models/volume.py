@@ -0,0 +1,86 @@
+import sqlite3
+
+import numpy as np
+
+from util.params import VolumeParams
+
+STOCHASTIC_VOLUME_MODELS = ('gbm', 'bootstrap')
+
+
+def volume_curve(volume_model: str, volume_params: VolumeParams,
+                 sim_length_days: int) -> np.ndarray:
+    """
+    Daily volume in $ of a deterministic volume model: 'constant', 'linear'
+    or 'logistic' (the default)
+    """
+    if volume_model == 'constant':
+        return np.full(sim_length_days, volume_params.start_volume)
+    elif volume_model == 'linear':
+        x = np.arange(sim_length_days)
+        m = (volume_params.max_volume -
+             volume_params.start_volume) / sim_length_days
+        return m * x + volume_params.start_volume
+    else:  # logistic
+        p0 = volume_params.start_volume
+        k = volume_params.max_volume
+        r = volume_params.volume_growth_rate
+        exp = np.exp(r * np.arange(0, sim_length_days))
+        return (k*exp*p0)/(k+(exp-1)*p0)
+
+
+def daily_log_returns(volumes) -> np.ndarray:
+    """
+    Log returns between consecutive days of a daily volume history, skipping
+    days without volume
+    """
+    volumes = np.asarray(volumes, dtype=float)
+    return np.diff(np.log(volumes[volumes > 0]))
+
+
+def history_from_rollups(path: str = 'rollups.sqlite') -> np.ndarray:
+    """
+    Daily volume in $ from the rollup_volume table of the volume-analysis
+    rollups (ROLLUP_DB), oldest day first
+    """
+    with sqlite3.connect(path) as db:
+        rows = db.execute(
+            'SELECT "volumeUSD" FROM rollup_volume ORDER BY day').fetchall()
+    return np.array([row[0] for row in rows], dtype=float)
+
+
+def volume_paths(volume_model: str, volume_params: VolumeParams,
+                 sim_length_days: int, paths: int = 1, rng=None):
+    """
+    Yields the daily volume in $ of each day, as a (paths,) array of
+    independent paths for the stochastic models and a scalar shared by every
+    path for the deterministic ones. Paths start at start_volume and move by
+    a daily log return each day:
+        'gbm': geometric Brownian motion, normal log returns with drift
+            volume_growth_rate and standard deviation volatility
+        'bootstrap': log returns drawn with replacement from the history
+    Only the current day is kept, so memory doesn't grow with the length of
+    the simulation.
+    """
+    if volume_model not in STOCHASTIC_VOLUME_MODELS:
+        yield from volume_curve(volume_model, volume_params, sim_length_days)
+        return
+
+    if rng is None:
+        rng = np.random.default_rng(volume_params.seed)
+    if volume_model == 'bootstrap':
+        returns = daily_log_returns(volume_params.history)
+        if not len(returns):
+            raise ValueError('bootstrap needs at least two days of history')
+    else:
+        sigma = volume_params.volatility
+        drift = volume_params.volume_growth_rate - sigma ** 2 / 2
+
+    volume = np.full(paths, float(volume_params.start_volume))
+    for day in range(sim_length_days):
+        if day > 0:
+            if volume_model == 'bootstrap':
+                step = rng.choice(returns, paths)
+            else:
+                step = drift + sigma * rng.standard_normal(paths)
+            volume = volume * np.exp(step)
+        yield volume
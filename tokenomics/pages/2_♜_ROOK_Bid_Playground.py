@@ -7,6 +7,7 @@ from datetime import date
 
 from models.rook_bid import RookBidModel
 from util.params import *
+from util.sim_cache import SIMULATION_CACHE, canonical_key
 
 st.set_page_config(layout="wide")
 
@@ -151,7 +152,7 @@ ecosystem_params = EcosystemParams(
 dao_params = DAOParams(treasury_burn_rate)
 volume_params = VolumeParams(start_volume, volume_growth_rate, max_volume)
 
-model = RookBidModel(
+model_params = dict(
     sim_length_days=sim_length,
     protocol_params=protocol_params,
     bid_distribution_params=bid_params,
@@ -165,7 +166,10 @@ model = RookBidModel(
     treasury_stables=27000000
 )
 
-df = model.run_sim()
+# Only configurations not seen before build the model and its RookSupply
+df = SIMULATION_CACHE.get_or_run(
+    canonical_key(RookBidModel.__name__, **model_params),
+    lambda: RookBidModel(**model_params).run_sim())
 
 fig = make_subplots(3, 1)
 
@@ -1,49 +1,189 @@
-import os
-from unicodedata import decimal
-import requests
+import argparse
 import json
+import os
+import time
+from threading import Lock
+
 from dotenv import load_dotenv
 
 from web3 import Web3
 
 from util.addresses import addresses
-from util.contracts import fetch_abi
 
 load_dotenv()
 INFURA_KEY = os.getenv("INFURA_KEY")
+# Path of a supply snapshot to use instead of the chain, e.g. offline
+ROOK_SUPPLY_SNAPSHOT = os.getenv("ROOK_SUPPLY_SNAPSHOT")
 
+# Multicall3, deployed at the same address on mainnet and most other chains
+MULTICALL_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL_ABI = [{
+    "inputs": [{"components": [{"name": "target", "type": "address"},
+                               {"name": "callData", "type": "bytes"}],
+                "name": "calls", "type": "tuple[]"}],
+    "name": "aggregate",
+    "outputs": [{"name": "blockNumber", "type": "uint256"},
+                {"name": "returnData", "type": "bytes[]"}],
+    "stateMutability": "payable",
+    "type": "function",
+}]
+# The ERC20 functions read from the ROOK contract
+ERC20_ABI = [
+    {"inputs": [], "name": "decimals", "outputs": [{"name": "", "type": "uint8"}],
+     "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "totalSupply", "outputs": [{"name": "", "type": "uint256"}],
+     "stateMutability": "view", "type": "function"},
+    {"inputs": [{"name": "account", "type": "address"}], "name": "balanceOf",
+     "outputs": [{"name": "", "type": "uint256"}],
+     "stateMutability": "view", "type": "function"},
+]
+
+SUPPLY_BALANCES = ('total_supply', 'treasury', 'strategic_reserves', 'staked')
+
+
+class SupplyProvider:
+    """
+    Source of the initial ROOK supply balances of the models. balances()
+    returns a dict of SUPPLY_BALANCES in ROOK, plus the block they were read
+    at (None if unknown).
+    """
+
+    def balances(self) -> dict:
+        raise NotImplementedError
 
-class RookSupply:
 
-    def __init__(self):
-        print('Initializing web3')
-        self.web3 = Web3(Web3.HTTPProvider(
-            "https://mainnet.infura.io/v3/{}".format(INFURA_KEY)))
+class OnChainSupplyProvider(SupplyProvider):
+    """
+    Reads the balances from the ROOK contract in a single multicall, and
+    keeps them for ttl seconds. With a block, reads the balances at that
+    block once and keeps them for good. Safe to share between threads, e.g.
+    Streamlit sessions.
+    """
 
-        print('Fetching ROOK ABI')
-        rook_address = addresses.rook
-        rook_abi = fetch_abi(rook_address)
+    def __init__(self, ttl: float = 60 * 60, block: int = None,
+                 rpc_url: str = None):
+        self.ttl = ttl
+        self.block = block
+        self.rpc_url = rpc_url or "https://mainnet.infura.io/v3/{}".format(
+            INFURA_KEY)
+        self.web3 = None
+        self.lock = Lock()
+        self.cached = None
+        self.fetched = None
+
+    def _calls(self, rook_contract):
+        return [
+            rook_contract.encodeABI(fn_name='decimals'),
+            rook_contract.encodeABI(fn_name='totalSupply'),
+            rook_contract.encodeABI(fn_name='balanceOf',
+                                    args=[addresses.treasury]),
+            rook_contract.encodeABI(fn_name='balanceOf',
+                                    args=[addresses.strategic_reserves]),
+            rook_contract.encodeABI(fn_name='balanceOf',
+                                    args=[addresses.liquidity_pool_v4]),
+        ]
+
+    def fetch(self) -> dict:
+        if self.web3 is None:
+            print('Initializing web3')
+            self.web3 = Web3(Web3.HTTPProvider(self.rpc_url))
         rook_contract = self.web3.eth.contract(
-            address=rook_address, abi=rook_abi)
-        decimals = 10 ** rook_contract.functions.decimals().call()
+            address=addresses.rook, abi=ERC20_ABI)
+        multicall = self.web3.eth.contract(
+            address=MULTICALL_ADDRESS, abi=MULTICALL_ABI)
 
-        # Fetch ROOK balances
         print('Fetching ROOK supply balances')
-        total_supply = rook_contract.functions.totalSupply().call()
-        treasury = rook_contract.functions.balanceOf(
-            addresses.treasury).call()
-        strategic_reserves = rook_contract.functions.balanceOf(
-            addresses.strategic_reserves).call()
-        staked = rook_contract.functions.balanceOf(
-            addresses.liquidity_pool_v4).call()
+        block, results = multicall.functions.aggregate(
+            [(addresses.rook, call) for call in self._calls(rook_contract)]
+        ).call(block_identifier=self.block if self.block is not None
+               else 'latest')
+        decimals, *amounts = [
+            self.web3.codec.decode_abi(['uint256'], result)[0]
+            for result in results]
+
+        balances = {name: amount / 10 ** decimals
+                    for name, amount in zip(SUPPLY_BALANCES, amounts)}
+        balances['block'] = block
+        return balances
+
+    def balances(self) -> dict:
+        with self.lock:
+            expired = (self.cached is None or (
+                self.block is None and
+                time.time() - self.fetched >= self.ttl))
+            if expired:
+                self.cached = self.fetch()
+                self.fetched = time.time()
+            return dict(self.cached)
+
+
+class SnapshotSupplyProvider(SupplyProvider):
+    """
+    Balances from a JSON snapshot file, as written by write_snapshot, for
+    offline use and reproducible runs
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path) as snapshot:
+            self.snapshot = json.load(snapshot)
+
+    def balances(self) -> dict:
+        balances = {name: float(self.snapshot[name])
+                    for name in SUPPLY_BALANCES}
+        balances['block'] = self.snapshot.get('block')
+        return balances
+
+
+def write_snapshot(path: str, provider: SupplyProvider):
+    with open(path, 'w') as snapshot:
+        json.dump(provider.balances(), snapshot, indent=2)
+
+
+_default_provider = None
+_default_provider_lock = Lock()
+
+
+def default_supply_provider() -> SupplyProvider:
+    """
+    The provider RookSupply uses when it isn't given one, shared by the whole
+    process: the ROOK_SUPPLY_SNAPSHOT file if set, the chain otherwise
+    """
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = (
+                SnapshotSupplyProvider(ROOK_SUPPLY_SNAPSHOT)
+                if ROOK_SUPPLY_SNAPSHOT else OnChainSupplyProvider())
+        return _default_provider
+
+
+class RookSupply:
+
+    def __init__(self, provider: SupplyProvider = None):
+        if provider is None:
+            provider = default_supply_provider()
+        balances = provider.balances()
 
         # Set initial ROOK balances
-        self.total_supply = total_supply / decimals
-        self.treasury = treasury / decimals
-        self.strategic_reserves = strategic_reserves / decimals
-        self.staked = staked / decimals
+        self.block = balances['block']
+        self.total_supply = balances['total_supply']
+        self.treasury = balances['treasury']
+        self.strategic_reserves = balances['strategic_reserves']
+        self.staked = balances['staked']
         self.burned = 0
         self.unclaimed = 0
 
     def get_circulating_supply(self):
         return self.total_supply - self.treasury - self.strategic_reserves - self.burned - self.unclaimed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Write the on-chain ROOK supply balances to a snapshot '
+                    'file for SnapshotSupplyProvider / ROOK_SUPPLY_SNAPSHOT')
+    parser.add_argument('path')
+    parser.add_argument('--block', type=int, default=None)
+    args = parser.parse_args()
+
+    write_snapshot(args.path, OnChainSupplyProvider(block=args.block))
@@ -26,7 +26,13 @@ class DAOParams:
 
 
 class VolumeParams:
-    def __init__(self, start_volume: float, volume_growth_rate: float, max_volume: float):
+    def __init__(self, start_volume: float, volume_growth_rate: float, max_volume: float,
+                 volatility: float = 0, history=None, seed: int = None):
         self.start_volume = start_volume
         self.volume_growth_rate = volume_growth_rate
         self.max_volume = max_volume
+        # stochastic volume models only: daily volatility (gbm), daily volumes
+        # to resample (bootstrap) and the random generator's seed
+        self.volatility = volatility
+        self.history = history
+        self.seed = seed
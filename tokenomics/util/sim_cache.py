@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+SIM_CACHE_FILE = os.getenv("SIM_CACHE_FILE")
+
+
+def _canonical(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        # 25 and 25.0 (e.g. from st.number_input) are the same parameter
+        return repr(float(value))
+    if isinstance(value, np.ndarray):
+        return [_canonical(item) for item in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    # parameter objects, e.g. ProtocolParams or VolumeParams
+    return {'type': type(value).__name__,
+            'fields': _canonical(vars(value))}
+
+
+def canonical_key(*args, **kwargs) -> str:
+    """
+    sha256 of the parameters of a simulation: numbers, strings, arrays and
+    parameter objects (by class name and attributes, nested ones included).
+    Equal parameters give the same key in any process.
+    """
+    canonical = json.dumps(_canonical([args, kwargs]), sort_keys=True,
+                           separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SimulationCache:
+    """
+    Simulation results by canonical_key, shared by every caller in the
+    process (e.g. all Streamlit sessions). Keeps the max_entries most
+    recently used results in memory, and, with a path, the max_disk_entries
+    most recently used in a sqlite file that outlives the process and can be
+    shared between processes. Results older than max_age seconds (if set)
+    are run again, since they depend on the on-chain ROOK supply at the time.
+    """
+
+    def __init__(self, max_entries: int = 64, path: str = None,
+                 max_disk_entries: int = 1024, max_age: float = None):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.running = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                '''
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    result BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    used REAL NOT NULL
+                )
+                '''
+            )
+            self.db.commit()
+
+    def _fresh(self, created: float) -> bool:
+        return self.max_age is None or time.time() - created < self.max_age
+
+    def _remember(self, key: str, result, created: float):
+        self.entries[key] = (result, created)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key: str):
+        """
+        The cached result for key, or None
+        """
+        with self.lock:
+            if key in self.entries:
+                result, created = self.entries[key]
+                if self._fresh(created):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.entries[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    'SELECT result, created FROM results WHERE key = ?',
+                    (key,)).fetchone()
+                if row is not None and self._fresh(row[1]):
+                    self.db.execute(
+                        'UPDATE results SET used = ? WHERE key = ?',
+                        (time.time(), key))
+                    self.db.commit()
+                    result = pickle.loads(row[0])
+                    self._remember(key, result, row[1])
+                    self.disk_hits += 1
+                    return result
+        return None
+
+    def put(self, key: str, result):
+        now = time.time()
+        with self.lock:
+            self._remember(key, result, now)
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                    (key, pickle.dumps(result), now, now))
+                self.db.execute(
+                    'DELETE FROM results WHERE key NOT IN '
+                    '(SELECT key FROM results ORDER BY used DESC LIMIT ?)',
+                    (self.max_disk_entries,))
+                self.db.commit()
+
+    def get_or_run(self, key: str, run):
+        """
+        The cached result for key, or run() stored under it. Callers asking
+        for the same key while it runs wait for that run instead of starting
+        another one.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        with self.lock:
+            key_lock = self.running.setdefault(key, Lock())
+        with key_lock:
+            result = self.get(key)
+            if result is None:
+                self.misses += 1
+                result = run()
+                self.put(key, result)
+        with self.lock:
+            self.running.pop(key, None)
+        return result
+
+
+# The cache the Streamlit pages share, on disk too when SIM_CACHE_FILE is set
+SIMULATION_CACHE = SimulationCache(path=SIM_CACHE_FILE, max_age=24 * 60 * 60)
@@ -0,0 +1,82 @@
+from time import time
+import argparse
+import math
+import os
+import sys
+import tempfile
+
+import requests
+from sqlalchemy import create_engine
+
+from bid_fetcher import BidFetcher, bid_amounts_from_db
+from mockAuctions import MockAuctionsApi, auctions_from_db
+
+sys.path.append("../volume-analysis")
+import syntheticDb
+from database import Database
+
+
+# The notebook's get_bid_amounts: one request per 30 order hashes, one after another
+def get_bid_amounts(order_hashes, endpoint):
+    bids = {order_hash: 0 for order_hash in order_hashes}
+
+    for i in range(math.ceil(len(order_hashes) / 30)):
+        request_params = {"orderHashes": order_hashes[i * 30 : (i + 1) * 30]}
+        response = requests.get(endpoint, request_params).json()
+
+        for auction in response:
+            winning_bids = [
+                bid["rook_etherUnits"]
+                for bid in auction["bidList"]
+                if bid["outcome"] and bid["outcome"]["outcomeValue"] > 0
+            ]
+            if not len(winning_bids):
+                continue
+            bids[auction["orderHash"]] = winning_bids[0]
+    return bids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the notebook's bid lookups against bid_fetcher.py")
+    parser.add_argument("--fills", type=int, default=20000)
+    parser.add_argument("--orders", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--failureRate", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = "sqlite:///" + os.path.join(directory, "synthetic.sqlite")
+        syntheticDb.seed(create_engine(url), fills=args.fills)
+        database = Database(url)
+        auctions = auctions_from_db(database)
+        order_hashes = list(database.read('SELECT "orderHash" FROM orderfill')["orderHash"][: args.orders])
+        print("{} orders, {} with an auction".format(len(order_hashes), sum(h in auctions for h in order_hashes)))
+
+        with MockAuctionsApi(auctions, latency=args.latency) as api:
+            start = time()
+            sequential = get_bid_amounts(order_hashes, api.url)
+            print("sequential:  {:.2f}s, {} requests".format(time() - start, api.request_count))
+
+            api.failure_rate, api.request_count = args.failureRate, 0
+            fetcher = BidFetcher(api.url, path=os.path.join(directory, "bids.sqlite"), concurrency=args.concurrency)
+            start = time()
+            concurrent = fetcher.bid_amounts(order_hashes)
+            print(
+                "concurrent:  {:.2f}s, {} requests ({:.0%} failing), same results: {}".format(
+                    time() - start, api.request_count, args.failureRate, concurrent == sequential
+                )
+            )
+
+            api.request_count = 0
+            start = time()
+            cached = fetcher.bid_amounts(order_hashes)
+            print(
+                "cached:      {:.2f}s, {} requests, same results: {}".format(
+                    time() - start, api.request_count, cached == sequential
+                )
+            )
+
+        start = time()
+        local = bid_amounts_from_db(database, order_hashes)
+        print("bid tables:  {:.2f}s, same results: {}".format(time() - start, local == sequential))
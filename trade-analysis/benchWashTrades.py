@@ -0,0 +1,97 @@
+from collections import defaultdict
+from time import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from wash_detector import WashTradeDetector, wash_trades
+
+
+# Random fills in transactions of 1-4 fills, where some later fills in a transaction swap
+# the tokens of an earlier one, made by a mix of market maker and unknown addresses
+def synthetic_fills(fills, market_makers=10, addresses=40, tokens=8, seed=0):
+    rng = np.random.default_rng(seed)
+    per_tx = rng.choice([1, 1, 1, 2, 2, 3, 4], fills)
+    tx = np.repeat(np.arange(len(per_tx)), per_tx)[:fills]
+
+    maker_token = rng.integers(0, tokens, fills)
+    taker_token = (maker_token + rng.integers(1, tokens, fills)) % tokens
+    # a fill swapping the tokens of the fill before it in the same transaction
+    swap = (np.r_[False, tx[1:] == tx[:-1]]) & (rng.random(fills) < 0.5)
+    maker_token[swap], taker_token[swap] = taker_token[np.flatnonzero(swap) - 1], maker_token[np.flatnonzero(swap) - 1]
+
+    names = ["mm%d" % i for i in range(market_makers)]
+    all_addresses = ["0x%040x" % i for i in range(addresses)]
+    mms = {name: {"addresses": all_addresses[i :: 2 * market_makers] } for i, name in enumerate(names)}
+    frame = pd.DataFrame(
+        {
+            "txHash": np.char.mod("0x%064x", tx),
+            "orderHash": np.char.mod("0x%064x", np.arange(fills)),
+            "makerToken": np.char.mod("0x%040x", maker_token),
+            "takerToken": np.char.mod("0x%040x", taker_token),
+            "maker": np.array(all_addresses)[rng.integers(0, addresses, fills)],
+            "timestamp": 1650000000 + tx * 12,
+        }
+    )
+    return frame, mms
+
+
+# The notebook's get_wash_trades: fills grouped into a dict of lists, then every pair
+# in each transaction compared in Python
+def get_wash_trades(order_fills, get_maker_name):
+    txHash_matched_orderFills = defaultdict(list)
+    for order_fill in order_fills:
+        txHash_matched_orderFills[order_fill["txHash"]].append(order_fill)
+
+    potential_wash_trades = {
+        txHash: orderFills for txHash, orderFills in txHash_matched_orderFills.items() if len(orderFills) > 1
+    }
+
+    wash_trades = []
+    for txHash, orderFills in potential_wash_trades.items():
+        for i in range(len(orderFills) - 1):
+            maker1Name = get_maker_name(orderFills[i]["maker"])
+            for j in range(i + 1, len(orderFills)):
+                maker2Name = get_maker_name(orderFills[j]["maker"])
+                makerTokenConstraint = orderFills[i]["makerToken"] == orderFills[j]["takerToken"]
+                takerTokenConstraint = orderFills[i]["takerToken"] == orderFills[j]["makerToken"]
+                makerConstraint = (maker1Name is not None) and (maker2Name is not None) and (maker1Name == maker2Name)
+                if makerTokenConstraint and takerTokenConstraint and makerConstraint:
+                    wash_trades.append(
+                        (
+                            orderFills[i]["txHash"],
+                            orderFills[i]["orderHash"],
+                            orderFills[j]["orderHash"],
+                            orderFills[i]["maker"],
+                            orderFills[i]["timestamp"],
+                        )
+                    )
+    return wash_trades
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the notebook's wash trade loop against wash_detector.py")
+    parser.add_argument("--fills", type=int, default=2000000)
+    parser.add_argument("--batch", type=int, default=50000)
+    args = parser.parse_args()
+
+    fills, mms = synthetic_fills(args.fills)
+    reverse_mms = {address: name for name, mm in mms.items() for address in mm["addresses"]}
+    print("{} fills".format(len(fills)))
+
+    records = fills.to_dict("records")
+    start = time()
+    loop = get_wash_trades(records, lambda address: reverse_mms.get(address, None))
+    print("pairwise loop:       {:.2f}s, {} wash trades".format(time() - start, len(loop)))
+
+    start = time()
+    vectorized = wash_trades(fills, mms)
+    print("self-join:           {:.2f}s, same results: {}".format(time() - start, vectorized == loop))
+
+    start = time()
+    detector = WashTradeDetector(mms)
+    incremental = []
+    for batch in range(0, len(fills), args.batch):
+        incremental += detector.update(fills.iloc[batch : batch + args.batch])
+    print("{} fill batches:  {:.2f}s, same results: {}".format(args.batch, time() - start, incremental == loop))
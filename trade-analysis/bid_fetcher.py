@@ -0,0 +1,175 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, local
+from time import sleep, time
+
+import pandas as pd
+import requests
+
+AUCTIONS_ENDPOINT = "https://api.rook.fi/api/v1/coordinator/auctions"
+BID_CACHE_FILE = "auctionBids.sqlite"
+
+# Most order hashes the auctions endpoint takes per request
+PAGE_SIZE = 30
+
+
+# Winning bids (rook_etherUnits) of an auction from the auctions endpoint, None while no
+# bid has an outcome yet, i.e. the auction isn't settled
+def winning_bids(auction):
+    if not any(bid["outcome"] for bid in auction["bidList"]):
+        return None
+    return [
+        bid["rook_etherUnits"]
+        for bid in auction["bidList"]
+        if bid["outcome"] and bid["outcome"]["outcomeValue"] > 0
+    ]
+
+
+# Winning bids by order hash from the coordinator's auctions endpoint. Order hashes are
+# requested page_size at a time over up to concurrency keep-alive sessions, retrying
+# dropped connections, 429s and 5xxs with exponential backoff. Settled auctions never
+# change, so their bids are kept in a sqlite cache and never requested again. Orders the
+# endpoint has no auction for are cached as such for missing_max_age seconds, and orders
+# whose auction isn't settled yet are asked for again on the next call. Orders with more
+# than one winning bid get the first, and are listed in multiple_winning_bids.
+class BidFetcher:
+    def __init__(
+        self,
+        endpoint=AUCTIONS_ENDPOINT,
+        path=BID_CACHE_FILE,
+        page_size=PAGE_SIZE,
+        concurrency=8,
+        retries=5,
+        backoff=0.5,
+        timeout=30,
+        missing_max_age=24 * 60 * 60,
+    ):
+        self.endpoint = endpoint
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.missing_max_age = missing_max_age
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bids (
+                orderHash TEXT PRIMARY KEY,
+                rook_etherUnits REAL,
+                fetched REAL NOT NULL
+            )
+            """
+        )
+        self.db.commit()
+        # Guards the connection and request_count, which the worker threads share
+        self.db_lock = Lock()
+
+        self.sessions = local()
+        self.request_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.multiple_winning_bids = []
+
+    def _session(self):
+        if not hasattr(self.sessions, "session"):
+            self.sessions.session = requests.Session()
+        return self.sessions.session
+
+    def _get(self, order_hashes):
+        for attempt in range(self.retries + 1):
+            try:
+                r = self._session().get(
+                    self.endpoint, params={"orderHashes": order_hashes}, timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                sleep(self.backoff * 2**attempt)
+                continue
+
+            if r.status_code == 429 or r.status_code >= 500:
+                if attempt == self.retries:
+                    r.raise_for_status()
+                sleep(self.backoff * 2**attempt)
+                continue
+
+            r.raise_for_status()
+            with self.db_lock:
+                self.request_count += 1
+            return r.json()
+
+    # {order hash: winning bid} for one page of order hashes, None for the orders without
+    # an auction; orders whose auction isn't settled are left out
+    def _fetch_page(self, order_hashes):
+        bids = dict.fromkeys(order_hashes)
+        for auction in self._get(order_hashes):
+            bids_won = winning_bids(auction)
+            if bids_won is None:
+                del bids[auction["orderHash"]]
+                continue
+            if len(bids_won) > 1:
+                self.multiple_winning_bids.append(auction["orderHash"])
+            bids[auction["orderHash"]] = bids_won[0] if bids_won else 0
+        return bids
+
+    def _cached(self, order_hashes):
+        found = {}
+        with self.db_lock:
+            for i in range(0, len(order_hashes), 500):
+                page = order_hashes[i : i + 500]
+                found.update(
+                    self.db.execute(
+                        "SELECT orderHash, rook_etherUnits FROM bids WHERE orderHash IN ({}) \
+                        AND (rook_etherUnits IS NOT NULL OR fetched >= ?)".format(", ".join("?" * len(page))),
+                        page + [time() - self.missing_max_age],
+                    ).fetchall()
+                )
+        return found
+
+    def _store(self, bids):
+        with self.db_lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO bids VALUES (?, ?, ?)",
+                [(order_hash, bid, time()) for order_hash, bid in bids.items()],
+            )
+            self.db.commit()
+
+    # {order hash: winning bid rook_etherUnits}, 0 for orders without one
+    def bid_amounts(self, order_hashes):
+        order_hashes = list(dict.fromkeys(order_hashes))
+        bids = self._cached(order_hashes)
+        missing = [order_hash for order_hash in order_hashes if order_hash not in bids]
+        self.hits += len(order_hashes) - len(missing)
+        self.misses += len(missing)
+
+        pages = [missing[i : i + self.page_size] for i in range(0, len(missing), self.page_size)]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for fetched in pool.map(self._fetch_page, pages):
+                self._store(fetched)
+                bids.update(fetched)
+
+        return {order_hash: bids.get(order_hash) or 0 for order_hash in order_hashes}
+
+
+# The same {order hash: winning bid rook_etherUnits} from the bid/bidoutcome tables of a
+# Database: the bids whose outcome paid out for the order's transaction, the first by
+# bidId when there are several. Like db.py's join, a bid covering a batch of orders is
+# reported for each order in the batch.
+def bid_amounts_from_db(database, order_hashes, page_size=1000):
+    order_hashes = list(dict.fromkeys(order_hashes))
+    frames = [
+        database.read(
+            'SELECT orderfill."orderHash", bid."bidId", bid."rook_etherUnits" FROM orderfill \
+            JOIN bidoutcome ON bidoutcome."txHash" = orderfill."txHash" \
+            JOIN bid ON bid."bidId" = bidoutcome."bidId" \
+            WHERE orderfill."orderHash" IN :order_hashes AND bidoutcome."outcomeValue" > 0',
+            {"order_hashes": order_hashes[i : i + page_size]},
+        )
+        for i in range(0, len(order_hashes), page_size)
+    ]
+    bids = pd.concat(frames) if frames else pd.DataFrame(columns=["orderHash", "bidId", "rook_etherUnits"])
+    bids = bids.sort_values("bidId").drop_duplicates("orderHash")
+    found = dict(zip(bids["orderHash"], bids["rook_etherUnits"]))
+    return {order_hash: found.get(order_hash, 0) for order_hash in order_hashes}
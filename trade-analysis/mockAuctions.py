@@ -0,0 +1,90 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread, Lock
+from urllib.parse import urlparse, parse_qs
+from time import sleep
+import json
+import random
+
+from bid_fetcher import PAGE_SIZE
+
+
+# Auctions by order hash in the shape of the coordinator's auctions endpoint, built from
+# the orderfill/bidoutcome/bid tables of a Database (e.g. one seeded by syntheticDb.py):
+# each order's auction lists the bids on its transaction, by bidId
+def auctions_from_db(database):
+    rows = database.read(
+        'SELECT orderfill."orderHash", bid."bidId", bid."rook_etherUnits", bidoutcome."outcomeValue" \
+        FROM orderfill JOIN bidoutcome ON bidoutcome."txHash" = orderfill."txHash" \
+        JOIN bid ON bid."bidId" = bidoutcome."bidId" ORDER BY bid."bidId"'
+    )
+    auctions = {}
+    for order_hash, bid_id, rook_ether_units, outcome_value in rows.itertuples(index=False):
+        auction = auctions.setdefault(order_hash, {"orderHash": order_hash, "bidList": []})
+        auction["bidList"].append(
+            {"bidId": int(bid_id), "rook_etherUnits": rook_ether_units, "outcome": {"outcomeValue": outcome_value}}
+        )
+    return auctions
+
+
+# Local HTTP stand-in for GET coordinator/auctions?orderHashes=...: answers with the
+# known auctions among at most page_size order hashes, after latency seconds, and
+# fails a share of requests with a 503 to exercise retries
+class MockAuctionsApi:
+    def __init__(self, auctions, latency=0.0, failure_rate=0.0, page_size=PAGE_SIZE, port=0, seed=0):
+        self.auctions = auctions
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.lock = Lock()
+        self.request_count = 0
+        self.order_hash_count = 0
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = api.handle(self.path)
+                response = json.dumps(body).encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/api/v1/coordinator/auctions".format(self.server.server_address[1])
+
+    def __enter__(self):
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, path):
+        if self.latency:
+            sleep(self.latency)
+
+        with self.lock:
+            self.request_count += 1
+            failed = self.failure_rate and self.rng.random() < self.failure_rate
+        if failed:
+            return 503, {"error": "service unavailable"}
+
+        order_hashes = parse_qs(urlparse(path).query).get("orderHashes", [])
+        if len(order_hashes) > self.page_size:
+            return 400, {"error": "too many order hashes"}
+
+        with self.lock:
+            self.order_hash_count += len(order_hashes)
+        return 200, [self.auctions[order_hash] for order_hash in order_hashes if order_hash in self.auctions]
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+FILL_COLUMNS = ["txHash", "orderHash", "makerToken", "takerToken", "maker", "timestamp"]
+
+
+# {maker address: market maker id} for {name: {"addresses": [...]}} as returned by the
+# coordinator's marketMakers endpoint. An address listed under two names belongs to the
+# last one, like the notebook's reverse_mms.
+def maker_ids(market_makers):
+    reverse = {address: name for name, mm in market_makers.items() for address in mm["addresses"]}
+    names = {name: i for i, name in enumerate(market_makers)}
+    return pd.Series({address: names[name] for address, name in reverse.items()}, dtype=np.int64)
+
+
+# (position1, position2) of every pair of fills, by row position in fills, where both
+# fills are in the same transaction, belong to the same market maker and one's maker/taker
+# tokens are the other's taker/maker tokens. Pairs are ordered like the notebook's loop:
+# by the transaction's first fill, then by the first and second fill's position.
+def _pairs(fills, makers):
+    tx = pd.factorize(fills["txHash"])[0]
+    # a hash join of the makers against the market maker addresses, -1 for unknown makers
+    mm = np.append(makers.to_numpy(), -1)[makers.index.get_indexer(fills["maker"])]
+
+    # only fills sharing a transaction with another fill of the same market maker can pair
+    frame = pd.DataFrame({"tx": tx, "mm": mm, "position": np.arange(len(fills))})
+    frame = frame[frame["mm"] >= 0]
+    frame = frame[frame.duplicated(["tx", "mm"], keep=False)]
+
+    rows = frame["position"].to_numpy()
+    tokens = pd.factorize(pd.concat([fills["makerToken"].iloc[rows], fills["takerToken"].iloc[rows]]))[0]
+    frame["makerToken"], frame["takerToken"] = tokens[: len(rows)], tokens[len(rows) :]
+
+    swapped = frame.rename(columns={"makerToken": "takerToken", "takerToken": "makerToken"})
+    pairs = frame.merge(swapped, on=["tx", "mm", "makerToken", "takerToken"], suffixes=("1", "2"))
+    pairs = pairs[pairs["position1"] < pairs["position2"]]
+    return pairs.sort_values(["tx", "position1", "position2"])[["position1", "position2"]]
+
+
+def _trades(fills, pairs):
+    first, second = pairs["position1"].to_numpy(), pairs["position2"].to_numpy()
+    return list(
+        zip(
+            fills["txHash"].iloc[first].to_numpy(),
+            fills["orderHash"].iloc[first].to_numpy(),
+            fills["orderHash"].iloc[second].to_numpy(),
+            fills["maker"].iloc[first].to_numpy(),
+            fills["timestamp"].iloc[first].to_numpy(),
+        )
+    )
+
+
+# Potential wash trades in a frame of order fills (FILL_COLUMNS): two fills of the same
+# market maker sharing a transaction hash where the maker/taker tokens of the first are
+# the taker/maker tokens of the second. Returns (txHash, orderHash1, orderHash2, maker,
+# timestamp) tuples, the same as the notebook's get_wash_trades over the same fills.
+def wash_trades(fills, market_makers):
+    fills = fills.reset_index(drop=True)
+    return _trades(fills, _pairs(fills, maker_ids(market_makers)))
+
+
+# Wash trade detection over fills as they arrive, e.g. the batches of Database.fills or a
+# poll for fills since watermark. Fills must come in timestamp order. The fills at the
+# newest timestamp are kept, since the rest of their transaction can still be in the next
+# batch, and update only returns the pairs involving at least one new fill.
+class WashTradeDetector:
+    def __init__(self, market_makers):
+        self.makers = maker_ids(market_makers)
+        self.watermark = None
+        self._tail = pd.DataFrame(columns=FILL_COLUMNS)
+
+    def update(self, fills):
+        if self.watermark is not None:
+            timestamps = fills["timestamp"]
+            fills = fills[
+                (timestamps > self.watermark)
+                | ((timestamps == self.watermark) & ~fills["orderHash"].isin(self._tail["orderHash"]))
+            ]
+        if not len(fills):
+            return []
+
+        combined = fills[FILL_COLUMNS].reset_index(drop=True)
+        if len(self._tail):
+            combined = pd.concat([self._tail, combined], ignore_index=True)
+        pairs = _pairs(combined, self.makers)
+        pairs = pairs[pairs["position2"] >= len(self._tail)]
+
+        self.watermark = combined["timestamp"].max()
+        self._tail = combined[combined["timestamp"] == self.watermark].reset_index(drop=True)
+        return _trades(combined, pairs)
@@ -0,0 +1,89 @@
+from time import time
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pds
+
+import buckets
+
+
+def synthetic_fills(fills, days, launch, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime.timestamp(launch - datetime.timedelta(days=7))
+    end = datetime.datetime.timestamp(launch + datetime.timedelta(days=days))
+    timestamps = np.sort(rng.uniform(start, end, fills))
+    volume = rng.lognormal(8, 2, fills)
+    has_bid = rng.random(fills) < 0.3
+    bid_usd = np.where(has_bid, rng.uniform(0, 5, fills) * rng.uniform(20, 80, fills), 0)
+    return pds.DataFrame({"timestamp": timestamps, "makerTokenFilledAmountUSD": volume, "correctedRookBidUSD": bid_usd})
+
+
+# The original db.py daily loop: two boolean filters over every fill for each day
+def daily_loop(volumeUSD, launchDate, until):
+    volumeUSD = volumeUSD[volumeUSD["timestamp"] > datetime.datetime.timestamp(launchDate)]
+    dailyVolume = []
+    day = launchDate
+    timestamp = datetime.datetime.timestamp(day)
+    while timestamp < datetime.datetime.timestamp(until):
+        dailyFills = volumeUSD[volumeUSD["timestamp"] > timestamp]
+        dailyFills = dailyFills[dailyFills["timestamp"] <= datetime.datetime.timestamp(day + datetime.timedelta(days=1))]
+        dailyVolume.append(dailyFills["makerTokenFilledAmountUSD"].sum())
+        day = day + datetime.timedelta(days=1)
+        timestamp = datetime.datetime.timestamp(day)
+    return np.array(dailyVolume)
+
+
+# The original db.py 3 day series: a datetime per fill, then resample (by whole days, so
+# weeks start on the launch day like the buckets rather than on a Sunday)
+def resampled(volumeUSD, launchDate, width):
+    rule = "{}D".format(buckets.bucket_seconds(width) // buckets.DAY_SECONDS)
+    volumeUSD = volumeUSD[volumeUSD["timestamp"] > datetime.datetime.timestamp(launchDate)]
+    frame = pds.DataFrame(
+        {"volumeUSD": volumeUSD["makerTokenFilledAmountUSD"].values},
+        index=pds.to_datetime([datetime.datetime.fromtimestamp(timestamp) for timestamp in volumeUSD["timestamp"]]),
+    )
+    return frame.resample(rule).sum()["volumeUSD"].values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the db.py bucketing loops against buckets.py")
+    parser.add_argument("--fills", type=int, default=10000000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--width", default="3D")
+    args = parser.parse_args()
+
+    launch = datetime.datetime(2022, 4, 21)
+    until = launch + datetime.timedelta(days=args.days)
+    fills = synthetic_fills(args.fills, args.days, launch)
+    print("{} fills over {} days".format(len(fills), args.days))
+
+    start = time()
+    loop = daily_loop(fills, launch, until)
+    print("daily loop:          {:.2f}s".format(time() - start))
+
+    start = time()
+    daily = buckets.bucket_sums(
+        fills["timestamp"].values, {"volumeUSD": fills["makerTokenFilledAmountUSD"].values}, launch, "1D"
+    )
+    print("daily bincount:      {:.2f}s, same results: {}".format(time() - start, np.allclose(daily["volumeUSD"].values, loop)))
+
+    start = time()
+    resample = resampled(fills, launch, args.width)
+    print("{} resample:         {:.2f}s".format(args.width, time() - start))
+
+    start = time()
+    frame = buckets.volume_and_bids(
+        fills["timestamp"].values,
+        fills["makerTokenFilledAmountUSD"].values,
+        fills["timestamp"].values,
+        fills["correctedRookBidUSD"].values,
+        launch,
+        args.width,
+        cumulative_view=True,
+    )
+    print(
+        "{} bincount:         {:.2f}s, same results: {}".format(
+            args.width, time() - start, np.allclose(np.diff(frame["volumeUSD"].values, prepend=0), resample)
+        )
+    )
@@ -0,0 +1,96 @@
+import datetime
+
+import numpy as np
+import pandas as pds
+
+DAY_SECONDS = 24 * 60 * 60
+
+BUCKET_WIDTHS = {
+    "1D": DAY_SECONDS,
+    "3D": 3 * DAY_SECONDS,
+    "1W": 7 * DAY_SECONDS,
+}
+
+
+def to_timestamp(value):
+    return datetime.datetime.timestamp(value) if isinstance(value, datetime.datetime) else float(value)
+
+
+def bucket_seconds(width):
+    return BUCKET_WIDTHS[width] if isinstance(width, str) else int(width)
+
+
+# Start date (UTC, like the rollup days) of each of count buckets from origin, as a
+# DatetimeIndex named Date
+def bucket_starts(origin, width, count):
+    origin, width = to_timestamp(origin), bucket_seconds(width)
+    index = pds.to_datetime(origin + np.arange(count) * width, unit="s")
+    index.name = "Date"
+    return index
+
+
+# Bucket of every epoch-second timestamp, -1 for timestamps at or before origin (the
+# same "timestamp > launch" cut the old db.py queries made)
+def bucket_index(timestamps, origin, width):
+    origin, width = to_timestamp(origin), bucket_seconds(width)
+    offsets = np.asarray(timestamps, dtype=np.float64) - origin
+    return np.where(offsets > 0, offsets // width, -1).astype(np.int64)
+
+
+# Sums every column of values per bucket in one bincount each, plus a count of rows as
+# "fills" unless values has its own fills column (e.g. already aggregated rows). values
+# is {name: column}; there is a row for every bucket from origin to the last timestamp
+# (or until), empty buckets included.
+def bucket_sums(timestamps, values, origin, width="1D", until=None):
+    index = bucket_index(timestamps, origin, width)
+    kept = index >= 0
+    index = index[kept]
+
+    count = int(index.max()) + 1 if len(index) else 0
+    if until is not None:
+        count = max(count, int((to_timestamp(until) - to_timestamp(origin)) // bucket_seconds(width)) + 1)
+
+    columns = {
+        name: np.bincount(index, weights=np.asarray(column, dtype=np.float64)[kept], minlength=count)
+        for name, column in values.items()
+    }
+    if "fills" not in columns:
+        columns["fills"] = np.bincount(index, minlength=count)
+    return pds.DataFrame(columns, index=bucket_starts(origin, width, count))
+
+
+# Running totals of a bucket frame, recomputing income_ratio from the running sums
+def cumulative(frame):
+    frame = frame.cumsum()
+    if "income_ratio" in frame:
+        frame["income_ratio"] = frame["correctedRookBidUSD"] / frame["volumeUSD"]
+    return frame
+
+
+# Fill volume, corrected ROOK bid USD and their ratio per bucket. Bids are the fills
+# joined to their winning bids, so they carry the fill's timestamp.
+def volume_and_bids(
+    fill_timestamps,
+    volume_usd,
+    bid_timestamps,
+    corrected_rook_bid_usd,
+    origin,
+    width="3D",
+    until=None,
+    cumulative_view=False,
+):
+    volume = bucket_sums(fill_timestamps, {"volumeUSD": volume_usd}, origin, width, until)
+    bids = bucket_sums(bid_timestamps, {"correctedRookBidUSD": corrected_rook_bid_usd}, origin, width, until)
+
+    count = max(len(volume), len(bids))
+    index = bucket_starts(origin, width, count)
+    frame = pds.DataFrame(
+        {
+            "volumeUSD": volume["volumeUSD"].reindex(index, fill_value=0),
+            "correctedRookBidUSD": bids["correctedRookBidUSD"].reindex(index, fill_value=0),
+            "fills": volume["fills"].reindex(index, fill_value=0),
+        },
+        index=index,
+    )
+    frame["income_ratio"] = frame["correctedRookBidUSD"] / frame["volumeUSD"]
+    return cumulative(frame) if cumulative_view else frame
@@ -0,0 +1,103 @@
+import pandas as pds
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.engine import make_url
+
+# Column dtypes of the orderfill table, applied to every frame read from it
+FILL_DTYPES = {
+    "txHash": "string",
+    "orderHash": "string",
+    "maker": "string",
+    "makerToken": "string",
+    "takerToken": "string",
+    "timestamp": "float64",
+    "makerTokenFilledAmountUSD": "float64",
+    "takerTokenFilledAmountUSD": "float64",
+    "rookPrice": "float64",
+}
+
+
+# Read access to the analytics database, shared by the volume and wash trade analyses.
+# The pooled engine is only created, and only connects, on first use, so importing or
+# constructing this never touches the database. Queries are text with :named parameters.
+# stream() reads through a server-side cursor (a named cursor on Postgres) batch_size
+# rows at a time instead of buffering the whole result client-side.
+class Database:
+    def __init__(self, url, pool_size=5, max_overflow=10, pool_recycle=3600, batch_size=50000):
+        self.url = url
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.batch_size = batch_size
+        self._engine = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            options = {"pool_recycle": self.pool_recycle, "pool_pre_ping": True}
+            # sqlite in-memory databases get a single-connection pool that takes no sizes
+            if make_url(self.url).get_backend_name() != "sqlite":
+                options.update(pool_size=self.pool_size, max_overflow=self.max_overflow)
+            self._engine = create_engine(self.url, **options)
+        return self._engine
+
+    @property
+    def dialect(self):
+        return self.engine.dialect
+
+    # A pooled connection, returned to the pool when the block exits
+    def connect(self):
+        return self.engine.connect()
+
+    def dispose(self):
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+
+    # The whole result of query as one frame, with dtypes ({column: dtype}) applied
+    def read(self, query, params=None, dtypes=None):
+        with self.connect() as connection:
+            result = connection.execute(_statement(query, params), params or {})
+            return _frame(result.fetchall(), list(result.keys()), dtypes)
+
+    # The result of query as frames of at most batch_size rows, streamed from a
+    # server-side cursor. The connection is held until the generator is exhausted/closed.
+    def stream(self, query, params=None, dtypes=None, batch_size=None):
+        batch_size = batch_size or self.batch_size
+        with self.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(
+                _statement(query, params), params or {}
+            )
+            columns = list(result.keys())
+            for rows in result.partitions(batch_size):
+                yield _frame(rows, columns, dtypes)
+
+    # orderfill rows (optionally after since and only for makers) as typed frames,
+    # oldest first
+    def fills(self, columns=tuple(FILL_DTYPES), since=None, makers=None, batch_size=None):
+        conditions, params = [], {}
+        if since is not None:
+            conditions.append('"timestamp" > :since')
+            params["since"] = float(since)
+        if makers is not None:
+            conditions.append('"maker" IN :makers')
+            params["makers"] = list(makers)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+
+        selected = ", ".join(f'"{column}"' for column in columns)
+        query = f'SELECT {selected} FROM orderfill{where} ORDER BY "timestamp"'
+        dtypes = {column: FILL_DTYPES[column] for column in columns if column in FILL_DTYPES}
+        return self.stream(query, params, dtypes, batch_size)
+
+
+# List valued parameters become expanding IN (...) parameters
+def _statement(query, params):
+    statement = text(query)
+    for name, value in (params or {}).items():
+        if isinstance(value, (list, tuple)):
+            statement = statement.bindparams(bindparam(name, expanding=True))
+    return statement
+
+
+def _frame(rows, columns, dtypes):
+    frame = pds.DataFrame.from_records(rows, columns=columns)
+    return frame.astype(dtypes) if dtypes else frame
@@ -1,4 +1,4 @@
-import psycopg2
+import os
 import pandas as pds
 from sqlalchemy import create_engine
 import datetime
@@ -7,187 +7,114 @@ import time
 import matplotlib.pyplot as plt
 import matplotlib
 
-# matplotlib.use("tkagg")
-
-
-DB_LOGIN = ""
-
-
-# Create an engine instance
-
-alchemyEngine = create_engine(
-    DB_LOGIN,
-    pool_recycle=3600,
-)
-
-
-# Connect to PostgreSQL server
-
-dbConnection = alchemyEngine.connect()
-
-
-# Read data from PostgreSQL database table and load into a DataFrame instance
-
-bids = pds.read_sql("select * from auction", dbConnection)
-
-
-orderFills = pds.read_sql("select * from orderfill ", dbConnection)
+from database import Database
+from rollups import Rollups
 
-treasuryDeposits = pds.read_sql("select * from coordinatortreasurydeposit", dbConnection)
-
-volumeUSD = orderFills[["makerTokenFilledAmountUSD", "takerTokenFilledAmountUSD", "timestamp"]]
-
-launchDate = datetime.datetime(2022, 4, 21)
-
-volumeUSD = volumeUSD[volumeUSD["timestamp"] > datetime.datetime.timestamp(launchDate)]
-
-datetimes = []
-dailyVolume = []
-
-day = launchDate
-timestamp = datetime.datetime.timestamp(day)
-
-
-### ROOK BID STUFF
-
-launch_date = datetime.datetime(2022, 4, 21)
-launch_timestamp = datetime.datetime.timestamp(launch_date)
-
-# Read data from PostgreSQL database table and load into a DataFrame instance
-auctions = pds.read_sql(
-    'SELECT "auctionId", "auctionCreationTime", "user" FROM auction \
-    WHERE "user" != \'null\' ',
-    dbConnection,
-)
-
-bids = pds.read_sql(
-    'SELECT bid."bidId", bid."auctionId", bid."rook_etherUnits", bidoutcome."txHash", bidoutcome."batchCount" FROM bid \
-    LEFT JOIN (SELECT bidoutcome."txHash", bidoutcome."outcomeValue", bidoutcome."batchCount", bidoutcome."bidId" FROM bidoutcome) bidoutcome ON bidoutcome."bidId" =  bid."bidId"\
-    WHERE bidoutcome."outcomeValue" > 0',
-    dbConnection,
-)
-
-order_fills = pds.read_sql("SELECT * FROM orderfill", dbConnection)
-
-auctions = auctions[auctions["auctionCreationTime"] > launch_timestamp]
-order_fills = order_fills[order_fills["timestamp"] > launch_timestamp]
-
-bid_volume_data = order_fills.join(bids.set_index("txHash"), on="txHash").dropna()
+# matplotlib.use("tkagg")
 
-total_rook_bid_volume_USD = (
-    bid_volume_data["rookPrice"].mul(bid_volume_data["rook_etherUnits"].div(bid_volume_data["batchCount"] ** 2)).sum()
-)
-total_trading_volume_USD = order_fills["takerTokenFilledAmountUSD"].sum()
 
-print(f"total trading volume ($): \t{total_trading_volume_USD}")
-print(f"total bid volume ($): \t\t{total_rook_bid_volume_USD}")
-print(f"all time bid/volume ratio: \t{total_rook_bid_volume_USD / total_trading_volume_USD}")
+# Any SQLAlchemy URL, e.g. a local Postgres or a sqlite:/// database seeded by syntheticDb.py
+DB_LOGIN = os.getenv("DB_LOGIN", "")
 
-bid_volume_data["correctedRookBidUSD"] = bid_volume_data["rookPrice"].mul(
-    bid_volume_data["rook_etherUnits"].div(bid_volume_data["batchCount"] ** 2)
-)
+# Where the daily rollups of DB_LOGIN's tables are kept
+ROLLUP_DB = os.getenv("ROLLUP_DB", "sqlite:///rollups.sqlite")
 
-# USE THIS ONE FOR PLOTTING. correctedRookBidUSD is the value you want
-bid_volume_data["Date"] = [datetime.datetime.fromtimestamp(timestamp) for timestamp in bid_volume_data["timestamp"]]
+launchDate = datetime.datetime(2022, 4, 21, tzinfo=datetime.timezone.utc)
 
 
-# print(f"Timestamp: {timestamp}")
+# Volume, bid and revenue plots since launch. source is a Database (or engine) to read
+# the fills from, rollup_target the engine the daily rollups are kept in.
+def volume_report(source, rollup_target):
+    # Bring the daily rollups up to date. Only the days since the last refresh are read
+    # from the database, and everything below reads the rollups, one row per day.
 
-while timestamp < datetime.datetime.timestamp(datetime.datetime.now()):
+    rollups = Rollups(source, rollup_target)
+    rollups.refresh()
 
-    dailyFills = volumeUSD[volumeUSD["timestamp"] > timestamp]
+    dailyVolumeUSD = rollups.daily(launchDate)[["volumeUSD"]]
+    dailyVolumeUSD.index = dailyVolumeUSD.index + datetime.timedelta(days=1)
 
-    dailyFills = dailyFills[dailyFills["timestamp"] <= datetime.datetime.timestamp(day + datetime.timedelta(days=1))]
 
-    dailyVolume.append(dailyFills["makerTokenFilledAmountUSD"].sum())
-    datetimes.append(day + datetime.timedelta(days=1))
+    ### ROOK BID STUFF
 
-    usdVoume = dailyFills["makerTokenFilledAmountUSD"].sum()
+    threeDay = rollups.bucketed(launchDate, "3D")
+    cumulativeThreeDay = rollups.bucketed(launchDate, "3D", cumulative_view=True)
 
-    # print(f"volume from {day} to {day + datetime.timedelta(days=1)}: {usdVoume}")
+    # USE THIS ONE FOR PLOTTING. correctedRookBidUSD is the value you want
+    bid_volume_data = cumulativeThreeDay[["correctedRookBidUSD", "bidFills", "income_ratio"]]
 
-    day = day + datetime.timedelta(days=1)
-    timestamp = datetime.datetime.timestamp(day)
+    total_rook_bid_volume_USD = threeDay["correctedRookBidUSD"].sum()
+    total_trading_volume_USD = threeDay["takerVolumeUSD"].sum()
 
-bid_volume_data.set_index("Date", inplace=True)
-dailyVolumeUSD = pds.DataFrame({"Date": datetimes, "volumeUSD": dailyVolume})
-dailyVolumeUSD.set_index("Date", inplace=True)
-revenue = pds.read_csv(
-    "Daily_Supply-Side_Revenue_Vs._Protocol_Revenue_In_The_Past_180_Days._2022-06-29.csv", index_col="Date"
-)
+    print(f"total trading volume ($): \t{total_trading_volume_USD}")
+    print(f"total bid volume ($): \t\t{total_rook_bid_volume_USD}")
+    print(f"all time bid/volume ratio: \t{total_rook_bid_volume_USD / total_trading_volume_USD}")
 
-dailyVolumeUSD.index = pds.to_datetime(dailyVolumeUSD.index)
-revenue.index = pds.to_datetime(revenue.index)
-bid_volume_data.index = pds.to_datetime(bid_volume_data.index)
+    revenue = pds.read_csv(
+        "Daily_Supply-Side_Revenue_Vs._Protocol_Revenue_In_The_Past_180_Days._2022-06-29.csv", index_col="Date"
+    )
 
-total_volume_USD = volumeUSD["makerTokenFilledAmountUSD"].sum()
-total_supply_revenue = revenue["Protocol Revenue ($)"].sum()
-total_protocol_revenue = revenue["Treasury Revenue ($)"].sum()
+    dailyVolumeUSD.index = pds.to_datetime(dailyVolumeUSD.index)
+    revenue.index = pds.to_datetime(revenue.index)
 
-daily_volume_USD = pds.DataFrame(
-    {"timestamp": volumeUSD["timestamp"], "volumeUSD": volumeUSD["makerTokenFilledAmountUSD"]}
-)
-daily_volume_USD["Date"] = [datetime.datetime.fromtimestamp(timestamp) for timestamp in daily_volume_USD["timestamp"]]
-daily_volume_USD.set_index("Date", inplace=True)
-daily_volume_USD.index = pds.to_datetime(daily_volume_USD.index)
+    total_volume_USD = threeDay["volumeUSD"].sum()
+    total_supply_revenue = revenue["Protocol Revenue ($)"].sum()
+    total_protocol_revenue = revenue["Treasury Revenue ($)"].sum()
 
-revenue = revenue.resample("3D").sum()
-daily_volume_USD = daily_volume_USD.resample("3D").sum()
-bid_volume_data = bid_volume_data.resample("3D").sum()
-revenue = revenue.cumsum()
-daily_volume_USD = daily_volume_USD.cumsum()
-bid_volume_data = bid_volume_data.cumsum()
+    daily_volume_USD = cumulativeThreeDay[["volumeUSD"]]
 
-print(daily_volume_USD)
+    revenue = revenue.resample("3D").sum()
+    revenue = revenue.cumsum()
 
-fmt_str = "%d-%m"
-daily_volume_USD.index = daily_volume_USD.index.strftime(fmt_str)
-revenue.index = revenue.index.strftime(fmt_str)
-bid_volume_data.index = bid_volume_data.index.strftime(fmt_str)
+    print(daily_volume_USD)
 
-# bid_volume_data = bid_volume_data.loc[:, ['correctedRookBidUSD', 'makerTokenFilledAmountUSD']]
+    fmt_str = "%d-%m"
+    daily_volume_USD.index = daily_volume_USD.index.strftime(fmt_str)
+    revenue.index = revenue.index.strftime(fmt_str)
+    bid_volume_data.index = bid_volume_data.index.strftime(fmt_str)
 
-bid_volume_data["income_ratio"] = bid_volume_data["correctedRookBidUSD"] / daily_volume_USD["volumeUSD"]
+    # bid_volume_data = bid_volume_data.loc[:, ['correctedRookBidUSD', 'makerTokenFilledAmountUSD']]
 
 
-fig = plt.figure()
-subfigs = fig.subfigures(2, 1)
+    fig = plt.figure()
+    subfigs = fig.subfigures(2, 1)
 
-ax1 = subfigs[0].add_subplot(111)
-ax2 = ax1.twinx()
-daily_volume_USD.plot(kind="bar", ax=ax1, y=["volumeUSD"], color=["blue"])
-bid_volume_data.plot(kind="bar", ax=ax2, y=["correctedRookBidUSD"], color=["red"])
+    ax1 = subfigs[0].add_subplot(111)
+    ax2 = ax1.twinx()
+    daily_volume_USD.plot(kind="bar", ax=ax1, y=["volumeUSD"], color=["blue"])
+    bid_volume_data.plot(kind="bar", ax=ax2, y=["correctedRookBidUSD"], color=["red"])
 
 
-# # revenue.plot(kind="bar", ax=ax2, color=["#ff7f0e", "#2ca02c"])
-# bid_volume_data.correctedRookBidUSD.plot(kind="bar", ax=ax2, #color=["#ff7f0e", "#2ca02c"])
+    # # revenue.plot(kind="bar", ax=ax2, color=["#ff7f0e", "#2ca02c"])
+    # bid_volume_data.correctedRookBidUSD.plot(kind="bar", ax=ax2, #color=["#ff7f0e", "#2ca02c"])
 
-ax1.legend(loc="upper left")
-ax2.legend(loc="upper right")
+    ax1.legend(loc="upper left")
+    ax2.legend(loc="upper right")
 
-ax1.set_ylabel("Trading Volume ($)")
-ax2.set_ylabel("ROOK bid volume ($)")
+    ax1.set_ylabel("Trading Volume ($)")
+    ax2.set_ylabel("ROOK bid volume ($)")
 
-ax1.set_ylim(0, 300000000)
-ax2.set_ylim(0, 500000)
+    ax1.set_ylim(0, 300000000)
+    ax2.set_ylim(0, 500000)
 
-# plt.ylim((10^6, 300*10^6))
-# ax1.set_ylim(0, 0.002)
-# ax2.set_ylim(0, 300000)
+    # plt.ylim((10^6, 300*10^6))
+    # ax1.set_ylim(0, 0.002)
+    # ax2.set_ylim(0, 300000)
 
-ax13 = subfigs[1].add_subplot(111, sharex=ax1)
-ax13.get_shared_x_axes().join(ax13, ax2)
-bid_volume_data.plot(kind="line", ax=ax13, y="income_ratio")
-ax13.set_ylim(0, 0.002)
-plt.show()
+    ax13 = subfigs[1].add_subplot(111, sharex=ax1)
+    ax13.get_shared_x_axes().join(ax13, ax2)
+    bid_volume_data.plot(kind="line", ax=ax13, y="income_ratio")
+    ax13.set_ylim(0, 0.002)
+    plt.show()
 
-print(total_protocol_revenue)
-print(total_supply_revenue)
-print(total_volume_USD)
-print(f"Protocol revenue to volume ratio: {total_supply_revenue / total_volume_USD}")
-print(f"Treasury revenue to volume ratio: {total_protocol_revenue / total_volume_USD}")
+    print(total_protocol_revenue)
+    print(total_supply_revenue)
+    print(total_volume_USD)
+    print(f"Protocol revenue to volume ratio: {total_supply_revenue / total_volume_USD}")
+    print(f"Treasury revenue to volume ratio: {total_protocol_revenue / total_volume_USD}")
 
-print(bid_volume_data)
+    print(bid_volume_data)
 
 
-dbConnection.close()
+if __name__ == "__main__":
+    volume_report(Database(DB_LOGIN), create_engine(ROLLUP_DB))
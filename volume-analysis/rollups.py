@@ -0,0 +1,192 @@
+import pandas as pds
+from sqlalchemy import text
+
+from buckets import DAY_SECONDS, bucket_sums, cumulative, to_timestamp
+
+# ROOK paid for a fill's bid: the winning bid is split across the orders of its batch
+# and priced at the fill's ROOK price
+CORRECTED_ROOK_BID_USD = 'orderfill."rookPrice" * bid."rook_etherUnits" / (bidoutcome."batchCount" * bidoutcome."batchCount")'
+
+
+# Index of the width seconds wide bucket since origin that each row falls in. Rows are
+# always after origin (the epoch for the daily rollups), so truncating is the same as
+# flooring; Postgres rounds when casting to an integer, so it gets an explicit FLOOR.
+def bucket_expression(dialect, column, origin, width):
+    offset = f"({column} - {float(origin)}) / {float(width)}"
+    if dialect == "sqlite":
+        return f"CAST({offset} AS INTEGER)"
+    return f"CAST(FLOOR({offset}) AS INTEGER)"
+
+
+# Column names of coordinatortreasurydeposit the treasury rollup sums over
+TREASURY_TIMESTAMP_COLUMN = "timestamp"
+TREASURY_AMOUNT_COLUMN = "amount"
+
+ROLLUP_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS rollup_volume (day INTEGER PRIMARY KEY, "volumeUSD" DOUBLE PRECISION, \
+    "takerVolumeUSD" DOUBLE PRECISION, fills INTEGER)',
+    'CREATE TABLE IF NOT EXISTS rollup_bids (day INTEGER PRIMARY KEY, "correctedRookBidUSD" DOUBLE PRECISION, \
+    "bidFills" INTEGER)',
+    'CREATE TABLE IF NOT EXISTS rollup_maker_fills (day INTEGER, maker TEXT, fills INTEGER, \
+    "volumeUSD" DOUBLE PRECISION, PRIMARY KEY (day, maker))',
+    'CREATE TABLE IF NOT EXISTS rollup_treasury (day INTEGER PRIMARY KEY, deposits INTEGER, \
+    "amount" DOUBLE PRECISION)',
+    'CREATE TABLE IF NOT EXISTS rollup_watermark (name TEXT PRIMARY KEY, "timestamp" DOUBLE PRECISION)',
+]
+
+
+# {rollup table: (newest source timestamp query, per UTC day aggregate query)}. The
+# aggregate queries take :since and return one row per day (and maker) from then on.
+def _rollup_queries(dialect):
+    fill_day = bucket_expression(dialect, 'orderfill."timestamp"', 0, DAY_SECONDS)
+    deposit_day = bucket_expression(
+        dialect, f'coordinatortreasurydeposit."{TREASURY_TIMESTAMP_COLUMN}"', 0, DAY_SECONDS
+    )
+    return {
+        "rollup_volume": (
+            'SELECT MAX(orderfill."timestamp") FROM orderfill',
+            f'SELECT {fill_day} AS day, SUM(orderfill."makerTokenFilledAmountUSD") AS "volumeUSD", \
+            SUM(orderfill."takerTokenFilledAmountUSD") AS "takerVolumeUSD", COUNT(*) AS fills \
+            FROM orderfill WHERE orderfill."timestamp" >= :since GROUP BY day',
+        ),
+        "rollup_bids": (
+            'SELECT MAX(orderfill."timestamp") FROM orderfill',
+            f'SELECT {fill_day} AS day, SUM({CORRECTED_ROOK_BID_USD}) AS "correctedRookBidUSD", \
+            COUNT(*) AS "bidFills" FROM orderfill \
+            JOIN bidoutcome ON bidoutcome."txHash" = orderfill."txHash" \
+            JOIN bid ON bid."bidId" = bidoutcome."bidId" \
+            WHERE orderfill."timestamp" >= :since AND bidoutcome."outcomeValue" > 0 \
+            AND orderfill."rookPrice" IS NOT NULL AND bid."rook_etherUnits" IS NOT NULL \
+            AND bidoutcome."batchCount" IS NOT NULL GROUP BY day',
+        ),
+        "rollup_maker_fills": (
+            'SELECT MAX(orderfill."timestamp") FROM orderfill',
+            f'SELECT {fill_day} AS day, orderfill."maker" AS maker, COUNT(*) AS fills, \
+            SUM(orderfill."makerTokenFilledAmountUSD") AS "volumeUSD" \
+            FROM orderfill WHERE orderfill."timestamp" >= :since GROUP BY day, maker',
+        ),
+        "rollup_treasury": (
+            f'SELECT MAX(coordinatortreasurydeposit."{TREASURY_TIMESTAMP_COLUMN}") FROM coordinatortreasurydeposit',
+            f'SELECT {deposit_day} AS day, COUNT(*) AS deposits, \
+            SUM(coordinatortreasurydeposit."{TREASURY_AMOUNT_COLUMN}") AS "amount" \
+            FROM coordinatortreasurydeposit \
+            WHERE coordinatortreasurydeposit."{TREASURY_TIMESTAMP_COLUMN}" >= :since GROUP BY day',
+        ),
+    }
+
+
+# Daily rollups of the orderfill, bid/bidoutcome and coordinatortreasurydeposit tables,
+# kept in a separate (writable) database such as a local sqlite file. Each rollup table
+# remembers the newest source timestamp it has seen. A refresh recomputes only the days
+# from lookback_days before that watermark onwards, replacing them outright, so rows
+# that land late for a recent day are picked up and running it twice changes nothing.
+# Reports read the rollups, which hold one row per day however many fills there are.
+#
+# rollup_bids is keyed on the fill's timestamp, as bidoutcome has no time of its own, so
+# an outcome recorded more than lookback_days after its fill is missed by an incremental
+# refresh. Run refresh(full=True) after such outcomes land (e.g. a backfill of
+# bidoutcome) to rebuild every rollup from scratch.
+class Rollups:
+    def __init__(self, source, target, lookback_days=1):
+        self.source = source
+        self.target = target
+        self.lookback_days = lookback_days
+
+        with self.target.begin() as connection:
+            for statement in ROLLUP_SCHEMA:
+                connection.execute(text(statement))
+
+    def watermark(self, name):
+        with self.target.connect() as connection:
+            return connection.execute(
+                text('SELECT "timestamp" FROM rollup_watermark WHERE name = :name'), {"name": name}
+            ).scalar()
+
+    # Brings every rollup table up to date, returning {table: rollup rows rewritten}.
+    # full=True recomputes every day instead of the ones since the watermarks.
+    def refresh(self, full=False):
+        rewritten = {}
+        with self.source.connect() as source:
+            for table, (latest_query, query) in _rollup_queries(source.dialect.name).items():
+                watermark = self.watermark(table)
+                if full or watermark is None:
+                    since_day = 0
+                else:
+                    since_day = int(watermark // DAY_SECONDS) - self.lookback_days
+                since = since_day * DAY_SECONDS
+
+                latest = source.execute(text(latest_query)).scalar()
+                rows = source.execute(text(query), {"since": since}).mappings().all()
+
+                with self.target.begin() as target:
+                    target.execute(text(f"DELETE FROM {table} WHERE day >= :day"), {"day": since_day})
+                    if rows:
+                        columns = list(rows[0].keys())
+                        target.execute(
+                            text(
+                                "INSERT INTO {} ({}) VALUES ({})".format(
+                                    table,
+                                    ", ".join(f'"{column}"' for column in columns),
+                                    ", ".join(f":{column}" for column in columns),
+                                )
+                            ),
+                            [dict(row) for row in rows],
+                        )
+                    if latest is not None:
+                        target.execute(text("DELETE FROM rollup_watermark WHERE name = :name"), {"name": table})
+                        target.execute(
+                            text("INSERT INTO rollup_watermark VALUES (:name, :timestamp)"),
+                            {"name": table, "timestamp": float(latest)},
+                        )
+
+                rewritten[table] = len(rows)
+        return rewritten
+
+    def _read(self, query, params):
+        with self.target.connect() as connection:
+            return pds.read_sql(text(query), connection, params=params)
+
+    # Volume, fill count, corrected ROOK bid USD and treasury deposits per UTC day from
+    # since's day on, with a row for every day up to the last one rolled up
+    def daily(self, since):
+        since_day = int(to_timestamp(since) // DAY_SECONDS)
+        frame = self._read(
+            'SELECT rollup_volume.day, rollup_volume."volumeUSD", rollup_volume."takerVolumeUSD", \
+            rollup_volume.fills, COALESCE(rollup_bids."correctedRookBidUSD", 0) AS "correctedRookBidUSD", \
+            COALESCE(rollup_bids."bidFills", 0) AS "bidFills" \
+            FROM rollup_volume LEFT JOIN rollup_bids ON rollup_bids.day = rollup_volume.day \
+            WHERE rollup_volume.day >= :day ORDER BY rollup_volume.day',
+            {"day": since_day},
+        ).set_index("day")
+        treasury = self._read(
+            'SELECT day, deposits, "amount" AS "treasuryDepositAmount" FROM rollup_treasury WHERE day >= :day',
+            {"day": since_day},
+        ).set_index("day")
+
+        last_day = frame.index.max() if len(frame) else since_day - 1
+        frame = frame.join(treasury, how="outer").reindex(range(since_day, last_day + 1)).fillna(0)
+        frame.index = pds.to_datetime(frame.index * DAY_SECONDS, unit="s")
+        frame.index.name = "Date"
+        return frame
+
+    # The daily rollups summed into width wide buckets starting on since's day, with the
+    # income ratio (corrected ROOK bid USD over volume) of each bucket. cumulative_view
+    # gives running totals instead, and the income ratio of the running totals.
+    def bucketed(self, since, width="3D", cumulative_view=False):
+        daily = self.daily(since)
+        origin = int(to_timestamp(since) // DAY_SECONDS) * DAY_SECONDS
+
+        # Each day's totals are placed at its midday, strictly inside that day's bucket
+        middays = (daily.index - pds.Timestamp(0)).total_seconds().values + DAY_SECONDS / 2
+        frame = bucket_sums(middays, {name: daily[name].values for name in daily}, origin, width)
+        frame["income_ratio"] = frame["correctedRookBidUSD"] / frame["volumeUSD"]
+        return cumulative(frame) if cumulative_view else frame
+
+    # Fills and volume per maker over [since, until), from the per day maker rollup
+    def maker_fills(self, since, until=None):
+        until_day = int(to_timestamp(until) // DAY_SECONDS) if until is not None else 2**31
+        return self._read(
+            'SELECT maker, SUM(fills) AS fills, SUM("volumeUSD") AS "volumeUSD" FROM rollup_maker_fills \
+            WHERE day >= :since AND day < :until GROUP BY maker ORDER BY fills DESC',
+            {"since": int(to_timestamp(since) // DAY_SECONDS), "until": until_day},
+        ).set_index("maker")
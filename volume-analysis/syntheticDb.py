@@ -0,0 +1,107 @@
+import datetime
+import random
+import sys
+
+from sqlalchemy import create_engine, text
+
+SCHEMA = [
+    'CREATE TABLE orderfill ("txHash" TEXT, "orderHash" TEXT, "maker" TEXT, "makerToken" TEXT, \
+    "takerToken" TEXT, "timestamp" DOUBLE PRECISION, "makerTokenFilledAmountUSD" DOUBLE PRECISION, \
+    "takerTokenFilledAmountUSD" DOUBLE PRECISION, "rookPrice" DOUBLE PRECISION)',
+    'CREATE TABLE auction ("auctionId" INTEGER, "auctionCreationTime" DOUBLE PRECISION, "user" TEXT)',
+    'CREATE TABLE bid ("bidId" INTEGER, "auctionId" INTEGER, "rook_etherUnits" DOUBLE PRECISION)',
+    'CREATE TABLE bidoutcome ("bidId" INTEGER, "txHash" TEXT, "outcomeValue" DOUBLE PRECISION, "batchCount" INTEGER)',
+    'CREATE TABLE coordinatortreasurydeposit ("txHash" TEXT, "timestamp" DOUBLE PRECISION, "amount" DOUBLE PRECISION)',
+]
+
+INDEXES = [
+    'CREATE INDEX orderfill_timestamp ON orderfill ("timestamp")',
+    'CREATE INDEX orderfill_txhash ON orderfill ("txHash")',
+    'CREATE INDEX bidoutcome_txhash ON bidoutcome ("txHash")',
+    'CREATE INDEX bid_bidid ON bid ("bidId")',
+]
+
+
+COLUMNS = {
+    "orderfill": [
+        "txHash",
+        "orderHash",
+        "maker",
+        "makerToken",
+        "takerToken",
+        "timestamp",
+        "makerTokenFilledAmountUSD",
+        "takerTokenFilledAmountUSD",
+        "rookPrice",
+    ],
+    "auction": ["auctionId", "auctionCreationTime", "user"],
+    "bid": ["bidId", "auctionId", "rook_etherUnits"],
+    "bidoutcome": ["bidId", "txHash", "outcomeValue", "batchCount"],
+    "coordinatortreasurydeposit": ["txHash", "timestamp", "amount"],
+}
+
+
+def insert(connection, table, rows):
+    columns = COLUMNS[table]
+    connection.execute(
+        text("INSERT INTO {} VALUES ({})".format(table, ", ".join(f":{column}" for column in columns))),
+        [dict(zip(columns, row)) for row in rows],
+    )
+
+
+# Fills a database with the volume-analysis tables and random fills, auctions, bids and
+# treasury deposits spread over days from start (some before it, to exercise the launch
+# filter). About a third of the transactions carry a winning bid, some of them shared
+# by a batch of fills.
+def seed(engine, fills=100000, days=90, start=datetime.datetime(2022, 4, 21), seed=0):
+    rng = random.Random(seed)
+    first = datetime.datetime.timestamp(start - datetime.timedelta(days=7))
+    last = datetime.datetime.timestamp(start + datetime.timedelta(days=days))
+    makers = ["0x%040x" % (0xAA00 + i) for i in range(20)]
+    tokens = ["0x%040x" % (0xBB00 + i) for i in range(8)]
+
+    rows = {table: [] for table in COLUMNS}
+    tx = 0
+    while len(rows["orderfill"]) < fills:
+        tx_hash = "0x%064x" % tx
+        timestamp = rng.uniform(first, last)
+        for _ in range(rng.choice([1, 1, 1, 2, 3])):
+            volume = rng.lognormvariate(8, 2)
+            maker_token, taker_token = rng.sample(tokens, 2)
+            rows["orderfill"].append(
+                (
+                    tx_hash,
+                    "0x%064x" % len(rows["orderfill"]),
+                    rng.choice(makers),
+                    maker_token,
+                    taker_token,
+                    timestamp,
+                    volume,
+                    volume * rng.uniform(0.99, 1.01),
+                    rng.uniform(20, 80),
+                )
+            )
+
+        if rng.random() < 0.35:
+            auction_id = len(rows["auction"])
+            rows["auction"].append((auction_id, timestamp - rng.uniform(1, 60), "0x%040x" % rng.randrange(500)))
+            batch_count = rng.choice([1, 1, 2, 3])
+            for _ in range(rng.choice([1, 1, 2])):
+                bid_id = len(rows["bid"])
+                rows["bid"].append((bid_id, auction_id, rng.uniform(0, 5)))
+                rows["bidoutcome"].append((bid_id, tx_hash, rng.choice([0, 1, 1, 1]), batch_count))
+
+        if rng.random() < 0.05:
+            rows["coordinatortreasurydeposit"].append((tx_hash, timestamp, rng.uniform(0, 20)))
+        tx += 1
+
+    with engine.begin() as connection:
+        for statement in SCHEMA + INDEXES:
+            connection.execute(text(statement))
+        for table, table_rows in rows.items():
+            insert(connection, table, table_rows)
+
+
+if __name__ == "__main__":
+    # python syntheticDb.py <database url> [fills], e.g. sqlite:///synthetic.sqlite
+    seed(create_engine(sys.argv[1]), fills=int(sys.argv[2]) if len(sys.argv) > 2 else 100000)